@@ -0,0 +1,77 @@
+# Mide los bytes por entidad (usuario, pregunta, respuesta, voto) con tracemalloc.
+# Uso: python -m benchmarks.memory [--count 1000000]
+import argparse
+import gc
+import tracemalloc
+
+from cuoora_social_network import Answer, Question, User, Vote
+
+POOL_SIZE = 1000 # Autores y votantes compartidos, creados fuera de la medición
+
+
+def setup_users(count):
+    return None
+
+def build_users(count, _):
+    return [User("username", "password") for _ in range(count)]
+
+def setup_questions(count):
+    return [User(f"author_{i}", "password") for i in range(POOL_SIZE)]
+
+def build_questions(count, authors):
+    return [Question(authors[i % POOL_SIZE], "Title", "Description") for i in range(count)]
+
+def setup_answers(count):
+    authors = setup_questions(count)
+    return authors, build_questions(max(1, count // 10), authors)
+
+def build_answers(count, context):
+    authors, questions = context
+    return [Answer(questions[i % len(questions)], authors[i % POOL_SIZE], "Description") for i in range(count)]
+
+def setup_votes(count):
+    return setup_answers(count)
+
+def build_votes(count, context):
+    # Cada pregunta recibe un voto de cada votante del pool, como mucho
+    voters, questions = context
+    votes = []
+    for i in range(count):
+        question = questions[i // POOL_SIZE % len(questions)]
+        vote = Vote(voters[i % POOL_SIZE], i % 3 != 0)
+        question.add_vote(vote)
+        votes.append(vote)
+    return votes
+
+BENCHMARKS = (
+    ("user", setup_users, build_users),
+    ("question", setup_questions, build_questions),
+    ("answer", setup_answers, build_answers),
+    ("vote", setup_votes, build_votes),
+)
+
+
+def measure(count, setup, build):
+    context = setup(count)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build(count, context)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # La lista que retiene los objetos no es parte del costo de la entidad
+    return (after - before - objects.__sizeof__()) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes por entidad de CuOOra")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'entidad':<10} {'bytes/objeto':>14}  (n={args.count})")
+    for name, setup, build in BENCHMARKS:
+        print(f"{name:<10} {measure(args.count, setup, build):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
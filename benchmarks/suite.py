@@ -0,0 +1,198 @@
+# Mide las operaciones de lectura de CuOOra sobre un grafo sintético (ver benchmarks/synthetic.py):
+# percentiles de latencia, throughput y pico de memoria por operación, y compara dos corridas.
+# Uso: python -m benchmarks.suite run [--objects 100000] [--seed 1] [--output base.json]
+#      python -m benchmarks.suite compare base.json nueva.json [--threshold 0.2]
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SyntheticGraph
+
+PERCENTILES = (50, 90, 99)
+MEMORY_CALLS = 10 # Llamadas medidas con tracemalloc, aparte de las de latencia porque lo enlentece
+WARMUP_CALLS = 5
+MIN_SAMPLE_SECONDS = 0.00005 # Las operaciones más rápidas se repiten dentro de cada muestra para no medir el reloj
+
+
+# =================== OPERACIONES =================== #
+# Cada operación recibe el CuOOra y un generador de números y devuelve una lista de llamadas sin argumentos
+def feed_operation(strategy):
+    getter = {
+        "social": "get_social_questions_for_user",
+        "topics": "get_topic_questions_for_user",
+        "news": "get_news_questions_for_user",
+        "popular_today": "get_popular_questions_for_user",
+        "blended": "get_blended_questions_for_user",
+    }[strategy]
+
+    def calls(cuoora, rng, count):
+        users = cuoora.get_users()
+        return [(lambda a_user=rng.choice(users): getattr(cuoora, getter)(a_user)) for _ in range(count)]
+    return calls
+
+def best_answer_calls(cuoora, rng, count):
+    questions = [q for q in cuoora.get_questions() if q.get_answers()]
+    return [rng.choice(questions).get_best_answer for _ in range(count)]
+
+def score_calls(cuoora, rng, count):
+    users = cuoora.get_users()
+    return [rng.choice(users).calculate_score for _ in range(count)]
+
+def recalculate_score_calls(cuoora, rng, count): # Recorrido completo, sin el puntaje mantenido al día
+    users = cuoora.get_users()
+    return [rng.choice(users).recalculate_score for _ in range(count)]
+
+OPERATIONS = {
+    "social_feed": feed_operation("social"),
+    "topics_feed": feed_operation("topics"),
+    "news_feed": feed_operation("news"),
+    "popular_today_feed": feed_operation("popular_today"),
+    "blended_feed": feed_operation("blended"),
+    "best_answer": best_answer_calls,
+    "calculate_score": score_calls,
+    "recalculate_score": recalculate_score_calls,
+}
+
+
+# =================== MEDICIÓN =================== #
+def percentile(sorted_values, p): # Interpolación lineal entre los dos valores más cercanos
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def measure(calls):
+    warmup_start = time.perf_counter()
+    for call in calls[:WARMUP_CALLS]:
+        call()
+    estimate = (time.perf_counter() - warmup_start) / min(WARMUP_CALLS, len(calls))
+    repeat = max(1, int(MIN_SAMPLE_SECONDS / estimate)) if estimate else 1000
+    latencies = []
+    clock = time.perf_counter_ns
+    total_start = clock()
+    for call in calls:
+        start = clock()
+        for _ in range(repeat):
+            call()
+        latencies.append((clock() - start) / repeat)
+    total = clock() - total_start
+    latencies.sort()
+    result = {f"p{p}_us": percentile(latencies, p) / 1000 for p in PERCENTILES}
+    result["max_us"] = latencies[-1] / 1000
+    result["ops_per_s"] = len(calls) * repeat / (total / 1e9)
+    result["samples"] = len(calls)
+
+    # Pico de memoria asignada durante una llamada, por encima de lo que ya estaba vivo
+    peak = 0
+    gc.collect()
+    tracemalloc.start()
+    for call in calls[:MEMORY_CALLS]:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    result["peak_kib"] = peak / 1024
+    return result
+
+def run(objects, seed, samples, operations=tuple(OPERATIONS), inbox=False):
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Operación desconocida: {', '.join(sorted(unknown))}")
+    graph = SyntheticGraph(objects, seed)
+    start = time.perf_counter()
+    cuoora = graph.build(inbox)
+    build_seconds = time.perf_counter() - start
+    rng = random.Random(seed) # Mismos usuarios y preguntas de muestra en cada corrida
+    results = {name: measure(OPERATIONS[name](cuoora, rng, samples)) for name in operations}
+    return {
+        "config": {"objects": objects, "seed": seed, "samples": samples, "inbox": inbox},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "counts": graph.counts,
+        "build_seconds": build_seconds,
+        "operations": results,
+    }
+
+
+# =================== COMPARACIÓN =================== #
+# Métricas donde más es peor; para el throughput se invierte la razón
+COMPARED = ("p50_us", "p99_us", "ops_per_s", "peak_kib")
+
+def compare(base, new, threshold=0.2): # Razón nueva/base por métrica y operaciones que empeoraron
+    rows = []
+    regressions = []
+    for name, base_result in base["operations"].items():
+        new_result = new["operations"].get(name)
+        if new_result is None:
+            continue
+        ratios = {}
+        for metric in COMPARED:
+            before, after = base_result[metric], new_result[metric]
+            if metric == "ops_per_s":
+                before, after = after, before
+            ratios[metric] = after / before if before else (1.0 if not after else float("inf"))
+        rows.append((name, ratios))
+        if ratios["p50_us"] > 1 + threshold: # La mediana: el throughput arrastra los valores atípicos
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_run(result):
+    config = result["config"]
+    print(f"{sum(result['counts'].values()):,} objetos (semilla {config['seed']}), "
+          f"armado en {result['build_seconds']:.1f} s")
+    header = "".join(f"{f'p{p} us':>12}" for p in PERCENTILES)
+    print(f"{'operación':<20}{header}{'max us':>12}{'ops/s':>12}{'pico KiB':>12}")
+    for name, r in result["operations"].items():
+        values = "".join(f"{r[f'p{p}_us']:>12.1f}" for p in PERCENTILES)
+        print(f"{name:<20}{values}{r['max_us']:>12.1f}{r['ops_per_s']:>12.0f}{r['peak_kib']:>12.1f}")
+
+def print_comparison(base, new, threshold):
+    if base["config"] != new["config"]:
+        print(f"Atención: configuraciones distintas {base['config']} / {new['config']}")
+    rows, regressions = compare(base, new, threshold)
+    print(f"{'operación':<20}" + "".join(f"{metric:>12}" for metric in COMPARED) + "   (nueva / base)")
+    for name, ratios in rows:
+        mark = "  REGRESIÓN" if name in regressions else ""
+        print(f"{name:<20}" + "".join(f"{ratios[metric]:>12.2f}" for metric in COMPARED) + mark)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de CuOOra sobre datos sintéticos")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Mide y opcionalmente guarda el resultado en JSON")
+    run_parser.add_argument("--objects", type=int, default=100_000, help="Objetos aproximados (10^3 a 10^7)")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--samples", type=int, default=200, help="Llamadas medidas por operación")
+    run_parser.add_argument("--operations", nargs="+", default=list(OPERATIONS), choices=list(OPERATIONS))
+    run_parser.add_argument("--inbox", action="store_true", help="Activa la bandeja de todos los usuarios")
+    run_parser.add_argument("--output")
+    compare_parser = commands.add_parser("compare", help="Compara dos corridas; sale con 1 si empeora alguna mediana")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = run(args.objects, args.seed, args.samples, args.operations, args.inbox)
+        print_run(result)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(result, file, indent=2)
+    else:
+        with open(args.base, encoding="utf-8") as file:
+            base = json.load(file)
+        with open(args.new, encoding="utf-8") as file:
+            new = json.load(file)
+        if print_comparison(base, new, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# Genera un CuOOra sintético y reproducible (misma semilla, mismos datos) para medir a escala.
+# Seguidores, intereses, autoría y votos siguen distribuciones de ley de potencias: pocos usuarios
+# concentran la mayoría de los seguidores y pocas preguntas la mayoría de los votos.
+# Uso: python -m benchmarks.synthetic [--objects 100000] [--seed 1]
+import argparse
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from cuoora_bulk_load import BulkLoader
+from cuoora_social_network import CuOOra
+
+NOW = datetime(2024, 3, 1, 18, 0) # Reloj fijo: "hoy" no depende de cuándo se corre
+DAYS = 30 # Las preguntas se reparten en este período, con más peso en los días recientes
+
+# Cantidades promedio por usuario; una escala de N objetos da unos N / OBJECTS_PER_USER usuarios
+FOLLOWS_PER_USER = 10
+TOPICS_PER_USER = 2
+QUESTIONS_PER_USER = 2
+ANSWERS_PER_QUESTION = 1.5
+VOTES_PER_TARGET = 4
+USERS_PER_TOPIC = 100
+OBJECTS_PER_USER = (1 + FOLLOWS_PER_USER + TOPICS_PER_USER + QUESTIONS_PER_USER * (1 + ANSWERS_PER_QUESTION)
+                    + QUESTIONS_PER_USER * (1 + ANSWERS_PER_QUESTION) * VOTES_PER_TARGET)
+
+
+class PowerLaw: # Elige índices en [0, size) con probabilidad proporcional a 1 / (índice + 1) ** exponent
+    def __init__(self, rng, size, exponent=1.0):
+        self.rng = rng
+        self.cum_weights = list(accumulate(1 / (i + 1) ** exponent for i in range(size)))
+        self.total = self.cum_weights[-1]
+
+    def pick(self):
+        return bisect(self.cum_weights, self.rng.random() * self.total)
+
+    def pick_distinct(self, count, excluded=None): # Sin repetir; count debe ser bastante menor que size
+        picked = set()
+        while len(picked) < count:
+            index = self.pick()
+            if index != excluded:
+                picked.add(index)
+        return picked
+
+
+def heavy_tailed(rng, mean, cap, alpha=1.5): # Entero de cola pesada (Pareto) con la media pedida
+    return min(cap, round(mean * (alpha - 1) / alpha * rng.paretovariate(alpha)))
+
+
+class SyntheticGraph: # Registros listos para BulkLoader.load, generados de forma perezosa
+    def __init__(self, objects=100_000, seed=1, now=NOW):
+        self.seed = seed
+        self.now = now
+        self.user_count = max(10, round(objects / OBJECTS_PER_USER))
+        self.topic_count = max(5, self.user_count // USERS_PER_TOPIC)
+        self.question_count = self.user_count * QUESTIONS_PER_USER
+        self.answer_count = round(self.question_count * ANSWERS_PER_QUESTION)
+        self.counts = {}
+
+    def records(self): # Cada llamada regenera exactamente los mismos registros
+        rng = random.Random(self.seed)
+        users = PowerLaw(rng, self.user_count) # Popularidad y actividad: el usuario 0 es el más activo
+        topics = PowerLaw(rng, self.topic_count)
+        questions = PowerLaw(rng, self.question_count)
+        self.counts = dict.fromkeys(("users", "topics", "follows", "interests", "questions", "answers", "votes"), 0)
+        return {
+            "users": self._users(),
+            "topics": self._topics(),
+            "follows": self._follows(rng, users),
+            "interests": self._interests(rng, topics),
+            "questions": self._questions(rng, users, topics),
+            "answers": self._answers(rng, users, questions),
+            "votes": self._votes(rng, users),
+        }
+
+    def _users(self):
+        for i in range(self.user_count):
+            self.counts["users"] += 1
+            yield {"id": i, "username": f"user{i}", "password": f"pass{i}"}
+
+    def _topics(self):
+        for i in range(self.topic_count):
+            self.counts["topics"] += 1
+            yield {"id": i, "name": f"topic{i}", "description": f"Tópico {i}"}
+
+    def _follows(self, rng, users):
+        cap = self.user_count // 10
+        for follower in range(self.user_count):
+            for followed in users.pick_distinct(heavy_tailed(rng, FOLLOWS_PER_USER, cap), follower):
+                self.counts["follows"] += 1
+                yield {"follower": follower, "followed": followed}
+
+    def _interests(self, rng, topics):
+        cap = self.topic_count // 2
+        for a_user in range(self.user_count):
+            for topic in topics.pick_distinct(max(1, heavy_tailed(rng, TOPICS_PER_USER, cap))):
+                self.counts["interests"] += 1
+                yield {"user": a_user, "topic": topic}
+
+    def _questions(self, rng, users, topics):
+        # La edad en días sigue una exponencial: aproximadamente un cuarto de las preguntas son de hoy
+        start_of_today = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+        seconds_today = int((self.now - start_of_today).total_seconds())
+        for i in range(self.question_count):
+            age = min(DAYS - 1, int(rng.expovariate(0.3)))
+            timestamp = start_of_today - timedelta(days=age) + timedelta(seconds=rng.randrange(seconds_today))
+            question_topics = topics.pick_distinct(1 + rng.randrange(min(3, self.topic_count)))
+            self.counts["questions"] += 1
+            yield {"id": i, "user": users.pick(), "title": f"Pregunta {i}", "description": f"Descripción {i}",
+                   "timestamp": timestamp.isoformat(), "topics": ";".join(map(str, sorted(question_topics)))}
+
+    def _answers(self, rng, users, questions):
+        for i in range(self.answer_count):
+            self.counts["answers"] += 1
+            yield {"id": i, "question": questions.pick(), "user": users.pick(), "description": f"Respuesta {i}"}
+
+    def _votes(self, rng, users):
+        # Cantidad de votos por pregunta o respuesta de cola pesada; cada usuario vota una vez por objetivo
+        cap = self.user_count // 10
+        targets = [("question", i) for i in range(self.question_count)]
+        targets += [("answer", i) for i in range(self.answer_count)]
+        for target, target_id in targets:
+            for voter in users.pick_distinct(heavy_tailed(rng, VOTES_PER_TARGET, cap)):
+                self.counts["votes"] += 1
+                yield {"target": target, "target_id": target_id, "user": voter, "like": rng.random() < 0.8}
+
+    def build(self, inbox=False): # CuOOra cargado con todos los registros
+        cuoora = CuOOra(clock=lambda: self.now)
+        loader = BulkLoader(cuoora)
+        loader.load(**self.records())
+        if inbox:
+            for a_user in cuoora.get_users():
+                a_user.enable_inbox()
+        return cuoora
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un CuOOra sintético y reporta su tamaño")
+    parser.add_argument("--objects", type=int, default=100_000, help="Objetos aproximados (10^3 a 10^7)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--inbox", action="store_true", help="Activa la bandeja de todos los usuarios")
+    args = parser.parse_args()
+
+    graph = SyntheticGraph(args.objects, args.seed)
+    start = time.perf_counter()
+    graph.build(args.inbox)
+    elapsed = time.perf_counter() - start
+    for name, count in graph.counts.items():
+        print(f"{name:<10} {count:>12,}")
+    print(f"{'total':<10} {sum(graph.counts.values()):>12,}  ({elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
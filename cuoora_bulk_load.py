@@ -0,0 +1,255 @@
+import csv
+import json
+from collections import ChainMap
+from datetime import datetime
+from pathlib import Path
+
+from cuoora_social_network import Answer, ConcurrencyMode, EMPTY_LIST, EMPTY_SET, NO_VOTES, Question, Topic, User, Vote
+
+# =================== LECTURA DE REGISTROS =================== #
+def read_records(source): # Genera diccionarios desde un archivo .jsonl/.csv o desde un iterable ya armado
+    if source is None:
+        return iter(())
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        return _read_csv(path) if path.suffix.lower() == ".csv" else _read_jsonl(path)
+    return iter(source)
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        yield from csv.DictReader(file)
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "si", "sí")
+    return bool(value)
+
+def _parse_list(value): # En CSV las listas van separadas por ';'
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item for item in value.split(";") if item]
+    return list(value)
+
+
+# =================== CONSTRUCCIÓN SIN EFECTOS LATERALES =================== #
+# Arman las entidades sin pasar por los constructores, que notifican y reordenan en cada alta.
+# Quien las usa es responsable de completar después los índices derivados.
+def new_question(user, title, description, timestamp):
+    question = Question.__new__(Question)
+    question.votes_manager = NO_VOTES
+    question.lock = ConcurrencyMode.new_lock()
+    question.description = description
+    question.timestamp = timestamp
+    question.title = title
+    question.answer_entries = EMPTY_SET
+    question.ranked_answers = EMPTY_LIST
+    question.user = user
+    question.topics = EMPTY_SET
+    question.popularity = None
+    question.system = None
+    return question
+
+def new_answer(question, user, description, timestamp):
+    answer = Answer.__new__(Answer)
+    answer.votes_manager = NO_VOTES
+    answer.lock = ConcurrencyMode.new_lock()
+    answer.description = description
+    answer.timestamp = timestamp
+    answer.user = user
+    answer.question = question
+    return answer
+
+def new_vote(user, is_like, timestamp):
+    vote = Vote.__new__(Vote)
+    vote.is_positive_vote = is_like
+    vote.timestamp = timestamp
+    vote.user = user
+    vote.votes_manager = None
+    vote.store_row = None
+    return vote
+
+def attach_vote(target, vote): # Registra el voto sin avisar al objeto votado
+    manager = target.own_votes_manager()
+    if vote.user in manager.voters:
+        raise ValueError("Este usuario ya ha votado")
+    manager.voters[vote.user] = vote
+    vote.votes_manager = manager
+    if vote.is_positive_vote:
+        manager.positive_count += 1
+    else:
+        manager.negative_count += 1
+
+def rank_answers(question, answers): # Arma el ranking de respuestas con un único ordenamiento
+    question.answer_entries = {}
+    entries = []
+    for order, answer in enumerate(answers):
+        entry = (-Question._net_score(answer), order, answer)
+        question.answer_entries[answer] = entry
+        entries.append(entry)
+    entries.sort()
+    question.ranked_answers = entries
+
+def batch_targets(questions, answers_by_question): # Preguntas y respuestas creadas en un mismo lote
+    yield from questions
+    for answers in answers_by_question.values():
+        yield from answers
+
+
+# =================== CARGA MASIVA =================== #
+class BulkLoader: # Carga en un CuOOra usuarios, seguimientos, tópicos, preguntas, respuestas y votos en lote
+    def __init__(self, cuoora):
+        self.cuoora = cuoora
+        # Id externo -> entidad, para resolver referencias entre archivos
+        self.users = {}
+        self.topics = {}
+        self.questions = {}
+        self.answers = {}
+
+    def load(self, users=None, topics=None, follows=None, interests=None, questions=None, answers=None, votes=None):
+        # Primero se arman las entidades nuevas y se resuelven y validan todas las referencias sin modificar
+        # nada existente: un registro inválido deja el sistema y el cargador como estaban
+        now = self.cuoora.clock()
+        indices = [ChainMap({}, index) for index in (self.users, self.topics, self.questions, self.answers)]
+        user_index, topic_index, question_index, answer_index = indices # Los ids del lote, delante de los ya cargados
+        new_users = self._read_users(read_records(users), user_index)
+        self._read_topics(read_records(topics), topic_index)
+        follows = [(self._get(user_index, record["follower"], "Usuario"), self._get(user_index, record["followed"], "Usuario"))
+                   for record in read_records(follows)]
+        interests = [(self._get(user_index, record["user"], "Usuario"), self._get(topic_index, record["topic"], "Tópico"))
+                     for record in read_records(interests)]
+        new_questions = self._read_questions(read_records(questions), now, user_index, topic_index, question_index)
+        answers_by_question = self._read_answers(read_records(answers), now, user_index, question_index, answer_index)
+        new_votes = self._read_votes(read_records(votes), now, user_index, question_index, answer_index)
+
+        # Aplicación: desde aquí ya no hay referencias por validar
+        for index, staged in zip((self.users, self.topics, self.questions, self.answers), indices):
+            index.update(staged.maps[0])
+        self._apply_follows(follows)
+        for a_user, topic in interests:
+            a_user.add_topic(topic)
+        for question in new_questions:
+            for topic in question.topics:
+                topic.add_question(question)
+            if not question.user.questions:
+                question.user.questions = []
+            question.user.questions.append(question)
+        for question_answers in answers_by_question.values():
+            for answer in question_answers:
+                answer.user.add_answer(answer)
+        targets_in_batch = set(batch_targets(new_questions, answers_by_question))
+        for target, vote in new_votes:
+            if target in targets_in_batch:
+                attach_vote(target, vote)
+            else:
+                target.add_vote(vote)
+            vote.user.add_vote(vote)
+
+        # Índices derivados, una vez que se conocen todos los votos del lote
+        batch_questions = set(new_questions)
+        for question, question_answers in answers_by_question.items():
+            if question in batch_questions:
+                rank_answers(question, question_answers)
+            else:
+                for answer in question_answers:
+                    question.add_answer(answer)
+                    answer.publish("answer_created", answer)
+        for target in batch_targets(new_questions, answers_by_question):
+            if target.positive_votes_count() > target.negative_votes_count():
+                target.user.add_score(target.SCORE_POINTS)
+        for author in dict.fromkeys(question.user for question in new_questions):
+            author.questions_reloaded() # Sus preguntas entraron sin pasar por add_question
+
+        self.cuoora.add_users(new_users)
+        self.cuoora.add_questions(new_questions)
+        return self
+
+    @staticmethod
+    def _get(index, key, kind):
+        try:
+            return index[str(key)]
+        except KeyError:
+            raise ValueError(f"{kind} desconocido: {key}") from None
+
+    @staticmethod
+    def _put(index, key, entity, kind):
+        key = str(key)
+        if key in index:
+            raise ValueError(f"{kind} repetido: {key}")
+        index[key] = entity
+
+    @staticmethod
+    def _timestamp(record, now):
+        return datetime.fromisoformat(record["timestamp"]) if record.get("timestamp") else now
+
+    # ----- Lectura y validación: solo arma entidades nuevas, todavía sin enlazar ----- #
+    def _read_users(self, records, user_index):
+        new_users = []
+        for record in records:
+            a_user = User(record["username"], record["password"])
+            self._put(user_index, record["id"], a_user, "Usuario")
+            new_users.append(a_user)
+        return new_users
+
+    def _read_topics(self, records, topic_index):
+        for record in records:
+            self._put(topic_index, record["id"], Topic(record["name"], record.get("description", "")), "Tópico")
+
+    def _read_questions(self, records, now, user_index, topic_index, question_index):
+        new_questions = []
+        for record in records:
+            author = self._get(user_index, record["user"], "Usuario")
+            question = new_question(author, record["title"], record.get("description", ""), self._timestamp(record, now))
+            self._put(question_index, record["id"], question, "Pregunta")
+            topic_ids = _parse_list(record.get("topics"))
+            if topic_ids:
+                question.topics = {}
+                for topic_id in topic_ids:
+                    topic = self._get(topic_index, topic_id, "Tópico")
+                    if topic in question.topics:
+                        raise ValueError("El tópico ya está agregado")
+                    question.topics[topic] = None
+            new_questions.append(question)
+        return new_questions
+
+    def _read_answers(self, records, now, user_index, question_index, answer_index):
+        answers_by_question = {}
+        for record in records:
+            question = self._get(question_index, record["question"], "Pregunta")
+            author = self._get(user_index, record["user"], "Usuario")
+            answer = new_answer(question, author, record.get("description", ""), self._timestamp(record, now))
+            self._put(answer_index, record["id"], answer, "Respuesta")
+            answers_by_question.setdefault(question, []).append(answer)
+        return answers_by_question
+
+    def _read_votes(self, records, now, user_index, question_index, answer_index):
+        new_votes = []
+        voted = set() # (objeto votado, votante) dentro del lote
+        for record in records:
+            index, kind = (answer_index, "Respuesta") if record["target"] == "answer" else (question_index, "Pregunta")
+            target = self._get(index, record["target_id"], kind)
+            voter = self._get(user_index, record["user"], "Usuario")
+            if (target, voter) in voted or voter in target.votes_manager.voters:
+                raise ValueError("Este usuario ya ha votado")
+            voted.add((target, voter))
+            new_votes.append((target, new_vote(voter, _parse_bool(record.get("like", True)), self._timestamp(record, now))))
+        return new_votes
+
+    # ----- Aplicación ----- #
+    @staticmethod
+    def _apply_follows(follows):
+        for follower, followed in follows:
+            if followed in follower.following: # Repetido
+                continue
+            if not follower.following:
+                follower.following = {}
+            follower.following[followed] = None
+            followed._add_follower(follower)
+            follower.publish("followed", follower, followed)
+
@@ -0,0 +1,459 @@
+import os
+import re
+import struct
+import threading
+import zlib
+from datetime import datetime
+
+from cuoora_social_network import Answer, CuOOra, CuOOraListener, Question, Topic, User, Vote
+from cuoora_snapshot import ANSWER, QUESTION, Snapshot, SnapshotWriter, _from_micros, _to_micros
+
+# Un directorio guarda el último snapshot y el registro de las modificaciones posteriores:
+#   snapshot-<G>.bin  estado completo al comenzar la generación G (no existe para G = 0)
+#   log-<G>.bin       modificaciones de la generación G, en orden
+# Cada registro es: largo (u32), crc32 (u32), tipo (u8) y sus campos. Un registro incompleto
+# o con crc inválido al final del archivo es una escritura interrumpida y se descarta.
+MAGIC = b"CUOORALG"
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct("<8sIQ") # magic, versión, generación
+FRAME = struct.Struct("<II")
+DEFAULT_BATCH_SIZE = 64 # Registros por cada fsync
+DEFAULT_FLUSH_INTERVAL = 0.05 # Segundos que un registro puede esperar su fsync aunque el lote no se complete
+FILE_NAME = re.compile(r"^(snapshot|log)-(\d{8})\.bin$")
+
+# Las entidades se definen en el registro la primera vez que se las menciona y desde ahí se las
+# referencia por su id. Campos: q = entero de 64 bits, B = byte, s = string, L = lista de enteros.
+USER_NEW, USER_ADDED, TOPIC_NEW, QUESTION_NEW, QUESTION_ADDED, ANSWER_NEW, VOTE_ADDED, VOTE_FLIPPED, \
+    FOLLOW, UNFOLLOW, INTEREST, TAG, TITLE, DESCRIPTION, VOTE_REMOVED = range(1, 16)
+SCHEMAS = {
+    USER_NEW: "qss", # id, usuario, contraseña
+    USER_ADDED: "q",
+    TOPIC_NEW: "qss", # id, nombre, descripción
+    QUESTION_NEW: "qqssqL", # id, autor, título, descripción, fecha, tópicos
+    QUESTION_ADDED: "q",
+    ANSWER_NEW: "qqqsq", # id, pregunta, autor, descripción, fecha
+    VOTE_ADDED: "BqqBq", # tipo de objeto votado, id, votante, positivo, fecha
+    VOTE_FLIPPED: "BqqB",
+    FOLLOW: "qq",
+    UNFOLLOW: "qq",
+    INTEREST: "qq", # usuario, tópico
+    TAG: "qq", # pregunta, tópico
+    TITLE: "qs",
+    DESCRIPTION: "Bqs",
+    VOTE_REMOVED: "Bqq", # tipo de objeto votado, id, votante
+}
+INT = struct.Struct("<q")
+LENGTH = struct.Struct("<I")
+
+def _encode(schema, fields):
+    parts = []
+    for code, value in zip(schema, fields):
+        if code == "q":
+            parts.append(INT.pack(value))
+        elif code == "B":
+            parts.append(bytes((value,)))
+        elif code == "s":
+            data = value.encode("utf-8")
+            parts.append(LENGTH.pack(len(data)))
+            parts.append(data)
+        else:
+            parts.append(LENGTH.pack(len(value)))
+            parts.append(struct.pack(f"<{len(value)}q", *value))
+    return b"".join(parts)
+
+def _decode(schema, data, offset):
+    fields = []
+    for code in schema:
+        if code == "q":
+            fields.append(INT.unpack_from(data, offset)[0])
+            offset += 8
+        elif code == "B":
+            fields.append(data[offset])
+            offset += 1
+        else:
+            length = LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            if code == "s":
+                fields.append(bytes(data[offset:offset + length]).decode("utf-8"))
+                offset += length
+            else:
+                fields.append(list(struct.unpack_from(f"<{length}q", data, offset)))
+                offset += 8 * length
+    return fields
+
+def _path(directory, kind, generation):
+    return os.path.join(directory, f"{kind}-{generation:08d}.bin")
+
+def _generations(directory):
+    found = {"snapshot": [], "log": []}
+    for name in os.listdir(directory):
+        match = FILE_NAME.match(name)
+        if match:
+            found[match.group(1)].append(int(match.group(2)))
+    return sorted(found["snapshot"]), sorted(found["log"])
+
+def _fsync_directory(directory):
+    if hasattr(os, "O_DIRECTORY"):
+        descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+# =================== REGISTRO DE EVENTOS =================== #
+class EventLog(CuOOraListener): # Registro de escritura anticipada de un CuOOra; ver open_event_log
+    def __init__(self, cuoora, directory, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.cuoora = cuoora
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval # None: solo se escribe al completar el lote o con flush()
+        self.generation = 0
+        self.file = None
+        self.buffer = bytearray()
+        self.pending = 0
+        self.timer = None # Escribe el lote incompleto al vencer flush_interval
+        self.lock = threading.Lock() # Protege el buffer y el archivo del hilo del timer
+        self.snapshot = None # Snapshot abierto del que se leen los votos perezosos
+        self.compaction = None # Hilo de la compactación en curso
+        # Entidad -> id en la generación actual
+        self.users, self.topics, self.questions, self.answers = {}, {}, {}, {}
+
+    # ----- Escritura ----- #
+    def _emit(self, record_type, *fields):
+        body = bytes((record_type,)) + _encode(SCHEMAS[record_type], fields)
+        with self.lock:
+            self.buffer += FRAME.pack(len(body), zlib.crc32(body))
+            self.buffer += body
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self._write()
+            elif self.timer is None and self.flush_interval is not None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self): # Escribe los registros pendientes con un único fsync
+        with self.lock:
+            self._write()
+
+    def _write(self): # Con el lock tomado
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.buffer:
+            self.file.write(self.buffer)
+            os.fsync(self.file.fileno())
+            self.buffer.clear()
+            self.pending = 0
+
+    def _user_id(self, a_user):
+        user_id = self.users.get(a_user)
+        if user_id is None:
+            user_id = self.users[a_user] = len(self.users)
+            self._emit(USER_NEW, user_id, a_user.get_username(), a_user.get_password())
+        return user_id
+
+    def _topic_id(self, topic):
+        topic_id = self.topics.get(topic)
+        if topic_id is None:
+            topic_id = self.topics[topic] = len(self.topics)
+            self._emit(TOPIC_NEW, topic_id, topic.get_name(), topic.get_description())
+        return topic_id
+
+    def _question_id(self, question): # Al definirla se incluyen sus respuestas y votos actuales
+        question_id = self.questions.get(question)
+        if question_id is None:
+            user_id = self._user_id(question.get_user())
+            topic_ids = [self._topic_id(t) for t in question.topics]
+            question_id = self.questions[question] = len(self.questions)
+            self._emit(QUESTION_NEW, question_id, user_id, question.get_title(), question.get_description(),
+                       _to_micros(question.get_timestamp()), topic_ids)
+            self._emit_votes(QUESTION, question_id, question)
+            for answer in question.answer_entries:
+                self._answer_id(answer)
+        return question_id
+
+    def _answer_id(self, answer):
+        answer_id = self.answers.get(answer)
+        if answer_id is None:
+            question_id = self._question_id(answer.get_question())
+            answer_id = self.answers.get(answer) # Definir la pregunta ya pudo haberla definido
+            if answer_id is None:
+                user_id = self._user_id(answer.get_user())
+                answer_id = self.answers[answer] = len(self.answers)
+                self._emit(ANSWER_NEW, answer_id, question_id, user_id, answer.get_description(),
+                           _to_micros(answer.get_timestamp()))
+                self._emit_votes(ANSWER, answer_id, answer)
+        return answer_id
+
+    def _emit_votes(self, kind, target_id, votable):
+        for vote in votable.get_votes():
+            self._emit(VOTE_ADDED, kind, target_id, self._user_id(vote.get_user()), vote.is_like(),
+                       _to_micros(vote.timestamp))
+
+    def _target(self, votable): # Tipo e id del objeto, o None si recién ahora se lo definió entero
+        if isinstance(votable, Question):
+            if votable in self.questions:
+                return QUESTION, self.questions[votable]
+            self._question_id(votable)
+        else:
+            if votable in self.answers:
+                return ANSWER, self.answers[votable]
+            self._answer_id(votable)
+        return None
+
+    # ----- Modificaciones observadas ----- #
+    def user_added(self, user):
+        user_id = self._user_id(user)
+        # Lo que hizo antes de registrarse no se publicó: se lo vuelca ahora
+        for followed in user.following:
+            self._emit(FOLLOW, user_id, self._user_id(followed))
+        for follower in user.followers:
+            if follower.system is not self.cuoora:
+                self._emit(FOLLOW, self._user_id(follower), user_id)
+        for topic in user.topics_of_interest:
+            self._emit(INTEREST, user_id, self._topic_id(topic))
+        for question in user.questions:
+            self._question_id(question)
+        for answer in user.answers:
+            self._answer_id(answer)
+        for vote in user.votes:
+            if vote.votes_manager is not None and vote.votes_manager.owner is not None:
+                self._target(vote.votes_manager.owner)
+        self._emit(USER_ADDED, user_id)
+
+    def question_created(self, question): self._question_id(question)
+
+    def question_added(self, question): self._emit(QUESTION_ADDED, self._question_id(question))
+
+    def answer_created(self, answer): self._answer_id(answer)
+
+    def vote_added(self, votable, vote):
+        target = self._target(votable)
+        if target is not None:
+            self._emit(VOTE_ADDED, *target, self._user_id(vote.get_user()), vote.is_like(), _to_micros(vote.timestamp))
+
+    def vote_flipped(self, votable, vote):
+        target = self._target(votable)
+        if target is not None:
+            self._emit(VOTE_FLIPPED, *target, self._user_id(vote.get_user()), vote.is_like())
+
+    def vote_removed(self, votable, vote):
+        target = self._target(votable)
+        if target is not None:
+            self._emit(VOTE_REMOVED, *target, self._user_id(vote.get_user()))
+
+    def followed(self, user, followed_user): self._emit(FOLLOW, self._user_id(user), self._user_id(followed_user))
+
+    def unfollowed(self, user, followed_user): self._emit(UNFOLLOW, self._user_id(user), self._user_id(followed_user))
+
+    def topic_added(self, user, topic): self._emit(INTEREST, self._user_id(user), self._topic_id(topic))
+
+    def question_tagged(self, question, topic):
+        if question in self.questions:
+            self._emit(TAG, self.questions[question], self._topic_id(topic))
+        else:
+            self._question_id(question)
+
+    def title_changed(self, question):
+        if question in self.questions:
+            self._emit(TITLE, self.questions[question], question.get_title())
+        else:
+            self._question_id(question)
+
+    def description_changed(self, describable):
+        target = self._target(describable)
+        if target is not None:
+            self._emit(DESCRIPTION, *target, describable.get_description())
+
+    # ----- Reproducción ----- #
+    def _replay(self, path): # Aplica el registro con la API habitual; devuelve dónde termina lo válido
+        with open(path, "rb") as file:
+            data = memoryview(file.read())
+        if len(data) < LOG_HEADER.size:
+            return 0
+        magic, version, generation = LOG_HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("El archivo no es un registro de CuOOra")
+        if version != LOG_VERSION:
+            raise ValueError(f"Versión de registro no soportada: {version}")
+        users, topics = list(self.users), list(self.topics)
+        targets = (list(self.questions), list(self.answers))
+        offset = LOG_HEADER.size
+        while offset + FRAME.size <= len(data):
+            length, checksum = FRAME.unpack_from(data, offset)
+            body = data[offset + FRAME.size:offset + FRAME.size + length]
+            if length == 0 or len(body) < length or zlib.crc32(body) != checksum:
+                break
+            record_type = body[0]
+            self._apply(record_type, _decode(SCHEMAS[record_type], body, 1), users, topics, targets)
+            offset += FRAME.size + length
+        self._set_ids(users, topics, *targets)
+        return offset
+
+    def _apply(self, record_type, fields, users, topics, targets):
+        # Una escritura concurrente con compact() puede quedar en el snapshot y además publicarse en el registro
+        # nuevo: las altas, votos y etiquetas que ya están aplicados se saltean (seguir, dejar de seguir, los
+        # intereses, los cambios de voto y las bajas ya son idempotentes)
+        questions, answers = targets
+        if record_type == USER_NEW:
+            users.append(User(fields[1], fields[2]))
+        elif record_type == USER_ADDED:
+            if users[fields[0]].system is not self.cuoora:
+                self.cuoora.add_user(users[fields[0]])
+        elif record_type == TOPIC_NEW:
+            topics.append(Topic(fields[1], fields[2]))
+        elif record_type == QUESTION_NEW:
+            _, user_id, title, description, micros, topic_ids = fields
+            question = Question(users[user_id], title, description, [topics[i] for i in topic_ids])
+            question.timestamp = _from_micros(micros)
+            questions.append(question)
+        elif record_type == QUESTION_ADDED:
+            question = questions[fields[0]]
+            if question not in self.cuoora.questions_by_day.get(question.get_timestamp().date(), ()):
+                self.cuoora.add_question(question)
+        elif record_type == ANSWER_NEW:
+            _, question_id, user_id, description, micros = fields
+            answer = Answer(questions[question_id], users[user_id], description)
+            answer.timestamp = _from_micros(micros)
+            answers.append(answer)
+        elif record_type == VOTE_ADDED:
+            kind, target_id, user_id, is_like, micros = fields
+            vote = targets[kind][target_id].get_vote_of(users[user_id])
+            if vote is not None: # Ya estaba en el snapshot: queda con el valor publicado
+                vote.like() if is_like else vote.dislike()
+                return
+            vote = Vote(users[user_id], bool(is_like))
+            vote.timestamp = _from_micros(micros)
+            targets[kind][target_id].add_vote(vote)
+        elif record_type == VOTE_FLIPPED:
+            kind, target_id, user_id, is_like = fields
+            vote = targets[kind][target_id].votes_manager.get_vote_of(users[user_id])
+            vote.like() if is_like else vote.dislike()
+        elif record_type == VOTE_REMOVED:
+            kind, target_id, user_id = fields
+            targets[kind][target_id].retract_vote(users[user_id])
+        elif record_type == FOLLOW:
+            users[fields[0]].follow(users[fields[1]])
+        elif record_type == UNFOLLOW:
+            users[fields[0]].stop_follow(users[fields[1]])
+        elif record_type == INTEREST:
+            users[fields[0]].add_topic(topics[fields[1]])
+        elif record_type == TAG:
+            if topics[fields[1]] not in questions[fields[0]].get_topics():
+                questions[fields[0]].add_topic(topics[fields[1]])
+        elif record_type == TITLE:
+            questions[fields[0]].set_title(fields[1])
+        elif record_type == DESCRIPTION:
+            targets[fields[0]][fields[1]].set_description(fields[2])
+        else:
+            raise ValueError(f"Tipo de registro desconocido: {record_type}")
+
+    def _set_ids(self, users, topics, questions, answers):
+        self.users = {a_user: i for i, a_user in enumerate(users)}
+        self.topics = {topic: i for i, topic in enumerate(topics)}
+        self.questions = {question: i for i, question in enumerate(questions)}
+        self.answers = {answer: i for i, answer in enumerate(answers)}
+
+    def _open_log(self, valid_end=None): # Abre el registro de la generación actual para agregar al final
+        path = _path(self.directory, "log", self.generation)
+        if valid_end is None or valid_end < LOG_HEADER.size:
+            with open(path, "wb") as file:
+                file.write(LOG_HEADER.pack(MAGIC, LOG_VERSION, self.generation))
+                os.fsync(file.fileno())
+            _fsync_directory(self.directory)
+        else:
+            with open(path, "r+b") as file: # Descarta la cola de una escritura interrumpida
+                file.truncate(valid_end)
+                os.fsync(file.fileno())
+        self.file = open(path, "ab", buffering=0)
+
+    # ----- Compactación ----- #
+    def compact(self, background=True):
+        # Congela el estado actual y pasa a la siguiente generación; el snapshot se escribe aparte.
+        # En modo concurrente una escritura en curso puede entrar al snapshot y publicarse después en el
+        # registro nuevo; la reproducción saltea lo que ya encuentra aplicado (ver _apply)
+        self.wait()
+        with self.cuoora.publish_lock, self.lock:
+            self._write()
+            writer = SnapshotWriter(self.cuoora).collect()
+            old_generation = self.generation
+            self.file.close()
+            self.generation += 1
+            self._set_ids(writer.users, writer.topics, writer.questions, writer.answers)
+            self._open_log()
+        if background:
+            self.compaction = threading.Thread(target=self._write_snapshot, args=(writer, old_generation))
+            self.compaction.start()
+        else:
+            self._write_snapshot(writer, old_generation)
+
+    def _write_snapshot(self, writer, old_generation):
+        path = _path(self.directory, "snapshot", old_generation + 1)
+        writer.write(path + ".tmp")
+        with open(path + ".tmp", "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_directory(self.directory)
+        _remove_generations(self.directory, below=old_generation + 1)
+
+    def wait(self): # Espera a que termine la compactación en curso
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    def close(self):
+        if self.file is None:
+            return
+        self.wait()
+        with self.lock:
+            self._write()
+            self.file.close()
+            self.file = None
+        self.cuoora.remove_listener(self)
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+def _remove_generations(directory, below):
+    for name in os.listdir(directory):
+        match = FILE_NAME.match(name)
+        if (match and int(match.group(2)) < below) or name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+
+def open_event_log(directory, clock=datetime.now, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+    # Recupera el CuOOra guardado en el directorio (o uno vacío) y le conecta el registro
+    os.makedirs(directory, exist_ok=True)
+    snapshots, logs = _generations(directory)
+    if snapshots:
+        generation = snapshots[-1]
+        snapshot = Snapshot(_path(directory, "snapshot", generation))
+        log = EventLog(snapshot.restore(clock), directory, batch_size, flush_interval)
+        log.snapshot = snapshot
+        log._set_ids(snapshot.users, snapshot.topics, *snapshot.targets)
+    else:
+        generation = 0
+        log = EventLog(CuOOra(clock), directory, batch_size, flush_interval)
+    _remove_generations(directory, below=generation)
+
+    # Si la compactación se interrumpió antes de publicar su snapshot quedan registros más nuevos:
+    # sus ids salen del mismo recorrido que habría hecho el snapshot sobre el estado reproducido
+    pending = [g for g in logs if g >= generation] or [generation]
+    valid_end = None
+    for generation in pending:
+        if generation != pending[0]:
+            writer = SnapshotWriter(log.cuoora).collect()
+            log._set_ids(writer.users, writer.topics, writer.questions, writer.answers)
+        log.generation = generation
+        path = _path(directory, "log", generation)
+        valid_end = log._replay(path) if os.path.exists(path) else None
+    log._open_log(valid_end)
+    log.cuoora.add_listener(log)
+    if len(pending) > 1:
+        log.compact(background=False)
+    return log
@@ -0,0 +1,140 @@
+import heapq
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+from cuoora_social_network import IQuestionRetriever, QuestionRetrieverFactory
+
+STRATEGIES = QuestionRetrieverFactory.STRATEGIES
+DEFAULT_CHUNK_SIZE = 256
+
+# Los feeds se calculan sobre ids para que el trabajo viaje barato entre procesos: el contexto
+# compartido (autores, votos, preguntas de hoy, promedio de hoy) se arma una vez por lote y cada
+# proceso lo recibe una sola vez; por tarea viaja solo lo propio de cada usuario.
+
+# =================== CONTEXTO COMPARTIDO =================== #
+class FeedContext: # Foto del sistema en ids, con el trabajo común a todos los pedidos ya hecho
+    def __init__(self, cuoora, strategies):
+        self.questions = [] # Id -> pregunta, solo en el proceso principal
+        self.question_ids = {}
+        self.user_ids = {}
+        self.authors = array('q') # Id de pregunta -> id de su autor
+        self.positives = array('q') # Id de pregunta -> votos positivos al momento de armar el contexto
+        self.user_questions = {} # Id de usuario seguido -> ids de sus preguntas
+        self.topic_ids = {}
+        self.topic_questions = {} # Id de tópico -> ids de sus preguntas
+        self.today = array('q')
+        self.popular_today = array('q')
+
+        now = cuoora.clock() # "Hoy" se resuelve una sola vez para todo el lote
+        if "news" in strategies or "popular_today" in strategies:
+            today_questions = cuoora.get_questions_of_day(now.date())
+            self.today.extend(self._question_id(q) for q in today_questions)
+            if today_questions:
+                average = sum(self.positives[i] for i in self.today) / len(self.today)
+                self.popular_today.extend(i for i in self.today if self.positives[i] > average)
+
+    def _question_id(self, question):
+        question_id = self.question_ids.get(question)
+        if question_id is None:
+            question_id = self.question_ids[question] = len(self.questions)
+            self.questions.append(question)
+            self.authors.append(self._user_id(question.get_user()))
+            self.positives.append(question.positive_votes_count())
+        return question_id
+
+    def _user_id(self, a_user):
+        user_id = self.user_ids.get(a_user)
+        if user_id is None:
+            user_id = self.user_ids[a_user] = len(self.user_ids)
+        return user_id
+
+    def request_of(self, a_user, strategies): # Lo propio de un usuario: a quién sigue y sus tópicos
+        following = topics = None
+        if "social" in strategies:
+            following = array('q')
+            for followed in a_user.get_following():
+                followed_id = self._user_id(followed)
+                following.append(followed_id)
+                if followed_id not in self.user_questions:
+                    self.user_questions[followed_id] = array('q', map(self._question_id, followed.get_questions()))
+        if "topics" in strategies:
+            topics = array('q')
+            for topic in a_user.get_topics_of_interest():
+                topic_id = self.topic_ids.get(topic)
+                if topic_id is None:
+                    topic_id = self.topic_ids[topic] = len(self.topic_ids)
+                    self.topic_questions[topic_id] = array('q', map(self._question_id, topic.get_questions()))
+                topics.append(topic_id)
+        return self._user_id(a_user), following, topics
+
+    def shared(self): # Lo que se envía una vez a cada proceso
+        return self.authors, self.positives, self.user_questions, self.topic_questions, self.today, self.popular_today
+
+
+# =================== RANKING POR USUARIO =================== #
+# Mismo criterio que los recuperadores: excluir las propias, top-k estable por votos positivos
+_shared = None # Contexto de los procesos del pool; en este proceso se pasa explícitamente
+
+def _install(shared):
+    global _shared
+    _shared = shared
+
+def _top(candidates, user_id, limit, authors, positives):
+    return heapq.nlargest(limit, (q for q in candidates if authors[q] != user_id), key=positives.__getitem__)
+
+def _feeds_of(request, strategies, limit, shared):
+    authors, positives, user_questions, topic_questions, today, popular_today = shared
+    user_id, following, topics = request
+    feeds = []
+    for strategy in strategies:
+        if strategy == "social": # Con o sin bandeja el feed es el mismo: todas las de los seguidos
+            candidates = [q for f in following for q in user_questions[f]]
+            feeds.append(_top(candidates, user_id, limit, authors, positives))
+        elif strategy == "topics":
+            ranked = [_top(topic_questions[t], user_id, limit, authors, positives) for t in topics]
+            merged = heapq.merge(*ranked, key=positives.__getitem__, reverse=True)
+            feeds.append(list(islice(dict.fromkeys(merged), limit)))
+        elif strategy == "news":
+            feeds.append(_top(today, user_id, limit, authors, positives))
+        else:
+            feeds.append(_top(popular_today, user_id, limit, authors, positives))
+    return feeds
+
+def _rank_chunk(requests, strategies, limit, shared=None):
+    shared = _shared if shared is None else shared
+    return [(request[0], _feeds_of(request, strategies, limit, shared)) for request in requests]
+
+
+# =================== API DE LOTE =================== #
+def precompute_feeds(cuoora, users, strategies=STRATEGIES, limit=IQuestionRetriever.DEFAULT_LIMIT,
+                     workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Genera (usuario, estrategia, preguntas) a medida que se completan, en cualquier orden.
+    # workers=0 calcula en este proceso; None usa tantos procesos como CPUs.
+    strategies = tuple(strategies)
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Estrategia desconocida: {', '.join(sorted(unknown))}")
+    context = FeedContext(cuoora, strategies)
+    users_by_id = {}
+    requests = []
+    for a_user in users:
+        request = context.request_of(a_user, strategies)
+        users_by_id[request[0]] = a_user
+        requests.append(request)
+    chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+
+    def results(ranked_chunk):
+        for user_id, feeds in ranked_chunk:
+            for strategy, question_ids in zip(strategies, feeds):
+                yield users_by_id[user_id], strategy, [context.questions[i] for i in question_ids]
+
+    if workers == 0: # Cada generador usa su propio contexto aunque se consuman intercalados
+        shared = context.shared()
+        for chunk in chunks:
+            yield from results(_rank_chunk(chunk, strategies, limit, shared))
+        return
+    with ProcessPoolExecutor(workers, initializer=_install, initargs=(context.shared(),)) as pool:
+        futures = [pool.submit(_rank_chunk, chunk, strategies, limit) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from results(future.result())
@@ -0,0 +1,114 @@
+import heapq
+from array import array
+
+# Exportación del grafo de seguimientos a matrices dispersas CSR y recomendaciones de a quién seguir.
+# Las matrices son una foto: lo que cambie después en el CuOOra no se refleja hasta armar otra.
+
+# =================== MATRICES DISPERSAS =================== #
+class CSRMatrix: # Matriz dispersa de ceros y unos; la fila i tiene unos en las columnas indices[indptr[i]:indptr[i + 1]]
+    def __init__(self, indptr, indices, shape):
+        self.indptr = indptr
+        self.indices = indices
+        self.shape = shape
+
+    @staticmethod
+    def from_rows(rows, columns): # Cada fila es un iterable de índices de columna
+        indptr = array('q', [0])
+        indices = array('q')
+        for row in rows:
+            indices.extend(row)
+            indptr.append(len(indices))
+        return CSRMatrix(indptr, indices, (len(indptr) - 1, columns))
+
+    def row(self, i): return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def row_length(self, i): return self.indptr[i + 1] - self.indptr[i]
+
+    def nnz(self): return len(self.indices)
+
+    def transpose(self): # Por conteo, en O(filas + columnas + nnz); cada fila queda ordenada
+        rows, columns = self.shape
+        counts = array('q', bytes(8 * (columns + 1)))
+        for column in self.indices:
+            counts[column + 1] += 1
+        for column in range(columns):
+            counts[column + 1] += counts[column]
+        indptr = array('q', counts)
+        indices = array('q', bytes(8 * len(self.indices)))
+        for row in range(rows):
+            for column in self.row(row):
+                indices[counts[column]] = row
+                counts[column] += 1
+        return CSRMatrix(indptr, indices, (columns, rows))
+
+
+def follow_matrix(users): # Fila = seguidor, columna = seguido, en el orden de 'users'; ignora a los que no estén
+    user_ids = {a_user: i for i, a_user in enumerate(users)}
+    rows = ((user_ids[f] for f in a_user.following if f in user_ids) for a_user in users)
+    return CSRMatrix.from_rows(rows, len(user_ids))
+
+def interest_matrix(users): # Fila = usuario, columna = tópico; devuelve la matriz y los tópicos por columna
+    topic_ids = {}
+    rows = [[topic_ids.setdefault(t, len(topic_ids)) for t in a_user.topics_of_interest] for a_user in users]
+    return CSRMatrix.from_rows(rows, len(topic_ids)), list(topic_ids)
+
+
+# =================== RECOMENDACIONES =================== #
+class FollowRecommender: # A quién seguir: amigos de amigos y tópicos en común
+    # Puntaje de un candidato c para el usuario u:
+    #   (cantidad de seguidos de u que siguen a c) + TOPIC_WEIGHT * (tópicos de interés en común)
+    # es la fila u de F·F + TOPIC_WEIGHT * T·Tᵀ, que se arma recorriendo solo los unos de cada fila.
+    # Se excluyen u y quienes u ya sigue. Los tópicos con más de max_topic_fanout interesados no traen
+    # candidatos nuevos (serían casi todo el sistema): solo suman a los ya encontrados.
+    DEFAULT_LIMIT = 10
+    TOPIC_WEIGHT = 0.5
+    MAX_TOPIC_FANOUT = 1000
+
+    def __init__(self, users, topic_weight=TOPIC_WEIGHT, max_topic_fanout=MAX_TOPIC_FANOUT):
+        self.users = list(users)
+        self.user_ids = {a_user: i for i, a_user in enumerate(self.users)}
+        self.topic_weight = topic_weight
+        self.follows = follow_matrix(self.users)
+        self.interests, self.topics = interest_matrix(self.users)
+        self.interested = self.interests.transpose()
+        self.large_topics = {topic_id: set(self.interested.row(topic_id)) for topic_id in range(len(self.topics))
+                             if self.interested.row_length(topic_id) > max_topic_fanout}
+
+    def scores(self, user_id): # Candidato -> puntaje, para la fila user_id
+        follows, interests, interested = self.follows, self.interests, self.interested
+        scores = {}
+        get = scores.get
+        for followed in follows.row(user_id):
+            for candidate in follows.row(followed):
+                scores[candidate] = get(candidate, 0) + 1
+        large = []
+        for topic_id in interests.row(user_id):
+            members = self.large_topics.get(topic_id)
+            if members is not None:
+                large.append(members)
+                continue
+            for candidate in interested.row(topic_id):
+                scores[candidate] = get(candidate, 0) + self.topic_weight
+        for members in large:
+            for candidate in scores:
+                if candidate in members:
+                    scores[candidate] += self.topic_weight
+        scores.pop(user_id, None)
+        for followed in follows.row(user_id):
+            scores.pop(followed, None)
+        return scores
+
+    def _top(self, user_id, limit): # Mayor puntaje primero; ante empates, el que se registró antes
+        scores = self.scores(user_id)
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.users[candidate], score) for candidate, score in best]
+
+    def recommend(self, a_user, limit=DEFAULT_LIMIT): # Lista de (usuario, puntaje)
+        user_id = self.user_ids.get(a_user)
+        if user_id is None:
+            raise ValueError("El usuario no está en el grafo")
+        return self._top(user_id, limit)
+
+    def recommend_all(self, limit=DEFAULT_LIMIT): # Genera (usuario, recomendaciones) para todos, en orden
+        for user_id, a_user in enumerate(self.users):
+            yield a_user, self._top(user_id, limit)
@@ -0,0 +1,182 @@
+import heapq
+import math
+import re
+import unicodedata
+
+from cuoora_social_network import Answer, ConcurrencyMode, CuOOraListener, Question
+
+# Índice invertido en memoria sobre títulos y descripciones de preguntas y descripciones de respuestas.
+# Se arma con lo que ya tiene el CuOOra y se mantiene al día con las modificaciones publicadas: una
+# pregunta entra al índice al agregarse al sistema (con sus respuestas), y una respuesta al crearse si
+# su pregunta ya está indexada. Los cambios de una pregunta llegan por el sistema al que se agregó,
+# aunque su autor no esté registrado en él. Votos, tópicos y fechas se leen al buscar, así que no hace
+# falta reindexar cuando cambian.
+TOKEN = re.compile(r"\w+")
+
+def tokenize(text): # Minúsculas y sin tildes: "Canción" y "cancion" son el mismo término
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return TOKEN.findall(text)
+
+
+# =================== ÍNDICE =================== #
+class SearchIndex(CuOOraListener): # Búsqueda con ranking BM25 sobre el contenido de un CuOOra
+    K1 = 1.2
+    B = 0.75
+    TITLE_WEIGHT = 2 # Cada aparición en el título cuenta como dos en la descripción
+    DEFAULT_LIMIT = 20
+    # Con términos más raros en la consulta, los que aparecen en más de esta fracción de los documentos
+    # ("que", "es", "de") solo puntúan documentos ya encontrados: aportan poco y sus listas son enormes
+    COMMON_TERM_RATIO = 0.01
+    COMMON_TERM_MIN_DOCUMENTS = 1000 # En índices chicos recorrer todo es barato y se respeta el OR completo
+
+    def __init__(self, cuoora):
+        self.cuoora = cuoora
+        self.postings = {} # Término -> {id de documento: frecuencia ponderada}
+        self.documents = [] # Id -> pregunta o respuesta
+        self.document_ids = {}
+        self.texts = [] # Id -> textos indexados, para poder quitar sus términos al cambiar
+        self.lengths = [] # Id -> cantidad ponderada de términos
+        self.total_length = 0
+        self.lock = ConcurrencyMode.new_lock()
+        for question in cuoora.get_questions():
+            self._add_question(question)
+        cuoora.add_listener(self)
+
+    def close(self):
+        if self in self.cuoora.listeners:
+            self.cuoora.remove_listener(self)
+
+    def __len__(self): return len(self.documents)
+
+    # ----- Mantenimiento ----- #
+    @staticmethod
+    def _texts(document):
+        if isinstance(document, Question):
+            return document.get_title(), document.get_description()
+        return "", document.get_description()
+
+    def _terms(self, texts): # Término -> frecuencia ponderada
+        title, description = texts
+        terms = {}
+        for term in tokenize(title):
+            terms[term] = terms.get(term, 0) + SearchIndex.TITLE_WEIGHT
+        for term in tokenize(description):
+            terms[term] = terms.get(term, 0) + 1
+        return terms
+
+    def _index(self, document_id, texts):
+        terms = self._terms(texts)
+        for term, frequency in terms.items():
+            documents = self.postings.get(term)
+            if documents is None:
+                documents = self.postings[term] = {}
+            documents[document_id] = frequency
+        length = sum(terms.values())
+        self.texts[document_id] = texts
+        self.lengths[document_id] = length
+        self.total_length += length
+
+    def _unindex(self, document_id):
+        for term in self._terms(self.texts[document_id]):
+            documents = self.postings[term]
+            del documents[document_id]
+            if not documents:
+                del self.postings[term]
+        self.total_length -= self.lengths[document_id]
+
+    def _add(self, document):
+        with self.lock:
+            if document in self.document_ids:
+                return
+            document_id = self.document_ids[document] = len(self.documents)
+            self.documents.append(document)
+            self.texts.append(None)
+            self.lengths.append(0)
+            self._index(document_id, SearchIndex._texts(document))
+
+    def _add_question(self, question):
+        self._add(question)
+        for answer in question.get_answers():
+            self._add(answer)
+
+    def _reindex(self, document):
+        with self.lock:
+            document_id = self.document_ids.get(document)
+            if document_id is not None:
+                self._unindex(document_id)
+                self._index(document_id, SearchIndex._texts(document))
+
+    # ----- Modificaciones observadas ----- #
+    def question_added(self, question): self._add_question(question)
+
+    def answer_created(self, answer):
+        if answer.get_question() in self.document_ids:
+            self._add(answer)
+
+    def title_changed(self, question): self._reindex(question)
+
+    def description_changed(self, describable): self._reindex(describable)
+
+    # ----- Búsqueda ----- #
+    def search(self, query, limit=DEFAULT_LIMIT, topics=None, since=None, until=None, kind=None, vote_boost=0.0):
+        # Devuelve hasta 'limit' pares (pregunta o respuesta, puntaje), del más relevante al menos relevante.
+        #   topics: solo contenido de preguntas con alguno de esos tópicos (las respuestas, por su pregunta)
+        #   since/until: timestamp en [since, until)
+        #   kind: Question o Answer para buscar solo uno de los dos
+        #   vote_boost: multiplica el puntaje por 1 + vote_boost * log(1 + votos positivos - negativos)
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self.lock:
+            if not self.documents or not terms:
+                return []
+            count = len(self.documents)
+            average_length = self.total_length / count or 1
+            # Los términos más raros primero: son los que más pesan y los que traen menos candidatos
+            weighted = sorted(((self.postings[t], self._idf(len(self.postings[t]), count))
+                               for t in terms if t in self.postings), key=lambda posting: len(posting[0]))
+            scores = {}
+            k1, b = SearchIndex.K1, SearchIndex.B
+            lengths = self.lengths
+            length_factor = k1 * b / average_length
+            common = max(count * SearchIndex.COMMON_TERM_RATIO, SearchIndex.COMMON_TERM_MIN_DOCUMENTS)
+            for documents, idf in weighted:
+                if scores and len(documents) > common:
+                    pairs = [(d, documents[d]) for d in scores if d in documents]
+                else:
+                    pairs = documents.items()
+                weight = idf * (k1 + 1)
+                get = scores.get
+                for document_id, frequency in pairs:
+                    norm = k1 - k1 * b + length_factor * lengths[document_id]
+                    scores[document_id] = get(document_id, 0.0) + weight * frequency / (frequency + norm)
+            results = ((self.documents[d], score) for d, score in scores.items())
+            results = SearchIndex._filtered(results, topics, since, until, kind)
+            if vote_boost:
+                results = ((d, score * (1 + vote_boost * math.log1p(max(0, SearchIndex._net_votes(d)))))
+                           for d, score in results)
+            return heapq.nlargest(limit, results, key=lambda result: result[1])
+
+    @staticmethod
+    def _idf(frequency, count): # Variante sin valores negativos: un término presente en todos igual suma algo
+        return math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    @staticmethod
+    def _filtered(results, topics, since, until, kind):
+        if kind is not None:
+            results = ((d, score) for d, score in results if isinstance(d, kind))
+        if topics is not None:
+            topics = set(topics)
+            results = ((d, score) for d, score in results if not topics.isdisjoint(SearchIndex._question_of(d).topics))
+        if since is not None:
+            results = ((d, score) for d, score in results if d.get_timestamp() >= since)
+        if until is not None:
+            results = ((d, score) for d, score in results if d.get_timestamp() < until)
+        return results
+
+    @staticmethod
+    def _net_votes(document): return document.positive_votes_count() - document.negative_votes_count()
+
+    @staticmethod
+    def _question_of(document):
+        return document.get_question() if isinstance(document, Answer) else document
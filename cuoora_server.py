@@ -0,0 +1,247 @@
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cuoora_social_network import CuOOraListener
+
+# Capa de servicio asyncio sobre un CuOOra. El ciclo de eventos solo enruta: los feeds se calculan y
+# los votos se escriben en un pool de hilos, con el CuOOra en modo concurrente.
+#   Coalescencia: pedidos idénticos (estrategia, usuario, límite) que llegan mientras el primero se
+#   calcula esperan ese mismo resultado en vez de recalcularlo.
+#   Votos en lote: se acumulan hasta VOTE_BATCH_SIZE o VOTE_FLUSH_INTERVAL y se escriben en una sola
+#   tarea del pool; cada votante recibe su propio resultado.
+#   Contrapresión: con max_pending cálculos o votos en espera, lo nuevo se rechaza al instante.
+#   Plazos: cada pedido espera su feed hasta 'deadline' segundos; el cálculo sigue para los demás.
+# Todo el estado del servicio se toca solo desde el ciclo de eventos.
+FEEDS = {
+    "social": "get_social_questions_for_user",
+    "topics": "get_topic_questions_for_user",
+    "news": "get_news_questions_for_user",
+    "popular_today": "get_popular_questions_for_user",
+    "blended": "get_blended_questions_for_user",
+}
+
+# =================== SERVICIO =================== #
+class FeedService:
+    DEFAULT_WORKERS = 4
+    DEFAULT_MAX_PENDING = 256
+    DEFAULT_DEADLINE = 1.0 # Segundos
+    VOTE_BATCH_SIZE = 128
+    VOTE_FLUSH_INTERVAL = 0.005 # Segundos que espera un voto a que se complete su lote
+
+    def __init__(self, cuoora, executor=None, max_pending=DEFAULT_MAX_PENDING, deadline=DEFAULT_DEADLINE,
+                 vote_batch_size=VOTE_BATCH_SIZE, vote_flush_interval=VOTE_FLUSH_INTERVAL):
+        self.cuoora = cuoora
+        cuoora.enable_concurrency() # Los feeds se leen en el pool mientras otros hilos escriben votos; close lo devuelve
+        self.closed = False
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(FeedService.DEFAULT_WORKERS, thread_name_prefix="cuoora")
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.vote_batch_size = vote_batch_size
+        self.vote_flush_interval = vote_flush_interval
+        self.in_flight = {} # (estrategia, usuario, límite) -> futuro del cálculo en curso
+        self.votes = [] # (usuario, pregunta, positivo, futuro) a la espera de su lote
+        self.vote_timer = None
+        self.writing = set() # Lotes de votos que se están escribiendo
+        self.stats = {"computed": 0, "coalesced": 0, "rejected": 0, "expired": 0, "votes": 0, "vote_batches": 0}
+
+    # ----- Feeds ----- #
+    async def get_feed(self, strategy, user, limit=20, deadline=None):
+        getter = FEEDS.get(strategy)
+        if getter is None:
+            raise ValueError(f"Estrategia desconocida: {strategy}")
+        key = (strategy, user, limit)
+        future = self.in_flight.get(key)
+        if future is None:
+            if len(self.in_flight) >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise ValueError("Servicio sobrecargado")
+            future = asyncio.get_running_loop().run_in_executor(self.executor, getattr(self.cuoora, getter), user, limit)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.stats["computed"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        try:
+            # shield: si este pedido vence, el cálculo sigue para los que esperan el mismo resultado
+            questions = await asyncio.wait_for(asyncio.shield(future), self.deadline if deadline is None else deadline)
+        except asyncio.TimeoutError:
+            self.stats["expired"] += 1
+            raise ValueError("Plazo vencido") from None
+        return list(questions)
+
+    # ----- Votos ----- #
+    async def vote(self, user, question, is_like=True):
+        if len(self.votes) >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise ValueError("Servicio sobrecargado")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.votes.append((user, question, is_like, future))
+        if len(self.votes) >= self.vote_batch_size:
+            self._flush_votes()
+        elif self.vote_timer is None:
+            self.vote_timer = loop.call_later(self.vote_flush_interval, self._flush_votes)
+        await future # Sin plazo: un voto vencido igual podría quedar escrito
+
+    def _flush_votes(self):
+        if self.vote_timer is not None:
+            self.vote_timer.cancel()
+            self.vote_timer = None
+        batch, self.votes = self.votes, []
+        if not batch:
+            return
+        self.stats["votes"] += len(batch)
+        self.stats["vote_batches"] += 1
+        writing = asyncio.get_running_loop().run_in_executor(self.executor, FeedService._write_votes, batch)
+        self.writing.add(writing)
+        writing.add_done_callback(lambda done: self._votes_written(batch, done))
+
+    @staticmethod
+    def _write_votes(batch): # En el pool: todo el lote en una tarea, agrupado por pregunta
+        errors = [None] * len(batch)
+        for i in sorted(range(len(batch)), key=lambda i: id(batch[i][1])):
+            a_user, question, is_like, _ = batch[i]
+            try:
+                with question.lock: # Se rechaza antes de crear el voto: uno nuevo ya queda en a_user.votes
+                    if question.get_vote_of(a_user) is not None:
+                        raise ValueError("Este usuario ya ha votado")
+                    question.cast_vote(a_user, is_like)
+            except ValueError as error:
+                errors[i] = error
+        return errors
+
+    def _votes_written(self, batch, done):
+        self.writing.discard(done)
+        errors = done.exception() or done.result()
+        for i, (_, _, _, future) in enumerate(batch):
+            if future.done(): # Lo canceló quien votaba
+                continue
+            error = errors if isinstance(errors, BaseException) else errors[i]
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def close(self): # Escribe los votos pendientes, espera los feeds en curso y libera el pool propio
+        if self.closed:
+            return
+        self.closed = True
+        self._flush_votes()
+        pending = [*self.writing, *self.in_flight.values()]
+        if pending: # El modo concurrente no se retira debajo de un cálculo que todavía corre
+            await asyncio.wait(pending)
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+        self.cuoora.disable_concurrency()
+
+
+# =================== SERVIDOR =================== #
+class FeedServer(CuOOraListener): # Protocolo de líneas JSON sobre TCP; cada conexión atiende sus pedidos de a uno
+    # {"op": "feed", "strategy": "social", "user": "nombre", "limit": 20}
+    #     -> {"ok": true, "questions": [{"id": 0, "title": "...", "user": "...", "votes": 3}, ...]}
+    # {"op": "vote", "user": "nombre", "question": 0, "like": true} -> {"ok": true}
+    # Los errores responden {"ok": false, "error": "..."}. Las preguntas se identifican con el id que
+    # les asignó el servidor al entregarlas en un feed; recuerda las QUESTION_ID_CAPACITY entregadas más
+    # recientemente y un id olvidado responde como pregunta desconocida.
+    QUESTION_ID_CAPACITY = 4096
+
+    def __init__(self, service, host="127.0.0.1", port=0, question_id_capacity=QUESTION_ID_CAPACITY):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.server = None
+        # Nombre -> usuario; los usuarios nuevos llegan con user_added
+        self.users = {a_user.get_username(): a_user for a_user in service.cuoora.get_users()}
+        service.cuoora.add_listener(self)
+        self.question_id_capacity = question_id_capacity
+        self.questions = OrderedDict() # Id -> pregunta, de la entregada hace más tiempo a la más reciente
+        self.question_ids = {}
+        self.next_question_id = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self in self.service.cuoora.listeners:
+            self.service.cuoora.remove_listener(self)
+        await self.service.close()
+
+    async def __aenter__(self): return await self.start()
+
+    async def __aexit__(self, *exc_info): await self.close()
+
+    # ----- Eventos del sistema ----- #
+    def user_added(self, user): self.users[user.get_username()] = user
+
+    def _user(self, username):
+        if not isinstance(username, str):
+            raise ValueError(f"Usuario inválido: {username!r}")
+        a_user = self.users.get(username)
+        if a_user is None or a_user.get_username() != username: # Un renombrado no responde por su nombre anterior
+            raise ValueError(f"Usuario desconocido: {username}")
+        return a_user
+
+    def _describe(self, question):
+        question_id = self.question_ids.get(question)
+        if question_id is None:
+            question_id = self.question_ids[question] = self.next_question_id
+            self.next_question_id += 1
+            self.questions[question_id] = question
+            if len(self.questions) > self.question_id_capacity:
+                _, forgotten = self.questions.popitem(last=False)
+                del self.question_ids[forgotten]
+        else:
+            self.questions.move_to_end(question_id)
+        return {"id": question_id, "title": question.get_title(), "user": question.get_user().get_username(),
+                "votes": question.positive_votes_count()}
+
+    async def _handle(self, request):
+        operation = request.get("op")
+        if operation == "feed":
+            user = self._user(request.get("user"))
+            strategy, limit = request.get("strategy"), request.get("limit", 20)
+            if not isinstance(strategy, str):
+                raise ValueError(f"Estrategia inválida: {strategy!r}")
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+                raise ValueError(f"Límite inválido: {limit!r}")
+            questions = await self.service.get_feed(strategy, user, limit)
+            return {"ok": True, "questions": [self._describe(q) for q in questions]}
+        if operation == "vote":
+            question_id, like = request.get("question"), request.get("like", True)
+            valid_id = isinstance(question_id, int) and not isinstance(question_id, bool)
+            question = self.questions.get(question_id) if valid_id else None
+            if question is None:
+                raise ValueError(f"Pregunta desconocida: {question_id}")
+            if not isinstance(like, bool):
+                raise ValueError(f"Voto inválido: {like!r}")
+            await self.service.vote(self._user(request.get("user")), question, like)
+            return {"ok": True}
+        raise ValueError(f"Operación desconocida: {operation}")
+
+    async def _serve(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Se esperaba un objeto JSON")
+                    response = await self._handle(request)
+                except ValueError as error: # json.JSONDecodeError también es un ValueError
+                    response = {"ok": False, "error": str(error)}
+                except Exception: # Un pedido fallido no corta la conexión ni los pedidos siguientes
+                    response = {"ok": False, "error": "Error interno"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
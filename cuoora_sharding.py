@@ -0,0 +1,367 @@
+import heapq
+import multiprocessing
+import threading
+import zlib
+from datetime import datetime
+from itertools import chain, islice
+
+from cuoora_social_network import (CuOOra, IQuestionRetriever, NewsQuestionRetriever, PopularTodayQuestionRetriever,
+                                   Question, SocialQuestionRetriever, Topic, TopicsQuestionRetriever, User, Vote)
+
+# Despliegue particionado: cada usuario vive en el shard hash(nombre) % shards junto con sus preguntas y los
+# votos que reciben. El coordinador guarda solo lo necesario para enrutar (a quién sigue cada uno, sus
+# tópicos, en qué shard está cada pregunta) y trabaja con ids enteros: las entidades viven en los shards.
+#
+# Cada shard resuelve su parte con los recuperadores de siempre (_filter_and_sort) y devuelve su top-k con
+# la clave de desempate que usa el orden de un único CuOOra; el coordinador mezcla los parciales:
+#   social         posición del seguido en la lista del lector, orden de las preguntas del autor (= id)
+#   topics         por tópico, el orden en que se etiquetaron sus preguntas
+#   news/popular   timestamp y orden de alta en el sistema; popular suma además votos y preguntas del día
+# Así los resultados son idénticos a los de un CuOOra con los mismos datos y sin bandejas.
+
+# =================== SHARD =================== #
+class Shard: # Parte del sistema que vive en un proceso trabajador
+    def __init__(self):
+        self.cuoora = CuOOra()
+        self.users = {} # Id -> usuario propio, o un suplente para lectores y votantes de otros shards
+        self.topics = {} # Id -> copia local del tópico
+        self.questions = {} # Id -> pregunta
+        self.question_ids = {}
+        self.added_order = {} # Id de pregunta -> orden de alta en el sistema
+        self.tag_order = {} # (tópico, pregunta) -> orden de etiquetado en el tópico
+
+    def _user(self, user_id):
+        a_user = self.users.get(user_id)
+        if a_user is None:
+            a_user = self.users[user_id] = User(f"#{user_id}", "")
+        return a_user
+
+    # ----- Modificaciones ----- #
+    def add_user(self, user_id, username, password):
+        self.users[user_id] = User(username, password)
+        self.cuoora.add_user(self.users[user_id])
+
+    def add_topic(self, topic_id, name, description):
+        self.topics[topic_id] = Topic(name, description)
+
+    def add_question(self, question_id, user_id, title, description, timestamp, tags, added_order):
+        question = Question(self.users[user_id], title, description)
+        question.timestamp = timestamp
+        self.questions[question_id] = question
+        self.question_ids[question] = question_id
+        for topic_id, order in tags:
+            self.tag(question_id, topic_id, order)
+        if added_order is not None:
+            self.add_to_system(question_id, added_order)
+
+    def add_to_system(self, question_id, added_order):
+        self.added_order[question_id] = added_order
+        self.cuoora.add_question(self.questions[question_id])
+
+    def tag(self, question_id, topic_id, order):
+        self.questions[question_id].add_topic(self.topics[topic_id])
+        self.tag_order[(topic_id, question_id)] = order
+
+    def add_vote(self, question_id, user_id, is_like):
+        self.questions[question_id].add_vote(Vote(self._user(user_id), is_like))
+
+    def set_vote(self, question_id, user_id, is_like):
+        vote = self.questions[question_id].votes_manager.get_vote_of(self.users.get(user_id))
+        if vote is None:
+            raise ValueError("El usuario no votó esta pregunta")
+        vote.like() if is_like else vote.dislike()
+
+    def load(self, operations): # Varias modificaciones en un solo mensaje
+        for operation, args in operations:
+            getattr(self, operation)(*args)
+
+    # ----- Consultas: top-k parciales con su clave de mezcla ----- #
+    def social_feed(self, reader_id, followed, limit): # followed: [(posición en la lista del lector, id)]
+        position_of = {self.users[user_id]: position for position, user_id in followed}
+        candidates = chain.from_iterable(self.users[user_id].questions for _, user_id in followed)
+        ranked = SocialQuestionRetriever(limit)._filter_and_sort(candidates, self._user(reader_id))
+        return [(q.positive_votes_count(), position_of[q.user], self.question_ids[q]) for q in ranked]
+
+    def topics_feed(self, reader_id, topic_ids, limit): # Tópico -> su top-k local
+        retriever = TopicsQuestionRetriever(limit)
+        reader = self._user(reader_id)
+        ranked = {}
+        for topic_id in topic_ids:
+            topic = self.topics.get(topic_id)
+            if topic is not None and topic.questions:
+                questions = retriever._filter_and_sort(topic.get_questions(), reader)
+                ranked[topic_id] = [(q.positive_votes_count(), self.tag_order[(topic_id, self.question_ids[q])],
+                                     self.question_ids[q]) for q in questions]
+        return ranked
+
+    def _day_entries(self, questions):
+        return [(q.positive_votes_count(), q.timestamp, self.added_order[self.question_ids[q]], self.question_ids[q])
+                for q in questions]
+
+    def news_feed(self, reader_id, now, limit):
+        retriever = NewsQuestionRetriever(limit, lambda: now)
+        day = self.cuoora.questions_by_day.get(now.date(), [])
+        return self._day_entries(retriever.retrieve_questions(day, self._user(reader_id)))
+
+    def popular_today_feed(self, reader_id, now, limit): # (votos positivos del día, preguntas del día, top-k sin promedio)
+        day = self.cuoora.questions_by_day.get(now.date(), [])
+        positives = sum(q.positive_votes_count() for q in day)
+        ranked = PopularTodayQuestionRetriever(limit, lambda: now)._filter_and_sort(day, self._user(reader_id))
+        return positives, len(day), self._day_entries(ranked)
+
+def _serve(connection): # Ciclo del proceso trabajador: aplica cada pedido y responde el resultado o el error
+    shard = Shard()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        operation, args = message
+        try:
+            connection.send(("ok", getattr(shard, operation)(*args)))
+        except ValueError as error:
+            connection.send(("error", str(error)))
+        except Exception as error: # Cualquier otra falla se informa igual: el trabajador sigue atendiendo
+            connection.send(("error", f"{type(error).__name__}: {error}"))
+    connection.close()
+
+
+# =================== COORDINADOR =================== #
+class ShardedCuOOra: # Fachada con ids enteros sobre varios shards; processes=False los mantiene en este proceso
+    def __init__(self, shards=4, clock=datetime.now, processes=True):
+        self.clock = clock
+        self.shard_count = shards
+        self.shards = [] # Shard locales, o (conexión, lock, proceso) de cada trabajador
+        if processes:
+            for _ in range(shards):
+                connection, worker_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_serve, args=(worker_connection,), daemon=True)
+                process.start()
+                worker_connection.close()
+                self.shards.append((connection, threading.Lock(), process))
+        else:
+            self.shards = [Shard() for _ in range(shards)]
+        self.processes = processes
+        self.user_shards = [] # Id de usuario -> shard
+        self.usernames = {}
+        self.following = [] # Id de usuario -> seguidos (diccionario usado como conjunto ordenado)
+        self.interests = []
+        self.topic_count = 0
+        self.topic_sizes = [] # Id de tópico -> cuántas preguntas se etiquetaron, para el orden de etiquetado
+        self.question_shards = [] # Id de pregunta -> shard
+        self.question_topics = [] # Id de pregunta -> tópicos ya etiquetados
+        self.added = [] # Id de pregunta -> si ya está en el sistema
+        self.added_count = 0
+        self.lock = threading.Lock() # Protege la asignación de ids y los índices del coordinador
+
+    # ----- Comunicación ----- #
+    def _scatter(self, requests): # {shard: (operación, argumentos)} -> {shard: resultado}, en paralelo
+        if not self.processes:
+            return {i: getattr(self.shards[i], operation)(*args) for i, (operation, args) in requests.items()}
+        order = sorted(requests) # Siempre en el mismo orden para no trabarse entre hilos
+        for i in order:
+            self.shards[i][1].acquire()
+        try:
+            for i in order:
+                self.shards[i][0].send(requests[i])
+            replies = {i: self.shards[i][0].recv() for i in order}
+        finally:
+            for i in order:
+                self.shards[i][1].release()
+        for status, result in replies.values():
+            if status == "error":
+                raise ValueError(result)
+        return {i: reply[1] for i, reply in replies.items()}
+
+    def _call(self, shard, operation, *args): return self._scatter({shard: (operation, args)})[shard]
+
+    def _all(self, operation, *args): return self._scatter({i: (operation, args) for i in range(self.shard_count)})
+
+    def close(self):
+        if self.processes:
+            for connection, lock, process in self.shards:
+                with lock:
+                    connection.send(None)
+                process.join()
+                connection.close()
+            self.shards = []
+            self.processes = False
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+    # ----- Modificaciones ----- #
+    def shard_of(self, username): return zlib.crc32(username.encode("utf-8")) % self.shard_count
+
+    def add_user(self, username, password):
+        with self.lock:
+            if username in self.usernames:
+                raise ValueError(f"Usuario repetido: {username}")
+            user_id = self.usernames[username] = len(self.user_shards)
+            self.user_shards.append(self.shard_of(username))
+            self.following.append({})
+            self.interests.append({})
+        self._call(self.user_shards[user_id], "add_user", user_id, username, password)
+        return user_id
+
+    def add_topic(self, name, description):
+        with self.lock:
+            topic_id = self.topic_count
+            self.topic_count += 1
+            self.topic_sizes.append(0)
+        self._all("add_topic", topic_id, name, description) # Cada shard etiqueta con su copia
+        return topic_id
+
+    def follow(self, user_id, followed_id):
+        self.following[user_id][followed_id] = None
+
+    def stop_follow(self, user_id, followed_id):
+        self.following[user_id].pop(followed_id, None)
+
+    def add_interest(self, user_id, topic_id):
+        self.interests[user_id][topic_id] = None
+
+    def _new_question(self, user_id, topic_ids, add): # Reserva el id, el orden de etiquetado y el de alta
+        with self.lock:
+            # Todo se valida antes de tocar las listas por pregunta, que deben tener siempre el mismo largo
+            shard = self.user_shards[user_id]
+            topics = dict.fromkeys(topic_ids)
+            if len(topics) != len(topic_ids):
+                raise ValueError("El tópico ya está agregado")
+            for topic_id in topics:
+                self._check_topic(topic_id)
+            question_id = len(self.question_shards)
+            self.question_shards.append(shard)
+            self.question_topics.append(topics)
+            tags = []
+            for topic_id in topics:
+                tags.append((topic_id, self.topic_sizes[topic_id]))
+                self.topic_sizes[topic_id] += 1
+            self.added.append(add)
+            added_order = None
+            if add:
+                added_order = self.added_count
+                self.added_count += 1
+        return question_id, tags, added_order
+
+    def _check_topic(self, topic_id): # Con el lock tomado
+        if not isinstance(topic_id, int) or isinstance(topic_id, bool) or not 0 <= topic_id < self.topic_count:
+            raise ValueError(f"Tópico desconocido: {topic_id}")
+
+    def add_question(self, user_id, title, description, topic_ids=(), timestamp=None, add=True):
+        # Crea la pregunta y, salvo add=False, la agrega al sistema (como Question(...) y luego CuOOra.add_question)
+        question_id, tags, added_order = self._new_question(user_id, list(topic_ids), add)
+        timestamp = timestamp if timestamp is not None else self.clock()
+        self._call(self.question_shards[question_id], "add_question", question_id, user_id, title, description,
+                   timestamp, tags, added_order)
+        return question_id
+
+    def add_to_system(self, question_id):
+        with self.lock:
+            if self.added[question_id]:
+                return
+            self.added[question_id] = True
+            added_order = self.added_count
+            self.added_count += 1
+        self._call(self.question_shards[question_id], "add_to_system", question_id, added_order)
+
+    def tag(self, question_id, topic_id):
+        with self.lock:
+            self._check_topic(topic_id)
+            if topic_id in self.question_topics[question_id]:
+                raise ValueError("El tópico ya está agregado")
+            self.question_topics[question_id][topic_id] = None
+            order = self.topic_sizes[topic_id]
+            self.topic_sizes[topic_id] += 1
+        self._call(self.question_shards[question_id], "tag", question_id, topic_id, order)
+
+    def add_vote(self, user_id, question_id, is_like=True):
+        self._call(self.question_shards[question_id], "add_vote", question_id, user_id, is_like)
+
+    def set_vote(self, user_id, question_id, is_like):
+        self._call(self.question_shards[question_id], "set_vote", question_id, user_id, is_like)
+
+    def load(self, cuoora): # Reparte un CuOOra existente; devuelve los ids asignados a usuarios, tópicos y preguntas
+        users = [e for e in cuoora._reachable_entities() if isinstance(e, User)]
+        if any(a_user.has_inbox() for a_user in users):
+            raise ValueError("Los usuarios con bandeja no se pueden repartir")
+        batches = [[] for _ in range(self.shard_count)]
+        topic_ids = {}
+        for topic in (e for e in cuoora._reachable_entities() if isinstance(e, Topic)):
+            topic_ids[topic] = self.add_topic(topic.get_name(), topic.get_description())
+        user_ids = {a_user: self.add_user(a_user.get_username(), a_user.password) for a_user in users}
+        for a_user in users:
+            for followed in a_user.following:
+                self.follow(user_ids[a_user], user_ids[followed])
+            for topic in a_user.topics_of_interest:
+                self.add_interest(user_ids[a_user], topic_ids[topic])
+
+        # Altas, etiquetas y votos en orden de autor; etiquetado y alta al sistema en el orden original, que es el
+        # que desempata dentro de cada shard
+        question_ids = {}
+        with self.lock:
+            for a_user in users:
+                shard = self.user_shards[user_ids[a_user]]
+                for question in a_user.questions:
+                    question_id = question_ids[question] = len(self.question_shards)
+                    self.question_shards.append(shard)
+                    self.question_topics.append(dict.fromkeys(topic_ids[t] for t in question.topics))
+                    self.added.append(False)
+                    batches[shard].append(("add_question", (question_id, user_ids[a_user], question.title,
+                                                            question.description, question.timestamp, [], None)))
+            for topic, topic_id in topic_ids.items():
+                for question in topic.questions:
+                    question_id = question_ids.get(question)
+                    if question_id is None: # Pregunta de un autor que no está en el sistema
+                        continue
+                    batches[self.question_shards[question_id]].append(
+                        ("tag", (question_id, topic_id, self.topic_sizes[topic_id])))
+                    self.topic_sizes[topic_id] += 1
+            for question in cuoora.get_questions():
+                question_id = question_ids[question]
+                if not self.added[question_id]:
+                    self.added[question_id] = True
+                    batches[self.question_shards[question_id]].append(("add_to_system", (question_id, self.added_count)))
+                    self.added_count += 1
+            for question, question_id in question_ids.items():
+                batches[self.question_shards[question_id]].extend(
+                    ("add_vote", (question_id, user_ids[v.user], v.is_like())) for v in question.get_votes())
+        self._scatter({i: ("load", (batch,)) for i, batch in enumerate(batches)})
+        return user_ids, topic_ids, question_ids
+
+    # ----- Feeds ----- #
+    # Devuelven ids de preguntas, en el mismo orden que los métodos homónimos de CuOOra
+    def get_social_questions_for_user(self, user_id, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        by_shard = {}
+        for position, followed_id in enumerate(list(self.following[user_id])):
+            by_shard.setdefault(self.user_shards[followed_id], []).append((position, followed_id))
+        partials = self._scatter({i: ("social_feed", (user_id, followed, limit)) for i, followed in by_shard.items()})
+        best = heapq.nsmallest(limit, chain.from_iterable(partials.values()), key=lambda e: (-e[0], e[1], e[2]))
+        return [entry[2] for entry in best]
+
+    def get_topic_questions_for_user(self, user_id, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        topic_ids = list(self.interests[user_id])
+        partials = self._all("topics_feed", user_id, topic_ids, limit)
+        ranked_by_topic = []
+        for topic_id in topic_ids: # Top-k global de cada tópico, luego la misma mezcla que TopicsQuestionRetriever
+            entries = chain.from_iterable(ranked.get(topic_id, ()) for ranked in partials.values())
+            ranked_by_topic.append(heapq.nsmallest(limit, entries, key=lambda e: (-e[0], e[1])))
+        merged = heapq.merge(*ranked_by_topic, key=lambda e: e[0], reverse=True)
+        unique = TopicsQuestionRetriever._unique(entry[2] for entry in merged)
+        return list(islice(unique, limit))
+
+    def get_news_questions_for_user(self, user_id, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        partials = self._all("news_feed", user_id, self.clock(), limit)
+        best = heapq.nsmallest(limit, chain.from_iterable(partials.values()), key=lambda e: (-e[0], e[1], e[2]))
+        return [entry[3] for entry in best]
+
+    def get_popular_questions_for_user(self, user_id, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        partials = self._all("popular_today_feed", user_id, self.clock(), limit).values()
+        count = sum(partial[1] for partial in partials)
+        if not count:
+            return []
+        average = sum(partial[0] for partial in partials) / count
+        # Cada parcial es un prefijo de su shard: lo que supera el promedio y entra en el top-k global está ahí
+        above = (entry for partial in partials for entry in partial[2] if entry[0] > average)
+        best = heapq.nsmallest(limit, above, key=lambda e: (-e[0], e[1], e[2]))
+        return [entry[3] for entry in best]
@@ -0,0 +1,395 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+
+from cuoora_social_network import CuOOra, Metrics, Topic, User, VotesManager
+from cuoora_bulk_load import new_answer, new_question, new_vote, rank_answers
+
+# Formato: cabecera, tabla de secciones y secciones alineadas a 8 bytes.
+# Cada sección es un arreglo de ancho fijo (una columna) o el bloque de strings en UTF-8.
+MAGIC = b"CUOORASN"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<8sIBxxxI") # magic, versión, orden de bytes (1 = little endian), cantidad de secciones
+SECTION = struct.Struct("<16sQQ") # nombre, offset, largo en bytes
+EPOCH = datetime(1970, 1, 1)
+QUESTION = 0
+ANSWER = 1
+KIND_PREFIX = ("q", "a") # Prefijo de las columnas de votos según el tipo de objeto votado
+
+def _to_micros(a_datetime): return (a_datetime - EPOCH) // timedelta(microseconds=1)
+
+def _from_micros(micros): return EPOCH + timedelta(microseconds=micros)
+
+
+# =================== ESCRITURA =================== #
+class SnapshotWriter: # Recorre el grafo de un CuOOra y lo vuelca en columnas
+    def __init__(self, cuoora):
+        self.cuoora = cuoora
+        self.strings = {} # String -> id, cada string se guarda una sola vez
+        self.columns = {}
+
+    def _string_id(self, a_string):
+        string_id = self.strings.get(a_string)
+        if string_id is None:
+            string_id = self.strings[a_string] = len(self.strings)
+        return string_id
+
+    def _column(self, name, typecode):
+        column = self.columns[name] = array(typecode)
+        return column
+
+    def _collect_users(self): # Todos los usuarios alcanzables desde el sistema, en orden estable
+        users = dict.fromkeys(self.cuoora.users)
+        users.update(dict.fromkeys(q.get_user() for q in self.cuoora.questions))
+        pending = deque(users)
+
+        def visit(a_user):
+            if a_user not in users:
+                users[a_user] = None
+                pending.append(a_user)
+
+        while pending:
+            a_user = pending.popleft()
+            for related in (*a_user.following, *a_user.followers):
+                visit(related)
+            for question in a_user.questions:
+                for answer in question.answer_entries:
+                    visit(answer.get_user())
+                for votable in (question, *question.answer_entries):
+                    for vote in votable.get_votes():
+                        visit(vote.get_user())
+            for answer in a_user.answers:
+                visit(answer.get_question().get_user())
+            for vote in a_user.votes:
+                if vote.votes_manager is not None and vote.votes_manager.owner is not None:
+                    visit(vote.votes_manager.owner.get_user())
+        return list(users)
+
+    def collect(self):
+        users = self._collect_users()
+        user_ids = {a_user: i for i, a_user in enumerate(users)}
+        questions = [q for a_user in users for q in a_user.questions]
+        question_ids = {q: i for i, q in enumerate(questions)}
+        answers = [a for q in questions for a in q.answer_entries]
+        answer_ids = {a: i for i, a in enumerate(answers)}
+        topics = {}
+        for a_user in users:
+            topics.update(dict.fromkeys(a_user.topics_of_interest))
+        for question in questions:
+            topics.update(dict.fromkeys(question.topics))
+        topic_ids = {t: i for i, t in enumerate(topics)}
+        # El orden de cada tipo de entidad es su id dentro del snapshot
+        self.users, self.questions, self.answers, self.topics = users, questions, answers, list(topics)
+
+        column, sid = self._column, self._string_id
+        u_name, u_pass, u_score = column("u_name", "I"), column("u_pass", "I"), column("u_score", "q")
+        for a_user in users:
+            u_name.append(sid(a_user.get_username()))
+            u_pass.append(sid(a_user.get_password()))
+            u_score.append(a_user.calculate_score())
+        column("cu_users", "I").extend(user_ids[a_user] for a_user in self.cuoora.users)
+        self._pairs("f", ((user_ids[a], user_ids[b]) for a in users for b in a.following))
+        self._pairs("fr", ((user_ids[a], user_ids[b]) for a in users for b in a.followers))
+        self._pairs("i", ((user_ids[a], topic_ids[t]) for a in users for t in a.topics_of_interest))
+
+        t_name, t_desc = column("t_name", "I"), column("t_desc", "I")
+        for topic in topics:
+            t_name.append(sid(topic.get_name()))
+            t_desc.append(sid(topic.get_description()))
+        self._pairs("tq", ((topic_ids[t], question_ids[q]) for t in topics for q in t.questions if q in question_ids))
+
+        q_user, q_title, q_desc, q_time = column("q_user", "I"), column("q_title", "I"), column("q_desc", "I"), column("q_time", "q")
+        for question in questions:
+            q_user.append(user_ids[question.get_user()])
+            q_title.append(sid(question.get_title()))
+            q_desc.append(sid(question.get_description()))
+            q_time.append(_to_micros(question.get_timestamp()))
+        column("cu_questions", "I").extend(question_ids[q] for q in self.cuoora.questions)
+        self._pairs("qt", ((question_ids[q], topic_ids[t]) for q in questions for t in q.topics))
+
+        a_question, a_user, a_desc, a_time = column("a_question", "I"), column("a_user", "I"), column("a_desc", "I"), column("a_time", "q")
+        for answer in answers:
+            a_question.append(question_ids[answer.get_question()])
+            a_user.append(user_ids[answer.get_user()])
+            a_desc.append(sid(answer.get_description()))
+            a_time.append(_to_micros(answer.get_timestamp()))
+        self._grouped("ua", ([answer_ids[a] for a in u.answers] for u in users))
+
+        # Votos ordenados por objeto votado: cada uno ocupa un rango contiguo de filas
+        v_voter, v_pol, v_time = column("v_voter", "I"), column("v_pol", "B"), column("v_time", "q")
+        vote_rows = {}
+        for kind, targets in ((QUESTION, questions), (ANSWER, answers)):
+            prefix = KIND_PREFIX[kind]
+            starts, positives, negatives = column(prefix + "_vstart", "Q"), column(prefix + "_pos", "I"), column(prefix + "_neg", "I")
+            for target in targets:
+                starts.append(len(v_voter))
+                positives.append(target.positive_votes_count())
+                negatives.append(target.negative_votes_count())
+                for vote in target.get_votes():
+                    vote_rows[vote] = len(v_voter)
+                    v_voter.append(user_ids[vote.get_user()])
+                    v_pol.append(1 if vote.is_like() else 0)
+                    v_time.append(_to_micros(vote.timestamp))
+            starts.append(len(v_voter))
+        self._grouped("uv", ([vote_rows[v] for v in u.votes if v in vote_rows] for u in users))
+
+        offsets, data = column("str_offsets", "Q"), bytearray()
+        for a_string in self.strings:
+            offsets.append(len(data))
+            data += str(a_string).encode("utf-8")
+        offsets.append(len(data))
+        self.columns["str_data"] = bytes(data)
+        return self
+
+    def _pairs(self, prefix, pairs):
+        first, second = self._column(prefix + "_src", "I"), self._column(prefix + "_dst", "I")
+        for a, b in pairs:
+            first.append(a)
+            second.append(b)
+
+    def _grouped(self, prefix, groups): # Listas por usuario: inicio de cada grupo y elementos concatenados
+        starts, items = self._column(prefix + "_start", "Q"), self._column(prefix + "_items", "Q")
+        for group in groups:
+            starts.append(len(items))
+            items.extend(group)
+        starts.append(len(items))
+
+    def write(self, path):
+        names = list(self.columns)
+        offset = HEADER.size + SECTION.size * len(names)
+        table = []
+        for name in names:
+            offset += -offset % 8
+            size = len(self.columns[name]) * getattr(self.columns[name], "itemsize", 1)
+            table.append((name, offset, size))
+            offset += size
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, 1 if sys.byteorder == "little" else 0, len(names)))
+            for name, section_offset, size in table:
+                file.write(SECTION.pack(name.encode("ascii"), section_offset, size))
+            for name, section_offset, size in table:
+                file.write(bytes(section_offset - file.tell()))
+                file.write(self.columns[name])
+
+def write_snapshot(cuoora, path):
+    SnapshotWriter(cuoora).collect().write(path)
+
+
+# =================== COLECCIONES PEREZOSAS =================== #
+class LazyVoters: # Reemplaza VotesManager.voters: arma los votos recién al primer acceso
+    __slots__ = ("loader", "items")
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.items = None
+
+    def _load(self):
+        if self.items is None:
+            if Metrics.active is not None:
+                Metrics.active.increment("cuoora_vote_lists_total", source="snapshot")
+            self.items = self.loader()
+            self.loader = None
+        return self.items
+
+    def __contains__(self, key): return key in self._load()
+    def __setitem__(self, key, value): self._load()[key] = value
+    def __getitem__(self, key): return self._load()[key]
+    def __iter__(self): return iter(self._load())
+    def __len__(self): return len(self._load())
+    def get(self, key, default=None): return self._load().get(key, default)
+    def pop(self, key, default=None): return self._load().pop(key, default)
+    def values(self): return self._load().values()
+
+class LazyVoteSet: # Reemplaza User.votes: arma los votos del usuario recién al primer acceso
+    __slots__ = ("loader", "items")
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.items = None
+
+    def _load(self):
+        if self.items is None:
+            self.items = self.loader()
+            self.loader = None
+        return self.items
+
+    def __iter__(self): return iter(self._load())
+    def __len__(self): return len(self._load())
+    def __bool__(self): return bool(self._load())
+    def __contains__(self, key): return key in self._load()
+    def __setitem__(self, key, value): self._load()[key] = value
+    def pop(self, key, default=None): return self._load().pop(key, default)
+
+
+# =================== LECTURA =================== #
+class Snapshot: # Abre un snapshot con mmap; las columnas son vistas sin copia sobre el archivo
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_sections()
+        except (ValueError, struct.error) as error: # mmap rechaza los archivos vacíos; struct, los cortados
+            if self.map is not None:
+                self.map.close()
+            self.file.close()
+            if isinstance(error, struct.error):
+                raise ValueError("El snapshot está incompleto") from None
+            raise
+        self.views = {}
+        self.vote_objects = {} # Fila -> Vote ya materializado, compartido entre votado y votante
+        self.lazy = [] # Colecciones perezosas del sistema restaurado que todavía leen del archivo
+
+    def _read_sections(self):
+        magic, version, little_endian, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("El archivo no es un snapshot de CuOOra")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Versión de snapshot no soportada: {version}")
+        if little_endian != (sys.byteorder == "little"):
+            raise ValueError("El snapshot fue escrito con otro orden de bytes")
+        self.sections = {}
+        for i in range(count):
+            name, offset, size = SECTION.unpack_from(self.map, HEADER.size + SECTION.size * i)
+            if offset + size > len(self.map):
+                raise ValueError("El snapshot está incompleto")
+            self.sections[name.rstrip(b"\0").decode("ascii")] = (offset, size)
+
+    def column(self, name, typecode="B"):
+        view = self.views.get(name)
+        if view is None:
+            offset, size = self.sections[name]
+            view = self.views[name] = memoryview(self.map)[offset:offset + size].cast(typecode)
+        return view
+
+    def string(self, string_id):
+        offsets = self.column("str_offsets", "Q")
+        return bytes(self.column("str_data")[offsets[string_id]:offsets[string_id + 1]]).decode("utf-8")
+
+    def close(self):
+        # Lo que el sistema restaurado todavía no leyó pasa a memoria: sigue funcionando sin el archivo
+        for lazy in self.lazy:
+            lazy._load()
+        self.lazy.clear()
+        for view in self.views.values():
+            view.release()
+        self.views.clear()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+    # ----- Reconstrucción del grafo ----- #
+    def restore(self, clock=datetime.now):
+        column, string = self.column, self.string
+        users = [User(string(n), string(p)) for n, p in zip(column("u_name", "I"), column("u_pass", "I"))]
+        for a_user, score in zip(users, column("u_score", "q")):
+            a_user.score = score
+        topics = [Topic(string(n), string(d)) for n, d in zip(column("t_name", "I"), column("t_desc", "I"))]
+
+        self._restore_sets(users, "following", users, "f")
+        self._restore_sets(users, "followers", users, "fr")
+        for user_id, topic_id in zip(column("i_src", "I"), column("i_dst", "I")):
+            users[user_id].add_topic(topics[topic_id])
+
+        questions = []
+        for user_id, title, description, micros in zip(column("q_user", "I"), column("q_title", "I"),
+                                                       column("q_desc", "I"), column("q_time", "q")):
+            question = new_question(users[user_id], string(title), string(description), _from_micros(micros))
+            if not question.user.questions:
+                question.user.questions = []
+            question.user.questions.append(question)
+            questions.append(question)
+        for question_id, topic_id in zip(column("qt_src", "I"), column("qt_dst", "I")):
+            if not questions[question_id].topics:
+                questions[question_id].topics = {}
+            questions[question_id].topics[topics[topic_id]] = None
+        for topic_id, question_id in zip(column("tq_src", "I"), column("tq_dst", "I")):
+            topics[topic_id].add_question(questions[question_id])
+
+        answers = [new_answer(questions[q], users[u], string(d), _from_micros(t)) for q, u, d, t in
+                   zip(column("a_question", "I"), column("a_user", "I"), column("a_desc", "I"), column("a_time", "q"))]
+        starts, items = column("ua_start", "Q"), column("ua_items", "Q")
+        for user_id, a_user in enumerate(users):
+            if starts[user_id] != starts[user_id + 1]:
+                a_user.answers = [answers[i] for i in items[starts[user_id]:starts[user_id + 1]]]
+
+        self.targets = (questions, answers)
+        self.users = users
+        self.topics = topics
+        for kind, targets in ((QUESTION, questions), (ANSWER, answers)):
+            self._restore_vote_counts(kind, targets)
+        answers_by_question = {}
+        for answer in answers:
+            answers_by_question.setdefault(answer.question, []).append(answer)
+        for question, question_answers in answers_by_question.items():
+            rank_answers(question, question_answers)
+        starts = column("uv_start", "Q")
+        for user_id, a_user in enumerate(users):
+            if starts[user_id] != starts[user_id + 1]:
+                a_user.votes = LazyVoteSet(lambda user_id=user_id: self._user_votes(user_id))
+                self.lazy.append(a_user.votes)
+
+        cuoora = CuOOra(clock)
+        cuoora.add_users(users[i] for i in column("cu_users", "I"))
+        cuoora.add_questions(questions[i] for i in column("cu_questions", "I"))
+        return cuoora
+
+    def _restore_sets(self, owners, attribute, items, prefix): # Diccionarios usados como conjuntos ordenados
+        for owner_id, item_id in zip(self.column(prefix + "_src", "I"), self.column(prefix + "_dst", "I")):
+            if not getattr(owners[owner_id], attribute):
+                setattr(owners[owner_id], attribute, {})
+            getattr(owners[owner_id], attribute)[items[item_id]] = None
+
+    def _restore_vote_counts(self, kind, targets): # Los conteos se leen ya calculados; los votos, a demanda
+        prefix = KIND_PREFIX[kind]
+        starts = self.column(prefix + "_vstart", "Q")
+        for target_id, (target, positives, negatives) in enumerate(
+                zip(targets, self.column(prefix + "_pos", "I"), self.column(prefix + "_neg", "I"))):
+            if starts[target_id] == starts[target_id + 1]:
+                continue
+            manager = target.votes_manager = VotesManager(target)
+            manager.positive_count = positives
+            manager.negative_count = negatives
+            manager.voters = LazyVoters(lambda kind=kind, target_id=target_id: self._target_votes(kind, target_id))
+            self.lazy.append(manager.voters)
+
+    def _vote(self, row, kind, target_id):
+        vote = self.vote_objects.get(row)
+        if vote is None:
+            vote = new_vote(self.users[self.column("v_voter", "I")[row]], bool(self.column("v_pol")[row]),
+                            _from_micros(self.column("v_time", "q")[row]))
+            vote.votes_manager = self.targets[kind][target_id].votes_manager
+            self.vote_objects[row] = vote
+        return vote
+
+    def _target_votes(self, kind, target_id):
+        starts = self.column(KIND_PREFIX[kind] + "_vstart", "Q")
+        votes = (self._vote(row, kind, target_id) for row in range(starts[target_id], starts[target_id + 1]))
+        return {vote.user: vote for vote in votes}
+
+    def _user_votes(self, user_id):
+        starts, items = self.column("uv_start", "Q"), self.column("uv_items", "Q")
+        return dict.fromkeys(self._vote(row, *self._target_of(row)) for row in items[starts[user_id]:starts[user_id + 1]])
+
+    def _target_of(self, row): # Búsqueda binaria sobre los inicios de rango de cada objeto votado
+        for kind in (QUESTION, ANSWER):
+            starts = self.column(KIND_PREFIX[kind] + "_vstart", "Q")
+            if row < starts[len(starts) - 1]:
+                low, high = 0, len(starts) - 1
+                while low < high:
+                    middle = (low + high) // 2
+                    if starts[middle + 1] <= row:
+                        low = middle + 1
+                    else:
+                        high = middle
+                return kind, low
+        raise IndexError(row)
+
+def open_snapshot(path):
+    return Snapshot(path)
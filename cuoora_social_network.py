@@ -1,8 +1,22 @@
-from datetime import datetime
+import base64
+import bisect
+import cProfile
+import heapq
+import math
+import pstats
+import threading
+from contextlib import nullcontext
+from array import array
+from itertools import accumulate, chain, count, islice
+from datetime import datetime, timedelta
+from time import perf_counter
 from abc import ABC, abstractmethod
+from types import MappingProxyType
 
 # =================== INTERFACES =================== #
 class Votable(ABC): # Interfaz para objetos que pueden recibir votos
+    __slots__ = ()
+
     @abstractmethod
     def add_vote(self, vote):
         pass
@@ -19,7 +33,17 @@ class Votable(ABC): # Interfaz para objetos que pueden recibir votos
     def negative_votes(self):
         pass
 
+    @abstractmethod
+    def positive_votes_count(self):
+        pass
+
+    @abstractmethod
+    def negative_votes_count(self):
+        pass
+
 class Describable(ABC): # Interfaz para objetos que tienen una descripción
+    __slots__ = ()
+
     @abstractmethod
     def get_description(self):
         pass
@@ -28,45 +52,484 @@ class Describable(ABC): # Interfaz para objetos que tienen una descripción
     def set_description(self, new_description):
         pass
 
+class CuOOraListener: # Interfaz para observar las modificaciones del sistema; cada método es opcional
+    def user_added(self, user): pass
+
+    def question_created(self, question): pass
+
+    def question_added(self, question): pass
+
+    def answer_created(self, answer): pass
+
+    def vote_added(self, votable, vote): pass
+
+    def vote_flipped(self, votable, vote): pass
+
+    def vote_removed(self, votable, vote): pass
+
+    def followed(self, user, followed_user): pass
+
+    def unfollowed(self, user, followed_user): pass
+
+    def topic_added(self, user, topic): pass
+
+    def question_tagged(self, question, topic): pass
+
+    def topic_untracked(self, topic): pass # El tópico recibió una pregunta cuyos eventos no llegan a este sistema
+
+    def title_changed(self, question): pass
+
+    def description_changed(self, describable): pass
+
+
+# =================== CONCURRENCIA =================== #
+NO_LOCK = nullcontext() # Fuera del modo concurrente las secciones críticas no sincronizan nada
+
+class ConcurrencyMode: # Modo concurrente, global al proceso; sigue activo mientras algún sistema lo use
+    enabled = False
+    systems = 0 # Sistemas con enable_concurrency vigente
+    counting = threading.Lock()
+
+    @staticmethod
+    def new_lock(): return threading.RLock() if ConcurrencyMode.enabled else NO_LOCK
+
+class ReadWriteLock: # Muchos lectores a la vez o un único escritor; un escritor en espera frena a los lectores nuevos
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self.reading = LockSide(self.acquire_read, self.release_read)
+        self.writing = LockSide(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+
+    def release_write(self):
+        with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+class LockSide: # Uno de los dos lados de un ReadWriteLock, usable con "with"
+    __slots__ = ('acquire', 'release')
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self): self.acquire()
+
+    def __exit__(self, *exc_info): self.release()
+
+class PairLock: # Dos locks tomados en el orden dado y liberados en el inverso
+    __slots__ = ('first', 'second')
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def __enter__(self):
+        self.first.__enter__()
+        self.second.__enter__()
+
+    def __exit__(self, *exc_info):
+        self.second.__exit__(*exc_info)
+        self.first.__exit__(*exc_info)
+
+# Colecciones vacías compartidas: las entidades reservan las propias recién con el primer elemento
+EMPTY_LIST = ()
+EMPTY_SET = MappingProxyType({})
+
+# =================== INSTRUMENTACIÓN =================== #
+class Histogram: # Cantidad de observaciones por intervalo, con los límites superiores dados
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # El último intervalo no tiene límite (+Inf)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self): # (límite, observaciones menores o iguales), como los buckets de Prometheus
+        return list(zip((*self.bounds, float("inf")), accumulate(self.counts)))
+
+class Metrics: # Histogramas y contadores de los caminos calientes, global al proceso; se activa con CuOOra.enable_metrics
+    LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    FAST_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.001)
+    SIZE_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+    DEFINITIONS = { # Nombre -> (tipo, límites de los buckets, descripción)
+        "cuoora_feed_seconds": ("histogram", LATENCY_BUCKETS, "Latencia de un feed por estrategia, con caché incluida"),
+        "cuoora_page_seconds": ("histogram", LATENCY_BUCKETS, "Latencia de una página de feed por estrategia"),
+        "cuoora_candidates": ("histogram", SIZE_BUCKETS, "Preguntas candidatas antes de filtrar y ordenar"),
+        "cuoora_results": ("histogram", SIZE_BUCKETS, "Preguntas devueltas después de filtrar y ordenar"),
+        "cuoora_add_vote_seconds": ("histogram", FAST_BUCKETS, "Tiempo de VotesManager.add_vote"),
+        "cuoora_vote_lists_total": ("counter", None, "Listas de votos materializadas"),
+    }
+    active = None # Sin métricas activas, cada camino instrumentado cuesta un único chequeo
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler # Opcional: profiler(nombre, función) ejecuta la función y devuelve su resultado
+        self.histograms = {} # (nombre, etiquetas) -> Histogram
+        self.counters = {} # (nombre, etiquetas) -> valor
+        self.lock = ConcurrencyMode.new_lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(Metrics.DEFINITIONS[name][1])
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def timed(self, name, function, **labels): # Mide la llamada y, si hay perfilador, la ejecuta a través de él
+        start = perf_counter()
+        try:
+            if self.profiler is not None:
+                label = ",".join(str(value) for value in labels.values())
+                return self.profiler(f"{name}:{label}" if label else name, function)
+            return function()
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self): # Diccionario simple: nombre -> lista de series con sus etiquetas
+        with self.lock:
+            result = {}
+            for (name, labels), histogram in self.histograms.items():
+                result.setdefault(name, []).append({"labels": dict(labels), "count": histogram.count,
+                                                    "sum": histogram.total, "buckets": histogram.cumulative()})
+            for (name, labels), value in self.counters.items():
+                result.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            return result
+
+    def to_prometheus(self): # Formato de texto de exposición de Prometheus
+        lines = []
+        for name, series in sorted(self.snapshot().items()):
+            kind, _, description = Metrics.DEFINITIONS[name]
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for serie in series:
+                labels = serie["labels"]
+                if kind == "counter":
+                    lines.append(f"{name}{Metrics._labels(labels)} {serie['value']}")
+                    continue
+                for bound, observations in serie["buckets"]:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{Metrics._labels({**labels, 'le': le})} {observations}")
+                lines.append(f"{name}_sum{Metrics._labels(labels)} {serie['sum']!r}")
+                lines.append(f"{name}_count{Metrics._labels(labels)} {serie['count']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+class CProfileHook: # Perfilador para Metrics: un cProfile por nombre de llamada, perfilando una de cada sample_every
+    def __init__(self, sample_every=1):
+        self.sample_every = sample_every
+        self.calls = count()
+        self.profiles = {} # Nombre -> cProfile.Profile con lo acumulado
+        self.lock = threading.Lock() # Un Profile no se puede usar desde dos hilos a la vez
+
+    def __call__(self, name, function):
+        if next(self.calls) % self.sample_every or not self.lock.acquire(blocking=False):
+            return function()
+        try:
+            profile = self.profiles.get(name)
+            if profile is None:
+                profile = self.profiles[name] = cProfile.Profile()
+            return profile.runcall(function)
+        finally:
+            self.lock.release()
+
+    def stats(self, name): # pstats.Stats de lo acumulado para ese nombre, por ejemplo "cuoora_feed_seconds:social"
+        return pstats.Stats(self.profiles[name])
+
+
 # =================== CLASES DE CONTROL =================== #
 class VotesManager: # Gestiona la colección de votos y proporciona operaciones sobre ellos
-    def __init__(self):
-        self.votes = []
+    __slots__ = ('owner', 'voters', 'store', 'positive_count', 'negative_count')
+
+    def __init__(self, owner=None):
+        self.owner = owner # Votable al que se le avisa cuando cambian los conteos
+        self.voters = {} # Usuario -> voto, en orden de llegada; detecta votos repetidos en O(1)
+        self.store = None # VoteStore opcional donde se replican los votos
+        self.positive_count = 0
+        self.negative_count = 0
 
     def get_votes(self):
-        return self.votes
+        if Metrics.active is not None:
+            Metrics.active.increment("cuoora_vote_lists_total", source="votes_manager")
+        return list(self.voters.values())
 
     def add_vote(self, a_vote):
-        if any(vote.user == a_vote.user for vote in self.votes):
+        metrics = Metrics.active
+        if metrics is not None:
+            start = perf_counter()
+        if a_vote.user in self.voters:
             raise ValueError("Este usuario ya ha votado")
-        self.votes.append(a_vote)
+        if a_vote.votes_manager is not None:
+            raise ValueError("El voto ya fue registrado")
+        self.voters[a_vote.user] = a_vote
+        a_vote.votes_manager = self
+        old_positive, old_negative = self.positive_count, self.negative_count
+        if a_vote.is_like():
+            self.positive_count += 1
+        else:
+            self.negative_count += 1
+        if self.store is not None:
+            self.store.append(a_vote, self.owner)
+        self._notify("vote_added", a_vote, old_positive, old_negative)
+        if metrics is not None:
+            metrics.observe("cuoora_add_vote_seconds", perf_counter() - start)
+
+    def set_vote_polarity(self, a_vote, is_like): # Lo invoca el voto al pasar de like a dislike o viceversa
+        with self.owner.lock if self.owner is not None else NO_LOCK:
+            if a_vote.is_positive_vote != is_like:
+                a_vote.is_positive_vote = is_like
+                self._vote_flipped(a_vote)
+
+    def _vote_flipped(self, a_vote):
+        old_positive, old_negative = self.positive_count, self.negative_count
+        if a_vote.is_like():
+            self.positive_count += 1
+            self.negative_count -= 1
+        else:
+            self.positive_count -= 1
+            self.negative_count += 1
+        if self.store is not None:
+            self.store.vote_flipped(a_vote)
+        self._notify("vote_flipped", a_vote, old_positive, old_negative)
+
+    def cast_vote(self, a_user, is_like): # Alta o cambio del voto de a_user, por el índice votante -> voto
+        a_vote = self.voters.get(a_user)
+        if a_vote is None:
+            a_vote = Vote(a_user, is_like)
+            self.add_vote(a_vote)
+        elif a_vote.is_positive_vote != is_like:
+            a_vote.is_positive_vote = is_like
+            self._vote_flipped(a_vote)
+        return a_vote
+
+    def remove_vote(self, a_user): # Quita el voto de a_user de ambos lados; devuelve el voto o None
+        a_vote = self.voters.pop(a_user, None)
+        if a_vote is None:
+            return None
+        old_positive, old_negative = self.positive_count, self.negative_count
+        if a_vote.is_like():
+            self.positive_count -= 1
+        else:
+            self.negative_count -= 1
+        a_vote.votes_manager = None
+        if self.store is not None:
+            self.store.vote_removed(a_vote)
+        a_user._remove_vote(a_vote)
+        self._notify("vote_removed", a_vote, old_positive, old_negative)
+        return a_vote
+
+    def _notify(self, event, a_vote, old_positive, old_negative):
+        if self.owner is not None:
+            self.owner.votes_changed(old_positive, old_negative)
+            self.owner.publish(event, self.owner, a_vote)
+
+    def get_vote_of(self, a_user):
+        return self.voters.get(a_user)
+
+    def count_positive_votes(self):
+        return self.positive_count
+
+    def count_negative_votes(self):
+        return self.negative_count
     
     def filter_votes(self, condition):
-        return [vote for vote in self.votes if condition(vote)]
+        if Metrics.active is not None:
+            Metrics.active.increment("cuoora_vote_lists_total", source="votes_manager")
+        return [vote for vote in self.voters.values() if condition(vote)]
 
-class DescriptionManager: # Encapsula la gestión de la descripción de un objeto
-    def __init__(self, description):
-        self.description = description
+class NoVotesManager(VotesManager): # Sin votos y de solo lectura; los votos se registran a través del objeto votado
+    __slots__ = ()
 
-    def get_description(self):
-        return self.description
-    
-    def set_description(self, an_object):
-        self.description = an_object
+    def __init__(self):
+        super().__init__()
+        self.voters = EMPTY_SET
+
+    def add_vote(self, a_vote): raise ValueError("Este objeto todavía no tiene un VotesManager propio")
+
+    def cast_vote(self, a_user, is_like): raise ValueError("Este objeto todavía no tiene un VotesManager propio")
+
+    def remove_vote(self, a_user): return None
+
+NO_VOTES = NoVotesManager() # Compartido por todo lo que todavía no recibió votos
+
+class Leaderboard: # Mantiene a los usuarios ordenados por puntaje para consultar el ranking
+    def __init__(self):
+        self.entries = [] # Tuplas (-puntaje, orden de alta, usuario) ordenadas
+        self.entry_of = {}
+        self.sequence = count()
+        self.lock = ConcurrencyMode.new_lock()
+
+    def add_user(self, a_user):
+        with self.lock:
+            if a_user in self.entry_of:
+                return
+            entry = (-a_user.calculate_score(), next(self.sequence), a_user)
+            bisect.insort(self.entries, entry)
+            self.entry_of[a_user] = entry
+
+    def add_users(self, users): # Alta masiva: un único ordenamiento en vez de una inserción por usuario
+        with self.lock:
+            for a_user in users:
+                if a_user not in self.entry_of:
+                    entry = (-a_user.calculate_score(), next(self.sequence), a_user)
+                    self.entries.append(entry)
+                    self.entry_of[a_user] = entry
+            self.entries.sort()
+
+    def score_changed(self, a_user):
+        with self.lock:
+            old_entry = self.entry_of[a_user]
+            del self.entries[bisect.bisect_left(self.entries, old_entry)]
+            entry = (-a_user.calculate_score(), old_entry[1], a_user)
+            bisect.insort(self.entries, entry)
+            self.entry_of[a_user] = entry
+
+    def top(self, n):
+        with self.lock:
+            return [entry[2] for entry in self.entries[:n]]
+
+    def rank_of(self, a_user): # 1 + cantidad de usuarios con puntaje estrictamente mayor
+        with self.lock:
+            return bisect.bisect_left(self.entries, (self.entry_of[a_user][0],)) + 1
+
+class DayPopularity: # Preguntas de un día ordenadas por votos positivos, con la suma de esos votos para el promedio
+    def __init__(self):
+        # Tuplas (-votos positivos, timestamp, orden de alta, pregunta) ordenadas: ante empates, el orden del día
+        self.entries = []
+        self.entry_of = {}
+        self.sequence = count()
+        self.positive_total = 0
+        self.lock = ConcurrencyMode.new_lock()
+
+    def add(self, a_question):
+        with self.lock:
+            if a_question not in self.entry_of:
+                bisect.insort(self.entries, self._new_entry(a_question))
+
+    def add_all(self, questions): # Alta masiva: un único ordenamiento en vez de una inserción por pregunta
+        with self.lock:
+            self.entries.extend(self._new_entry(q) for q in questions if q not in self.entry_of)
+            self.entries.sort()
+
+    def _new_entry(self, a_question):
+        entry = (-a_question.positive_votes_count(), a_question.timestamp, next(self.sequence), a_question)
+        self.entry_of[a_question] = entry
+        self.positive_total -= entry[0]
+        a_question.popularity = self
+        return entry
+
+    def votes_changed(self, a_question): # Lo invoca la pregunta cuando cambian sus votos positivos
+        with self.lock:
+            old_entry = self.entry_of[a_question]
+            del self.entries[bisect.bisect_left(self.entries, old_entry)]
+            entry = (-a_question.positive_votes_count(), *old_entry[1:])
+            bisect.insort(self.entries, entry)
+            self.entry_of[a_question] = entry
+            self.positive_total += old_entry[0] - entry[0]
+
+    def average(self):
+        with self.lock:
+            return self.positive_total / len(self.entries) if self.entries else 0
+
+    def count_above_average(self): # Cuántas superan el promedio, incluidas las que después se filtran
+        with self.lock:
+            if not self.entries:
+                return 0
+            # Superar el promedio es tener más votos que su parte entera
+            return bisect.bisect_left(self.entries, (-math.floor(self.positive_total / len(self.entries)),))
+
+    def above_average(self, a_user, limit): # Las más votadas que superan el promedio, sin las de a_user
+        # Lectura de rango: se recorre el principio del orden hasta caer al promedio o completar el límite
+        with self.lock:
+            if not self.entries:
+                return []
+            average = self.positive_total / len(self.entries)
+            questions = []
+            for entry in self.entries:
+                if -entry[0] <= average or len(questions) == limit:
+                    break
+                if entry[3].user is not a_user:
+                    questions.append(entry[3])
+            return questions
 
 
 # =================== ENTIDADES PRINCIPALES =================== #
 class Answer(Votable, Describable): # Representa una respuesta a una pregunta, puede recibir votos y tiene descripción
+    SCORE_POINTS = 20 # Puntos que suma al autor mientras tenga más votos positivos que negativos
+    __slots__ = ('votes_manager', 'description', 'timestamp', 'user', 'question', 'lock')
+
     def __init__(self, question, user, description):
-        self.votes_manager = VotesManager()
-        self.description_manager = DescriptionManager(description)
+        self.votes_manager = NO_VOTES
+        self.lock = ConcurrencyMode.new_lock() # Protege sus votos
+        self.description = description
         self.timestamp = datetime.now()
         self.user = user
         self.question = question
         question.add_answer(self)
         user.add_answer(self)
+        self.publish("answer_created", self)
+
+    def add_vote(self, vote):
+        with self.lock:
+            self.own_votes_manager().add_vote(vote)
+
+    def cast_vote(self, a_user, is_like=True): # Vota, o cambia el voto que a_user ya había dado; devuelve el voto
+        with self.lock:
+            return self.own_votes_manager().cast_vote(a_user, is_like)
+
+    def retract_vote(self, a_user): # Quita el voto de a_user, si lo hay; devuelve el voto quitado o None
+        with self.lock:
+            return self.votes_manager.remove_vote(a_user)
 
-    def add_vote(self, vote): self.votes_manager.add_vote(vote)
+    def get_vote_of(self, a_user): return self.votes_manager.get_vote_of(a_user)
+
+    def own_votes_manager(self): # Reserva el VotesManager propio recién con el primer voto
+        if self.votes_manager is NO_VOTES:
+            self.votes_manager = VotesManager(self)
+        return self.votes_manager
     
     def get_votes(self): return self.votes_manager.get_votes()
     
@@ -74,9 +537,24 @@ class Answer(Votable, Describable): # Representa una respuesta a una pregunta, p
     
     def negative_votes(self): return self.votes_manager.filter_votes(lambda vote: not vote.is_like())
 
-    def get_description(self): return self.description_manager.get_description()
+    def positive_votes_count(self): return self.votes_manager.count_positive_votes()
+
+    def negative_votes_count(self): return self.votes_manager.count_negative_votes()
+
+    def votes_changed(self, old_positive, old_negative):
+        was_positive = old_positive > old_negative
+        is_positive = self.positive_votes_count() > self.negative_votes_count()
+        if was_positive != is_positive:
+            self.user.add_score(self.SCORE_POINTS if is_positive else -self.SCORE_POINTS)
+        self.question.answer_votes_changed(self)
+
+    def get_description(self): return self.description
     
-    def set_description(self, new_description): self.description_manager.set_description(new_description)
+    def set_description(self, new_description):
+        self.description = new_description
+        self.publish("description_changed", self)
+
+    def publish(self, event, *args): self.question.publish(event, *args) # Las respuestas pertenecen al sistema de su pregunta
 
     def get_question(self): return self.question
     
@@ -85,23 +563,49 @@ class Answer(Votable, Describable): # Representa una respuesta a una pregunta, p
     def get_timestamp(self): return self.timestamp
 
 class Question(Votable, Describable): # Representa una pregunta del sistema, puede recibir votos y tiene descripción
+    SCORE_POINTS = 10 # Puntos que suma al autor mientras tenga más votos positivos que negativos
+    __slots__ = ('votes_manager', 'description', 'timestamp', 'title', 'answer_entries', 'ranked_answers', 'user', 'topics',
+                 'popularity', 'system', 'lock')
+
     def __init__(self, user, title, description, topics=None):
         if topics is None:
             topics = []
             
-        self.votes_manager = VotesManager()
-        self.description_manager = DescriptionManager(description)
+        self.votes_manager = NO_VOTES
+        self.lock = ConcurrencyMode.new_lock() # Protege sus votos, tópicos y el ranking de respuestas
+        self.description = description
         self.timestamp = datetime.now()
         self.title = title
-        self.answers = []
+        self.answer_entries = EMPTY_SET # Respuesta -> entrada en ranked_answers, en orden de llegada
+        self.ranked_answers = EMPTY_LIST # Tuplas (-puntaje neto, orden de llegada, respuesta) ordenadas
         self.user = user
         self.user.add_question(self)
-        self.topics = []
+        self.topics = EMPTY_SET # Diccionario usado como conjunto ordenado
+        self.popularity = None # DayPopularity de su día, una vez agregada a un CuOOra
+        self.system = None # CuOOra al que se agregó; sus eventos llegan también al del autor
         
         for topic in topics:
-            self.add_topic(topic)
+            self._tag(topic)
+        self.publish("question_created", self)
 
-    def add_vote(self, vote): self.votes_manager.add_vote(vote)
+    def add_vote(self, vote):
+        with self.lock:
+            self.own_votes_manager().add_vote(vote)
+
+    def cast_vote(self, a_user, is_like=True): # Vota, o cambia el voto que a_user ya había dado; devuelve el voto
+        with self.lock:
+            return self.own_votes_manager().cast_vote(a_user, is_like)
+
+    def retract_vote(self, a_user): # Quita el voto de a_user, si lo hay; devuelve el voto quitado o None
+        with self.lock:
+            return self.votes_manager.remove_vote(a_user)
+
+    def get_vote_of(self, a_user): return self.votes_manager.get_vote_of(a_user)
+
+    def own_votes_manager(self): # Reserva el VotesManager propio recién con el primer voto
+        if self.votes_manager is NO_VOTES:
+            self.votes_manager = VotesManager(self)
+        return self.votes_manager
     
     def get_votes(self): return self.votes_manager.get_votes()
     
@@ -109,11 +613,35 @@ class Question(Votable, Describable): # Representa una pregunta del sistema, pue
     
     def negative_votes(self): return self.votes_manager.filter_votes(lambda vote: not vote.is_like())
 
-    def get_description(self): return self.description_manager.get_description()
+    def positive_votes_count(self): return self.votes_manager.count_positive_votes()
+
+    def negative_votes_count(self): return self.votes_manager.count_negative_votes()
+
+    def votes_changed(self, old_positive, old_negative):
+        was_positive = old_positive > old_negative
+        is_positive = self.positive_votes_count() > self.negative_votes_count()
+        if was_positive != is_positive:
+            self.user.add_score(self.SCORE_POINTS if is_positive else -self.SCORE_POINTS)
+        if self.positive_votes_count() != old_positive:
+            self.user.question_votes_changed(self)
+            if self.popularity is not None:
+                self.popularity.votes_changed(self)
+
+    def get_description(self): return self.description
     
-    def set_description(self, new_description): self.description_manager.set_description(new_description)
+    def set_description(self, new_description):
+        self.description = new_description
+        self.publish("description_changed", self)
 
-    def get_topics(self): return self.topics.copy()
+    def publish(self, event, *args):
+        if self.system is not None:
+            self.system.publish(event, *args)
+        if self.user.system is not self.system:
+            self.user.publish(event, *args)
+
+    def publishes_to(self, system): return system is self.system or system is self.user.system
+
+    def get_topics(self): return list(self.topics)
 
     def get_title(self): return self.title
     
@@ -121,89 +649,253 @@ class Question(Votable, Describable): # Representa una pregunta del sistema, pue
         if not new_title or not isinstance(new_title, str):
             raise ValueError("El título debe ser un string no vacío")
         self.title = new_title
+        self.publish("title_changed", self)
 
     def get_user(self): return self.user
 
     def get_timestamp(self): return self.timestamp
 
     def add_topic(self, topic):
-        if topic in self.topics: 
-            raise ValueError("El tópico ya está agregado")
-        self.topics.append(topic)
+        self._tag(topic)
+        self.publish("question_tagged", self, topic)
+
+    def _tag(self, topic):
+        with self.lock:
+            if topic in self.topics: 
+                raise ValueError("El tópico ya está agregado")
+            if not self.topics:
+                self.topics = {}
+            self.topics[topic] = None
         topic.add_question(self)
 
     def add_answer(self, answer):
-        if answer not in self.answers:
-            self.answers.append(answer)
+        with self.lock:
+            if answer in self.answer_entries:
+                return
+            if not self.answer_entries:
+                self.answer_entries = {}
+                self.ranked_answers = []
+            entry = (-Question._net_score(answer), len(self.answer_entries), answer)
+            bisect.insort(self.ranked_answers, entry)
+            self.answer_entries[answer] = entry
+        # Fuera del lock: el orden de adquisición es siempre respuesta antes que pregunta
+        if self.votes_manager.store is not None:
+            self.votes_manager.store.register_answer(answer)
+
+    def answer_votes_changed(self, answer): # Reubica la respuesta en el ranking cuando cambian sus votos
+        with self.lock:
+            old_entry = self.answer_entries[answer]
+            entry = (-Question._net_score(answer), old_entry[1], answer)
+            if entry[0] != old_entry[0]:
+                del self.ranked_answers[bisect.bisect_left(self.ranked_answers, old_entry)]
+                bisect.insort(self.ranked_answers, entry)
+                self.answer_entries[answer] = entry
+
+    def get_answers(self): return list(self.answer_entries)
+
+    @staticmethod
+    def _net_score(answer): return answer.positive_votes_count() - answer.negative_votes_count()
 
     def get_best_answer(self):
-        if not self.answers:
+        if not self.ranked_answers:
             return None
-        
-        return max(self.answers, key=lambda a: len(a.positive_votes()) - len(a.negative_votes()))
+
+        # Ante empates gana la respuesta más antigua, igual que max() sobre las respuestas
+        return self.ranked_answers[0][2]
+
+    def get_top_answers(self, n):
+        return [entry[2] for entry in self.ranked_answers[:n]]
 
 class Topic(Describable): # Representa un tema o categoría para clasificar preguntas
+    __slots__ = ('description', 'name', 'questions', 'system', 'foreign', 'lock')
+
     def __init__(self, name, description):
-        self.description_manager = DescriptionManager(description)
+        self.description = description
         self.name = name
-        self.questions = []
+        self.questions = EMPTY_SET # Diccionario usado como conjunto ordenado
+        self.system = None # Primer CuOOra al que llegaron los eventos de una de sus preguntas
+        self.foreign = 0 # Preguntas cuyos eventos no llegan a ese sistema
+        self.lock = ConcurrencyMode.new_lock()
 
     def add_question(self, a_question):
-        if a_question not in self.questions:
-            self.questions.append(a_question)
+        system = a_question.system if a_question.system is not None else a_question.user.system
+        with self.lock:
+            if a_question in self.questions:
+                return
+            if not self.questions:
+                self.questions = {}
+            self.questions[a_question] = None
+            if self.system is None:
+                if system is not None: # Las anteriores no publican en ningún sistema
+                    self.system, self.foreign = system, len(self.questions) - 1
+                return
+            if a_question.publishes_to(self.system):
+                return
+            self.foreign += 1
+            owner = self.system if self.foreign == 1 else None
+        if owner is not None: # Hasta ahora veía todos sus cambios: se le avisa que dejó de verlos
+            owner.publish("topic_untracked", self)
+
+    def question_reached(self, system): # Los eventos de una de sus preguntas empiezan a llegar también a system
+        with self.lock:
+            if self.system is None:
+                self.system, self.foreign = system, len(self.questions) - 1
+            elif system is self.system:
+                self.foreign -= 1
+
+    def watch(self, system): # Un tópico todavía vacío queda a cargo del sistema del primer interesado
+        with self.lock:
+            if system is not None and self.system is None and not self.questions:
+                self.system = system
+
+    def publishes_to(self, system): return system is self.system and self.foreign == 0
 
     def get_name(self): return self.name
 
     def set_name(self, an_object): self.name = an_object
 
-    def get_questions(self): return self.questions.copy()
+    def get_questions(self): return list(self.questions)
     
-    def get_description(self): return self.description_manager.get_description()
+    def get_description(self): return self.description
     
-    def set_description(self, new_description): self.description_manager.set_description(new_description)
+    def set_description(self, new_description): self.description = new_description
 
 
 class User: # Representa un usuario del sistema con sus preguntas, respuestas y relaciones
+    __slots__ = ('username', 'password', 'questions', 'answers', 'topics_of_interest', 'following', 'followers',
+                 'votes', 'inbox', 'ranked_questions', 'question_entries', 'score', 'system', 'lock')
+
     def __init__(self, username, password):
         self.username = username
         self.password = password
-        self.questions = []
-        self.answers = []
-        self.topics_of_interest = []
-        self.following = []
-        self.votes = []
+        self.questions = EMPTY_LIST
+        self.answers = EMPTY_LIST
+        self.topics_of_interest = EMPTY_SET # Diccionario usado como conjunto ordenado
+        self.following = EMPTY_SET # Diccionarios usados como conjuntos ordenados: alta, baja y consulta en O(1)
+        self.followers = EMPTY_SET
+        self.votes = EMPTY_SET # Diccionario usado como conjunto ordenado: la baja de un voto es O(1)
+        self.inbox = False # Opcional: el feed social mezcla los rankings de los seguidos en vez de recorrer todo
+        self.ranked_questions = None # Tuplas (-votos positivos, orden de publicación, pregunta) ordenadas; se
+        self.question_entries = None # arman al primer uso y desde entonces se mantienen al día, como DayPopularity
+        self.score = 0 # Se mantiene al día a medida que se votan sus preguntas y respuestas
+        self.system = None # CuOOra en el que está registrado
+        self.lock = ConcurrencyMode.new_lock() # Protege sus colecciones, su ranking de preguntas y su puntaje
 
     def add_topic(self, a_topic):
-        if a_topic not in self.topics_of_interest:
-            self.topics_of_interest.append(a_topic)
+        with self.lock:
+            if a_topic in self.topics_of_interest:
+                return
+            if not self.topics_of_interest:
+                self.topics_of_interest = {}
+            self.topics_of_interest[a_topic] = None
+        a_topic.watch(self.system)
+        self.publish("topic_added", self, a_topic)
 
-    def get_votes(self): return self.votes.copy()
+    def get_votes(self): return list(self.votes)
 
-    def add_question(self, a_question): self.questions.append(a_question)
+    def add_question(self, a_question):
+        with self.lock:
+            if not self.questions:
+                self.questions = []
+            self.questions.append(a_question)
+            if self.ranked_questions is not None:
+                entry = (-a_question.positive_votes_count(), len(self.questions) - 1, a_question)
+                bisect.insort(self.ranked_questions, entry)
+                self.question_entries[a_question] = entry
 
     def get_username(self): return self.username
 
-    def get_questions(self): return self.questions.copy()
+    def get_questions(self): return list(self.questions)
 
     def follow(self, a_user):
-        if a_user not in self.following:
-            self.following.append(a_user)
+        with self._pair_locked(a_user):
+            if a_user in self.following:
+                return
+            if not self.following:
+                self.following = {}
+            self.following[a_user] = None
+            a_user._add_follower(self)
+            self.publish("followed", self, a_user)
 
     def stop_follow(self, a_user):
-        if a_user in self.following:
-            self.following.remove(a_user)
+        with self._pair_locked(a_user):
+            if a_user not in self.following:
+                return
+            del self.following[a_user]
+            del a_user.followers[self]
+            self.publish("unfollowed", self, a_user)
+
+    def _pair_locked(self, a_user): # Toma los locks de ambos usuarios siempre en el mismo orden
+        first, second = (self, a_user) if id(self) <= id(a_user) else (a_user, self)
+        return PairLock(first.lock, second.lock)
+
+    def _add_follower(self, a_user):
+        if not self.followers:
+            self.followers = {}
+        self.followers[a_user] = None
+
+    def get_followers(self): return list(self.followers)
+
+    # El ranking de cada autor se actualiza con sus votos, no con cada seguidor: la bandeja no cambia el
+    # resultado del feed, solo cuánto se recorre para armarlo
+    def enable_inbox(self): self.inbox = True
+
+    def disable_inbox(self): self.inbox = False
+
+    def has_inbox(self): return self.inbox
+
+    def top_questions(self, n): # Entradas de sus n preguntas más votadas; ante empates, las publicadas antes
+        with self.lock:
+            if self.ranked_questions is None:
+                self.question_entries = {q: (-q.positive_votes_count(), i, q) for i, q in enumerate(self.questions)}
+                self.ranked_questions = sorted(self.question_entries.values())
+            return self.ranked_questions[:n]
+
+    def question_votes_changed(self, a_question): # Lo invoca la pregunta cuando cambian sus votos positivos
+        with self.lock:
+            if self.ranked_questions is None:
+                return
+            old_entry = self.question_entries.get(a_question)
+            if old_entry is None: # Agregada por fuera de add_question
+                self.ranked_questions = self.question_entries = None
+                return
+            del self.ranked_questions[bisect.bisect_left(self.ranked_questions, old_entry)]
+            entry = (-a_question.positive_votes_count(), old_entry[1], a_question)
+            bisect.insort(self.ranked_questions, entry)
+            self.question_entries[a_question] = entry
+
+    def questions_reloaded(self): # Tras agregar preguntas sin pasar por add_question: se rearma al próximo uso
+        with self.lock:
+            self.ranked_questions = self.question_entries = None
+
+    def get_answers(self): return list(self.answers)
+
+    def get_following(self): return list(self.following)
+
+    def is_following(self, a_user): return a_user in self.following
 
-    def get_answers(self): return self.answers.copy()
+    def add_vote(self, a_vote):
+        if self.votes is EMPTY_SET: # Solo la reserva necesita el lock; asignar una clave ya es atómico
+            with self.lock:
+                if self.votes is EMPTY_SET:
+                    self.votes = {}
+        self.votes[a_vote] = None
 
-    def get_following(self): return self.following.copy()
+    def _remove_vote(self, a_vote): self.votes.pop(a_vote, None)
 
-    def add_vote(self, a_vote): self.votes.append(a_vote)
+    def get_votes_on(self, votables): # Su voto (o None) en cada uno, en orden; una búsqueda O(1) por objeto
+        return [votable.votes_manager.voters.get(self) for votable in votables]
 
     def get_password(self): return self.password
 
-    def add_answer(self, an_answer): self.answers.append(an_answer)
+    def add_answer(self, an_answer):
+        if self.answers is EMPTY_LIST:
+            with self.lock:
+                if self.answers is EMPTY_LIST:
+                    self.answers = []
+        self.answers.append(an_answer)
 
-    def get_topics_of_interest(self): return self.topics_of_interest.copy()
+    def get_topics_of_interest(self): return list(self.topics_of_interest)
 
     def set_password(self, an_object): self.password = an_object
 
@@ -212,135 +904,884 @@ class User: # Representa un usuario del sistema con sus preguntas, respuestas y
     def calculate_kind_score(kind_votes, score_points):
         score = 0
         for kind in kind_votes:
-            pv = len(kind.positive_votes())
-            nv = len(kind.negative_votes())
+            pv = kind.positive_votes_count()
+            nv = kind.negative_votes_count()
             if pv > nv:
                 score += score_points
         return score
 
-    def calculate_score(self):
-        question_score = User.calculate_kind_score(self.questions, 10)
-        answer_score = User.calculate_kind_score(self.answers, 20)
+    def calculate_score(self): return self.score
+
+    def recalculate_score(self): # Recorre todo lo publicado; sirve para verificar el puntaje mantenido
+        question_score = User.calculate_kind_score(self.questions, Question.SCORE_POINTS)
+        answer_score = User.calculate_kind_score(self.answers, Answer.SCORE_POINTS)
         return question_score + answer_score
 
+    def add_score(self, points):
+        with self.lock:
+            self.score += points
+            if self.system is not None:
+                self.system.leaderboard.score_changed(self)
+
+    def publish(self, event, *args):
+        if self.system is not None:
+            self.system.publish(event, *args)
+
 class Vote: # Representa un voto dado por un usuario
+    __slots__ = ('is_positive_vote', 'timestamp', 'user', 'votes_manager', 'store_row')
+
     def __init__(self, user, is_like=True):
         self.is_positive_vote = is_like
         self.timestamp = datetime.now()
         self.user = user
+        self.votes_manager = None # Lo asigna el VotesManager al registrar el voto
+        self.store_row = None # Fila en el VoteStore, si lo hay
         user.add_vote(self)
 
     def is_like(self): return self.is_positive_vote
 
     def get_user(self): return self.user
 
-    def like(self): self.is_positive_vote = True
+    def like(self): self._set_positive(True)
+
+    def dislike(self): self._set_positive(False)
 
-    def dislike(self): self.is_positive_vote = False
+    def _set_positive(self, is_like):
+        if self.votes_manager is None:
+            self.is_positive_vote = is_like
+        else:
+            self.votes_manager.set_vote_polarity(self, is_like)
+
+
+# =================== ALMACENAMIENTO COLUMNAR DE VOTOS =================== #
+class VoteStore: # Réplica columnar (una columna por atributo) de los votos para consultas masivas
+    QUESTION = 0
+    ANSWER = 1
+    REMOVED = -1 # Polaridad de un voto quitado
+    EPOCH = datetime(1970, 1, 1)
+
+    def __init__(self):
+        # Una fila por voto
+        self.voter_ids = array('q')
+        self.target_ids = array('q')
+        self.target_kinds = array('b')
+        self.polarities = array('b')
+        self.timestamps = array('q') # Microsegundos desde EPOCH
+
+        self.user_ids = {}
+        self.users = []
+        # Índices por tipo de objeto votado (pregunta, respuesta)
+        self.target_ids_of = ({}, {})
+        self.targets = ([], [])
+        self.target_authors = (array('q'), array('q'))
+        self.answer_questions = array('q') # Id de respuesta -> id de su pregunta
+        self.lock = ConcurrencyMode.new_lock()
+
+    def __len__(self): return len(self.voter_ids)
+
+    def _user_id(self, a_user):
+        user_id = self.user_ids.get(a_user)
+        if user_id is None:
+            user_id = self.user_ids[a_user] = len(self.users)
+            self.users.append(a_user)
+        return user_id
+
+    def _register_target(self, target, kind):
+        # Con el lock del objeto votado y luego el del almacén, el mismo orden que al votar
+        with target.lock, self.lock:
+            if target in self.target_ids_of[kind]:
+                return False
+            if kind == VoteStore.ANSWER:
+                self.answer_questions.append(self.target_ids_of[VoteStore.QUESTION][target.get_question()])
+            self.target_ids_of[kind][target] = len(self.targets[kind])
+            self.targets[kind].append(target)
+            self.target_authors[kind].append(self._user_id(target.get_user()))
+            target.own_votes_manager().store = self
+            for vote in target.get_votes():
+                self.append(vote, target)
+        return True
+
+    def register_question(self, a_question):
+        if self._register_target(a_question, VoteStore.QUESTION):
+            for answer in a_question.get_answers():
+                self.register_answer(answer)
+
+    def register_answer(self, an_answer): self._register_target(an_answer, VoteStore.ANSWER)
+
+    def append(self, a_vote, target):
+        kind = VoteStore.ANSWER if isinstance(target, Answer) else VoteStore.QUESTION
+        with self.lock:
+            a_vote.store_row = len(self.voter_ids)
+            self.voter_ids.append(self._user_id(a_vote.get_user()))
+            self.target_ids.append(self.target_ids_of[kind][target])
+            self.target_kinds.append(kind)
+            self.polarities.append(1 if a_vote.is_like() else 0)
+            self.timestamps.append((a_vote.timestamp - VoteStore.EPOCH) // timedelta(microseconds=1))
+
+    def vote_flipped(self, a_vote):
+        with self.lock:
+            self.polarities[a_vote.store_row] = 1 if a_vote.is_like() else 0
+
+    def vote_removed(self, a_vote): # La fila queda como lápida: las consultas la saltean
+        with self.lock:
+            self.polarities[a_vote.store_row] = VoteStore.REMOVED
+            a_vote.store_row = None
+
+    # ----- Consultas masivas: una sola pasada sobre las columnas ----- #
+    def _tallies(self):
+        positives = tuple(array('q', bytes(8 * len(targets))) for targets in self.targets)
+        nets = tuple(array('q', column) for column in positives)
+        for kind, target_id, polarity in zip(self.target_kinds, self.target_ids, self.polarities):
+            if polarity == 1:
+                positives[kind][target_id] += 1
+                nets[kind][target_id] += 1
+            elif polarity == 0:
+                nets[kind][target_id] -= 1
+        return positives, nets
+
+    def positive_counts(self): # Pregunta -> cantidad de votos positivos
+        positives, _ = self._tallies()
+        return dict(zip(self.targets[VoteStore.QUESTION], positives[VoteStore.QUESTION]))
+
+    def user_scores(self): # Usuario -> puntaje, con el mismo criterio que User.calculate_score
+        _, nets = self._tallies()
+        scores = array('q', bytes(8 * len(self.users)))
+        for kind, points in ((VoteStore.QUESTION, Question.SCORE_POINTS), (VoteStore.ANSWER, Answer.SCORE_POINTS)):
+            for author_id, net in zip(self.target_authors[kind], nets[kind]):
+                if net > 0:
+                    scores[author_id] += points
+        return dict(zip(self.users, scores))
+
+    def best_answers(self): # Pregunta -> mejor respuesta (o None), con el mismo desempate que get_best_answer
+        _, nets = self._tallies()
+        questions = self.targets[VoteStore.QUESTION]
+        best = [None] * len(questions)
+        best_net = [0] * len(questions)
+        for answer_id, (question_id, net) in enumerate(zip(self.answer_questions, nets[VoteStore.ANSWER])):
+            if best[question_id] is None or net > best_net[question_id]:
+                best[question_id] = answer_id
+                best_net[question_id] = net
+        answers = self.targets[VoteStore.ANSWER]
+        return {q: (answers[a] if a is not None else None) for q, a in zip(questions, best)}
 
 
 # =================== SISTEMA DE RECUPERACIÓN DE PREGUNTAS =================== #
 class IQuestionRetriever(ABC): # Interfaz base para recuperar preguntas
+    STRATEGY = None # Nombre de la estrategia en QuestionRetrieverFactory, usado como etiqueta de las métricas
+    DEFAULT_LIMIT = 100
+    DEFAULT_PAGE_SIZE = 20
+
+    def __init__(self, limit=DEFAULT_LIMIT):
+        self.limit = limit
+
     @abstractmethod
     def retrieve_questions(self, all_questions, user): pass
 
-    def _filter_and_sort(self, questions_collection, user, limit=100):
-        if not questions_collection:
-            return []
-            
-        # Ordenar por número de votos positivos
-        temp = sorted(questions_collection, key=lambda q: len(q.positive_votes()))
-        
-        # Limitar a 'limit' resultados (máximo 100)
-        result = temp[-min(limit, len(temp)):]
-        
-        # Filtrar preguntas hechas por el usuario actual
-        return [q for q in result if q.get_user() != user]
+    @abstractmethod
+    def _candidates(self, all_questions, user): pass # Preguntas entre las que elige la estrategia, sin ordenar
+
+    # ----- Resultados perezosos y paginados ----- #
+    # Mismo orden total que retrieve_questions: más votos positivos primero y, ante empates, el orden de la
+    # colección. El cursor guarda los votos del último elemento entregado y cuántos con esos mismos votos ya
+    # se entregaron; si los votos cambian entre páginas una pregunta puede cambiar de lado del cursor.
+    def iter_questions(self, all_questions, user, cursor=None): # Genera todo el ranking, sin límite, bajo demanda
+        # Un heap se arma en O(n) y entrega cada elemento en O(log n): no se ordena lo que no se consume
+        entries = self._entries(all_questions, user, cursor)
+        heapq.heapify(entries)
+        while entries:
+            yield heapq.heappop(entries)[2]
+
+    def retrieve_page(self, all_questions, user, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        # Devuelve (preguntas, cursor de la página siguiente o None si no hay más); selecciona en O(n log página)
+        page = heapq.nsmallest(page_size + 1, self._entries(all_questions, user, cursor))
+        if len(page) <= page_size:
+            return [entry[2] for entry in page], None
+        page.pop()
+        last_votes = page[-1][0]
+        repeated = sum(1 for entry in page if entry[0] == last_votes)
+        if cursor is not None:
+            cursor_votes, skip = IQuestionRetriever.decode_cursor(cursor)
+            if cursor_votes == last_votes:
+                repeated += skip
+        return [entry[2] for entry in page], IQuestionRetriever.encode_cursor(last_votes, repeated)
+
+    def _entries(self, all_questions, user, cursor): # Tuplas (-votos, orden en la colección, pregunta)
+        # Lee los atributos directamente: es el único paso que recorre todas las candidatas
+        entries = [(-q.votes_manager.positive_count, position, q)
+                   for position, q in enumerate(self._candidates(all_questions, user)) if q.user is not user]
+        if cursor is None:
+            return entries
+        votes, skip = IQuestionRetriever.decode_cursor(cursor)
+        after = [e for e in entries if e[0] > votes]
+        # Los empatados con el cursor ya están en orden de colección: se saltean los ya entregados
+        after.extend([e for e in entries if e[0] == votes][skip:])
+        return after
+
+    @staticmethod
+    def encode_cursor(negative_votes, repeated):
+        return base64.urlsafe_b64encode(f"{-negative_votes}:{repeated}".encode("ascii")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            votes, repeated = map(int, base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(":"))
+        except (ValueError, UnicodeError, AttributeError):
+            raise ValueError("Cursor inválido") from None
+        if votes < 0 or repeated < 0:
+            raise ValueError("Cursor inválido")
+        return -votes, repeated
+
+    def _filter_and_sort(self, questions_collection, user, limit=None):
+        if limit is None:
+            limit = self.limit
+
+        metrics = Metrics.active
+        if metrics is not None: # Para contar las candidatas hay que materializarlas
+            questions_collection = list(questions_collection)
+            metrics.observe("cuoora_candidates", len(questions_collection), strategy=self.STRATEGY)
+        result = IQuestionRetriever._top(questions_collection, user, limit)
+        if metrics is not None:
+            metrics.observe("cuoora_results", len(result), strategy=self.STRATEGY)
+        return result
+
+    @staticmethod
+    def _top(questions_collection, user, limit): # _filter_and_sort sin registrar métricas
+        # Filtrar preguntas hechas por el usuario actual antes de limitar
+        candidates = (q for q in questions_collection if q.get_user() != user)
+
+        # Seleccionar las 'limit' preguntas con más votos positivos en O(n log k).
+        # nlargest es estable: ante empates respeta el orden de la colección
+        return heapq.nlargest(limit, candidates, key=lambda q: q.positive_votes_count())
 
 # =============== ESTRATEGIAS DE RECUPERACIÓN DE PREGUNTAS =================== #
 class SocialQuestionRetriever(IQuestionRetriever): # Recupera preguntas basadas en los usuarios
+    STRATEGY = "social"
+
     def retrieve_questions(self, all_questions, user):
-        following_col = []
-        for follow in user.get_following():
-            following_col.extend(follow.get_questions())
-        
-        return self._filter_and_sort(following_col, user)
+        if user.has_inbox():
+            return self._merge_rankings(user)
+        return self._filter_and_sort(self._candidates(all_questions, user), user)
+
+    def _candidates(self, all_questions, user):
+        return chain.from_iterable(follow.get_questions() for follow in user.get_following())
+
+    def _merge_rankings(self, user):
+        # Mezcla k-way de los top-k de cada seguido: O(seguidos + k log seguidos) en vez de recorrer sus historiales.
+        # Ante empates gana el seguido antes y luego la publicada antes, el mismo orden que _filter_and_sort
+        following = [followed for followed in user.get_following() if followed is not user]
+        ranked = [followed.top_questions(self.limit) for followed in following]
+        merged = heapq.merge(*ranked, key=lambda entry: entry[0])
+        result = [entry[2] for entry in islice(merged, self.limit)]
+        metrics = Metrics.active
+        if metrics is not None:
+            metrics.observe("cuoora_candidates", sum(len(followed.questions) for followed in following),
+                            strategy=self.STRATEGY)
+            metrics.observe("cuoora_results", len(result), strategy=self.STRATEGY)
+        return result
 
 class TopicsQuestionRetriever(IQuestionRetriever): # Recupera preguntas basadas en los temas de interés del usuario
+    STRATEGY = "topics"
+
+    def _candidates(self, all_questions, user):
+        topic_questions = (topic.get_questions() for topic in user.get_topics_of_interest())
+        return TopicsQuestionRetriever._unique(chain.from_iterable(topic_questions))
+
     def retrieve_questions(self, all_questions, user):
-        topics_col = []
-        for topic in user.get_topics_of_interest():
-            topics_col.extend(topic.get_questions())
-        
-        return self._filter_and_sort(topics_col, user)
+        # Top-k de cada tópico y mezcla k-way de las listas ya ordenadas, sin repetir preguntas.
+        # Las métricas se registran una vez por pedido, como en las demás estrategias.
+        topics = user.get_topics_of_interest()
+        ranked_by_topic = [self._top(topic.get_questions(), user, self.limit) for topic in topics]
+        merged = heapq.merge(*ranked_by_topic, key=lambda q: q.positive_votes_count(), reverse=True)
+        result = list(islice(TopicsQuestionRetriever._unique(merged), self.limit))
+        metrics = Metrics.active
+        if metrics is not None:
+            metrics.observe("cuoora_candidates", sum(len(topic.get_questions()) for topic in topics),
+                            strategy=self.STRATEGY)
+            metrics.observe("cuoora_results", len(result), strategy=self.STRATEGY)
+        return result
+
+    @staticmethod
+    def _unique(questions):
+        seen = set()
+        for question in questions:
+            if question not in seen:
+                seen.add(question)
+                yield question
 
 
 class TodayQuestionRetriever(IQuestionRetriever): # Clase base para recuperadores que trabajan con preguntas de hoy
+    def __init__(self, limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now):
+        super().__init__(limit)
+        self.clock = clock
+
     def _get_today_questions(self, all_questions):
-        return [q for q in all_questions if q.get_timestamp().date() == datetime.today().date()]
+        today = self.clock().date()
+        return [q for q in all_questions if q.get_timestamp().date() == today]
 
 
 class NewsQuestionRetriever(TodayQuestionRetriever): # Recupera preguntas creadas hoy
+    STRATEGY = "news"
+
     def retrieve_questions(self, all_questions, user):
-        today_questions = self._get_today_questions(all_questions)
-        return self._filter_and_sort(today_questions, user)
+        return self._filter_and_sort(self._candidates(all_questions, user), user)
+
+    def _candidates(self, all_questions, user): return self._get_today_questions(all_questions)
 
 
 class PopularTodayQuestionRetriever(TodayQuestionRetriever): # Recupera praguntas creadas hoy con muchos votos positivos
+    STRATEGY = "popular_today"
+
     def retrieve_questions(self, all_questions, user):
+        return self._filter_and_sort(self._candidates(all_questions, user), user)
+
+    def retrieve_popular(self, day_popularity, user): # Mismo resultado, leyendo el agregado del día ya ordenado
+        questions = day_popularity.above_average(user, self.limit) if day_popularity is not None else []
+        metrics = Metrics.active
+        if metrics is not None: # Las mismas observaciones que _filter_and_sort
+            candidates = day_popularity.count_above_average() if day_popularity is not None else 0
+            metrics.observe("cuoora_candidates", candidates, strategy=self.STRATEGY)
+            metrics.observe("cuoora_results", len(questions), strategy=self.STRATEGY)
+        return questions
+
+    def _candidates(self, all_questions, user):
         today_questions = self._get_today_questions(all_questions)
         
         if not today_questions:
             return []
         
-        average_votes = sum(len(q.positive_votes()) for q in today_questions) / len(today_questions)
-        popular_questions = [q for q in today_questions if len(q.positive_votes()) > average_votes]
-        
-        return self._filter_and_sort(popular_questions, user)
+        average_votes = sum(q.positive_votes_count() for q in today_questions) / len(today_questions)
+        return [q for q in today_questions if q.positive_votes_count() > average_votes]
+
+
+class BlendedQuestionRetriever(TodayQuestionRetriever): # Un único feed con las candidatas social, de tópicos y de hoy
+    # Puntaje de cada candidata, calculado en una sola pasada:
+    #   FOLLOWED_WEIGHT si el autor es seguido + TOPIC_WEIGHT por tópico de interés en común
+    #   + RECENCY_WEIGHT * 0.5 ** (antigüedad / RECENCY_HALF_LIFE) + VOTES_WEIGHT * log(1 + votos netos)
+    # Ante empates, el orden de recolección: seguidos, tópicos y hoy. De all_questions solo entran las de hoy,
+    # como en news y popular_today.
+    STRATEGY = "blended"
+    FOLLOWED_WEIGHT = 1.0
+    TOPIC_WEIGHT = 0.5
+    RECENCY_WEIGHT = 1.0
+    RECENCY_HALF_LIFE = timedelta(hours=24)
+    VOTES_WEIGHT = 0.5
+
+    def __init__(self, limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now, followed_weight=FOLLOWED_WEIGHT,
+                 topic_weight=TOPIC_WEIGHT, recency_weight=RECENCY_WEIGHT, votes_weight=VOTES_WEIGHT):
+        super().__init__(limit, clock)
+        self.followed_weight = followed_weight
+        self.topic_weight = topic_weight
+        self.recency_weight = recency_weight
+        self.votes_weight = votes_weight
+
+    def retrieve_questions(self, all_questions, user):
+        candidates = self._gather(all_questions, user)
+        metrics = Metrics.active
+        if metrics is not None:
+            metrics.observe("cuoora_candidates", len(candidates), strategy=self.STRATEGY)
+        now = self.clock()
+        votes_weight, recency_weight = self.votes_weight, self.recency_weight
+        half_life = BlendedQuestionRetriever.RECENCY_HALF_LIFE.total_seconds()
+        log1p = math.log1p
+        # Una sola pasada con aritmética de floats; lee los atributos directamente porque recorre todas las candidatas
+        questions = []
+        scores = []
+        for question, score in candidates.items():
+            if question.user is user:
+                continue
+            manager = question.votes_manager
+            net_votes = manager.positive_count - manager.negative_count
+            if net_votes > 0:
+                score += votes_weight * log1p(net_votes)
+            age = (now - question.timestamp).total_seconds()
+            score += recency_weight * 2.0 ** (-age / half_life) if age > 0 else recency_weight
+            questions.append(question)
+            scores.append(score)
+        # nlargest es estable: ante empates respeta el orden de recolección
+        best = heapq.nlargest(self.limit, range(len(scores)), key=scores.__getitem__)
+        result = [questions[i] for i in best]
+        if metrics is not None:
+            metrics.observe("cuoora_results", len(result), strategy=self.STRATEGY)
+        return result
+
+    def _candidates(self, all_questions, user): return list(self._gather(all_questions, user))
+
+    def _gather(self, all_questions, user): # Candidata -> parte del puntaje que depende del lector, sin repetir
+        social = chain.from_iterable(followed.get_questions() for followed in user.get_following())
+        candidates = dict.fromkeys(social, self.followed_weight)
+        get, topic_weight = candidates.get, self.topic_weight
+        for topic in user.get_topics_of_interest():
+            for question in topic.get_questions():
+                candidates[question] = get(question, 0.0) + topic_weight
+        for question in self._get_today_questions(all_questions):
+            if question not in candidates:
+                candidates[question] = 0.0
+        return candidates
+
+    def _entries(self, all_questions, user, cursor): # El orden por puntaje no entra en los cursores por votos
+        raise ValueError("La estrategia blended no admite paginación")
+
+
+# =================== CACHÉ DE FEEDS =================== #
+class FeedCache(CuOOraListener): # Resultados recientes por (estrategia, usuario, límite), con LRU y vencimiento
+    DEFAULT_MAX_ENTRIES = 10000
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None, system=None):
+        self.max_entries = max_entries
+        self.system = system # CuOOra cuyos eventos escucha; sin él se asume que escucha todos
+        self.ttl = ttl # timedelta opcional; los feeds de hoy además vencen al cambiar el día
+        self.entries = {} # Clave -> (preguntas, día, vencimiento, dependencias); el orden es el de uso
+        self.dependents = {} # Dependencia -> claves cuyo resultado cambia con ella
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bypasses = 0
+        self.generation = 0 # Cuenta invalidaciones: lo calculado mientras cambiaban los datos no se guarda
+        self.lock = ConcurrencyMode.new_lock()
+
+    def get(self, strategy, user, limit, now, compute):
+        key = (strategy, user, limit)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] == now.date() and (entry[2] is None or now < entry[2]):
+                    self.hits += 1
+                    self.entries[key] = self.entries.pop(key) # Pasa a ser el más reciente
+                    return list(entry[0])
+                self.expirations += 1
+                self._remove(key)
+            self.misses += 1
+            generation = self.generation
+        dependencies = self._dependencies(strategy, user, now)
+        questions = compute(now)
+        with self.lock:
+            if dependencies is None:
+                self.bypasses += 1
+            elif generation == self.generation:
+                self._store(key, questions, now, dependencies)
+        return list(questions)
+
+    def _dependencies(self, strategy, user, now):
+        # Solo los feeds de hoy dependen del día; los demás, de a quién sigue o qué tópicos le interesan.
+        # None si alguno de esos cambios no se publica en el sistema: el lector o un autor seguido no están
+        # registrados en él, un tópico tiene preguntas cuyos eventos van a otro lado o, para los feeds de hoy,
+        # el sistema tiene preguntas que se agregaron antes a otro
+        system = self.system
+        if strategy in ("news", "popular_today", "blended") and system is not None and system.foreign_questions:
+            return None
+        if strategy == "social":
+            following = user.get_following()
+            if system is not None and (user.system is not system or any(f.system is not system for f in following)):
+                return None
+            return [("following", user), *(("author", followed) for followed in following)]
+        if strategy == "topics":
+            topics = user.get_topics_of_interest()
+            if system is not None and (user.system is not system or not all(t.publishes_to(system) for t in topics)):
+                return None
+            return [("interests", user), *(("topic", topic) for topic in topics)]
+        if strategy == "blended": # También envejece con el reloj: conviene usarlo con ttl
+            social, topics = self._dependencies("social", user, now), self._dependencies("topics", user, now)
+            if social is None or topics is None:
+                return None
+            return [*social, *topics, ("day", now.date())]
+        return [("day", now.date())]
+
+    def _store(self, key, questions, now, dependencies):
+        if key in self.entries:
+            self._remove(key)
+        expires = now + self.ttl if self.ttl is not None else None
+        self.entries[key] = (questions, now.date(), expires, dependencies)
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(key)
+        if len(self.entries) > self.max_entries:
+            self.evictions += 1
+            self._remove(next(iter(self.entries))) # El usado hace más tiempo
+
+    def _remove(self, key):
+        for dependency in self.entries.pop(key)[3]:
+            keys = self.dependents[dependency]
+            keys.discard(key)
+            if not keys:
+                del self.dependents[dependency]
+
+    def _invalidate(self, dependency):
+        with self.lock:
+            self.generation += 1
+            for key in list(self.dependents.get(dependency, ())):
+                self.invalidations += 1
+                self._remove(key)
+
+    def _question_changed(self, question): # Afecta a quienes la tienen entre sus candidatas
+        self._invalidate(("author", question.get_user()))
+        for topic in question.get_topics():
+            self._invalidate(("topic", topic))
+        self._invalidate(("day", question.get_timestamp().date()))
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.dependents.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "expirations": self.expirations, "invalidations": self.invalidations, "bypasses": self.bypasses,
+                    "size": len(self.entries)}
+
+    # ----- Modificaciones observadas ----- #
+    def question_created(self, question): self._question_changed(question)
+
+    def question_added(self, question): self._question_changed(question)
+
+    def vote_added(self, votable, vote):
+        if isinstance(votable, Question):
+            self._question_changed(votable)
+
+    def vote_flipped(self, votable, vote):
+        if isinstance(votable, Question):
+            self._question_changed(votable)
+
+    def vote_removed(self, votable, vote):
+        if isinstance(votable, Question):
+            self._question_changed(votable)
+
+    def followed(self, user, followed_user): self._invalidate(("following", user))
+
+    def unfollowed(self, user, followed_user): self._invalidate(("following", user))
+
+    def topic_added(self, user, topic): self._invalidate(("interests", user))
+
+    def question_tagged(self, question, topic): self._invalidate(("topic", topic))
+
+    def topic_untracked(self, topic): self._invalidate(("topic", topic))
 
 
 # =================== FÁBRICA Y SISTEMA PRINCIPAL =================== #
 class QuestionRetrieverFactory: # Fábrica que crea las diferentes implementaciones de recuperadores de preguntas
+    STRATEGIES = ("social", "topics", "news", "popular_today")
+
+    @staticmethod
+    def create(strategy, limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now):
+        if strategy == "social":
+            return QuestionRetrieverFactory.create_social(limit)
+        if strategy == "topics":
+            return QuestionRetrieverFactory.create_topics(limit)
+        if strategy == "news":
+            return QuestionRetrieverFactory.create_news(limit, clock)
+        if strategy == "popular_today":
+            return QuestionRetrieverFactory.create_popular_today(limit, clock)
+        if strategy == "blended":
+            return QuestionRetrieverFactory.create_blended(limit, clock)
+        raise ValueError(f"Estrategia desconocida: {strategy}")
+
     @staticmethod
-    def create_social():
-        return SocialQuestionRetriever()
+    def create_social(limit=IQuestionRetriever.DEFAULT_LIMIT):
+        return SocialQuestionRetriever(limit)
 
     @staticmethod
-    def create_topics():
-        return TopicsQuestionRetriever()
+    def create_topics(limit=IQuestionRetriever.DEFAULT_LIMIT):
+        return TopicsQuestionRetriever(limit)
 
     @staticmethod
-    def create_news():
-        return NewsQuestionRetriever()
+    def create_news(limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now):
+        return NewsQuestionRetriever(limit, clock)
 
     @staticmethod
-    def create_popular_today():
-        return PopularTodayQuestionRetriever()
+    def create_popular_today(limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now):
+        return PopularTodayQuestionRetriever(limit, clock)
+
+    @staticmethod
+    def create_blended(limit=IQuestionRetriever.DEFAULT_LIMIT, clock=datetime.now):
+        return BlendedQuestionRetriever(limit, clock)
 
 
 class CuOOra: # Clase principal que representa todo el sistema CuOOra
-    def __init__(self):
+    def __init__(self, clock=datetime.now):
         self.questions = []
+        self.questions_by_day = {} # Fecha -> preguntas de ese día ordenadas por timestamp
+        self.foreign_questions = 0 # Agregadas antes a otro sistema: sus eventos se publican allá
+        self.popularity_by_day = {} # Fecha -> DayPopularity con las preguntas de ese día
+        self.users = []
+        self.leaderboard = Leaderboard()
+        self.vote_store = None
+        self.feed_cache = None
+        self.listeners = []
+        # Modo concurrente (ver enable_concurrency): lectura/escritura de las preguntas y entrega de eventos
+        self.questions_reading = NO_LOCK
+        self.questions_writing = NO_LOCK
+        self.publish_lock = NO_LOCK
+        self.concurrency_users = 0 # enable_concurrency sin su disable_concurrency
+        self.clock = clock
         self.retriever_factory = QuestionRetrieverFactory()
 
     def add_question(self, a_question):
-        self.questions.append(a_question)
+        claimed = self._claim_question(a_question)
+        with self.questions_writing:
+            self.questions.append(a_question)
+            if not claimed:
+                self.foreign_questions += 1
+            day_questions = self.questions_by_day.setdefault(a_question.get_timestamp().date(), [])
+            bisect.insort(day_questions, a_question, key=lambda q: q.get_timestamp())
+            self._day_popularity(a_question.get_timestamp().date()).add(a_question)
+            if self.vote_store is not None:
+                self.vote_store.register_question(a_question)
+        self.publish("question_added", a_question)
+
+    def add_questions(self, questions): # Alta masiva: ordena cada día afectado una sola vez
+        questions = list(questions)
+        foreign = sum(not self._claim_question(a_question) for a_question in questions)
+        with self.questions_writing:
+            self.foreign_questions += foreign
+            touched_days = set()
+            for a_question in questions:
+                self.questions.append(a_question)
+                day = a_question.get_timestamp().date()
+                self.questions_by_day.setdefault(day, []).append(a_question)
+                touched_days.add(day)
+                if self.vote_store is not None:
+                    self.vote_store.register_question(a_question)
+            for day in touched_days:
+                self.questions_by_day[day].sort(key=lambda q: q.get_timestamp())
+                self._day_popularity(day).add_all(self.questions_by_day[day])
+        if self.listeners:
+            for a_question in questions:
+                self.publish("question_added", a_question)
         
-    def get_questions(self):
-        return self.questions.copy()
+    def _claim_question(self, a_question): # Sus eventos pasan a llegar aquí, salvo que ya se agregara a otro sistema
+        if a_question.system not in (None, self):
+            return a_question.publishes_to(self)
+        reached = not a_question.publishes_to(self)
+        a_question.system = self
+        if reached:
+            for topic in a_question.get_topics():
+                topic.question_reached(self)
+        return True
+
+    def _reach_questions_of(self, a_user): # Al registrarse, los eventos de sus preguntas empiezan a llegar aquí
+        for a_question in a_user.get_questions():
+            if a_question.system is not self:
+                for topic in a_question.get_topics():
+                    topic.question_reached(self)
+        for topic in a_user.get_topics_of_interest():
+            topic.watch(self)
+
+    def _day_popularity(self, day):
+        popularity = self.popularity_by_day.get(day)
+        if popularity is None:
+            popularity = self.popularity_by_day[day] = DayPopularity()
+        return popularity
 
-    def get_social_questions_for_user(self, user):
-        retriever = self.retriever_factory.create_social()
-        return retriever.retrieve_questions(self.questions, user)
-
-    def get_topic_questions_for_user(self, user):
-        retriever = self.retriever_factory.create_topics()
-        return retriever.retrieve_questions(self.questions, user)
-
-    def get_news_questions_for_user(self, user):
-        retriever = self.retriever_factory.create_news()
-        return retriever.retrieve_questions(self.questions, user)
-
-    def get_popular_questions_for_user(self, user):
-        retriever = self.retriever_factory.create_popular_today()
-        return retriever.retrieve_questions(self.questions, user)
+    def get_questions(self):
+        with self.questions_reading:
+            return self.questions.copy()
+
+    def get_questions_of_day(self, a_date):
+        with self.questions_reading:
+            return self.questions_by_day.get(a_date, []).copy()
+
+    def enable_vote_store(self): # Replica en columnas los votos de todas las preguntas del sistema
+        with self.questions_writing:
+            if self.vote_store is None:
+                self.vote_store = VoteStore()
+                for question in self.questions:
+                    self.vote_store.register_question(question)
+        return self.vote_store
+
+    def enable_concurrency(self):
+        # Sincroniza votos y ranking por objeto votado, colecciones y puntaje por usuario, y las
+        # preguntas del sistema con un lock de lectura/escritura. Se activa antes de repartir el
+        # sistema entre hilos; las entidades creadas desde entonces ya nacen con su lock.
+        # Cada enable se corresponde con un disable: el modo sigue mientras quede alguien usándolo.
+        with ConcurrencyMode.counting:
+            self.concurrency_users += 1
+            if self.concurrency_users > 1:
+                return
+            ConcurrencyMode.systems += 1
+            ConcurrencyMode.enabled = True
+        questions_lock = ReadWriteLock()
+        self.questions_reading, self.questions_writing = questions_lock.reading, questions_lock.writing
+        self.publish_lock = threading.RLock()
+        # Los observadores con lock propio (caché, índices) también pasan a sincronizar
+        listeners = [listener for listener in self.listeners if hasattr(listener, "lock")]
+        for lockable in (self.leaderboard, self.vote_store, Metrics.active, *listeners, *self.popularity_by_day.values(),
+                         *self._reachable_entities()):
+            if lockable is not None and lockable.lock is NO_LOCK:
+                lockable.lock = threading.RLock()
+
+    def disable_concurrency(self):
+        # Vuelve al modo secuencial cuando ya no hay otros hilos usando el sistema: las entidades nuevas nacen sin
+        # lock y las secciones del sistema dejan de sincronizar; las existentes conservan el suyo, ahora sin disputa.
+        # Solo el último disable del sistema lo afecta, y el modo global se apaga con el último sistema.
+        with ConcurrencyMode.counting:
+            if self.concurrency_users == 0:
+                return
+            self.concurrency_users -= 1
+            if self.concurrency_users:
+                return
+            ConcurrencyMode.systems -= 1
+            ConcurrencyMode.enabled = ConcurrencyMode.systems > 0
+        self.questions_reading = self.questions_writing = self.publish_lock = NO_LOCK
+
+    def _reachable_entities(self): # Usuarios alcanzables desde el sistema, lo que publicaron y sus tópicos
+        users = dict.fromkeys(self.users)
+        users.update(dict.fromkeys(q.get_user() for q in self.questions))
+        pending = list(users)
+        topics = {}
+        while pending:
+            a_user = pending.pop()
+            yield a_user
+            related = [*a_user.following, *a_user.followers]
+            topics.update(dict.fromkeys(a_user.topics_of_interest))
+            for question in a_user.questions:
+                yield question
+                topics.update(dict.fromkeys(question.topics))
+                for votable in (question, *question.answer_entries):
+                    if votable is not question:
+                        yield votable
+                        related.append(votable.get_user())
+                    related.extend(vote.get_user() for vote in votable.get_votes())
+            related.extend(answer.get_question().get_user() for answer in a_user.answers)
+            related.extend(vote.votes_manager.owner.get_user() for vote in a_user.votes
+                           if vote.votes_manager is not None and vote.votes_manager.owner is not None)
+            for other in related:
+                if other not in users:
+                    users[other] = None
+                    pending.append(other)
+        yield from topics
+
+    def enable_feed_cache(self, max_entries=FeedCache.DEFAULT_MAX_ENTRIES, ttl=None):
+        # Solo guarda los feeds cuyos cambios se publican aquí (ver FeedCache._dependencies); el resto se calcula
+        if self.feed_cache is None:
+            self.feed_cache = FeedCache(max_entries, ttl, self)
+            self.add_listener(self.feed_cache)
+        return self.feed_cache
+
+    def disable_feed_cache(self):
+        if self.feed_cache is not None:
+            self.remove_listener(self.feed_cache)
+            self.feed_cache = None
+
+    def enable_metrics(self, profiler=None):
+        # Las métricas son del proceso: miden también a los demás CuOOra y a las entidades sueltas
+        if Metrics.active is None:
+            Metrics.active = Metrics(profiler)
+        elif profiler is not None:
+            Metrics.active.profiler = profiler
+        return Metrics.active
+
+    def disable_metrics(self):
+        Metrics.active = None
+
+    def add_user(self, a_user):
+        with a_user.lock:
+            if a_user.system is not None:
+                raise ValueError("El usuario ya pertenece a un sistema")
+            a_user.system = self
+        self._reach_questions_of(a_user)
+        self.users.append(a_user)
+        self.leaderboard.add_user(a_user)
+        self.publish("user_added", a_user)
+
+    def add_users(self, users):
+        users = list(users)
+        if any(a_user.system is not None for a_user in users):
+            raise ValueError("El usuario ya pertenece a un sistema")
+        for a_user in users:
+            self.users.append(a_user)
+            a_user.system = self
+        for a_user in users:
+            self._reach_questions_of(a_user)
+        self.leaderboard.add_users(users)
+        if self.listeners:
+            for a_user in users:
+                self.publish("user_added", a_user)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def publish(self, event, *args): # Reenvía una modificación a todos los observadores, de a un evento por vez
+        if self.listeners:
+            with self.publish_lock:
+                for listener in self.listeners:
+                    getattr(listener, event)(*args)
+
+    def get_users(self):
+        return self.users.copy()
+
+    def get_top_users(self, n):
+        return self.leaderboard.top(n)
+
+    def get_user_rank(self, a_user):
+        return self.leaderboard.rank_of(a_user)
+
+    def get_social_questions_for_user(self, user, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        def compute(now):
+            retriever = self.retriever_factory.create_social(limit)
+            return retriever.retrieve_questions(self.questions, user)
+        return self._get_feed("social", user, limit, compute)
+
+    def get_topic_questions_for_user(self, user, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        def compute(now):
+            retriever = self.retriever_factory.create_topics(limit)
+            return retriever.retrieve_questions(self.questions, user)
+        return self._get_feed("topics", user, limit, compute)
+
+    def get_news_questions_for_user(self, user, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        def compute(now):
+            retriever = self.retriever_factory.create_news(limit, lambda: now)
+            with self.questions_reading:
+                return retriever.retrieve_questions(self.questions_by_day.get(now.date(), []), user)
+        return self._get_feed("news", user, limit, compute)
+
+    def get_popular_questions_for_user(self, user, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        def compute(now):
+            retriever = self.retriever_factory.create_popular_today(limit, lambda: now)
+            with self.questions_reading:
+                day_popularity = self.popularity_by_day.get(now.date())
+            return retriever.retrieve_popular(day_popularity, user)
+        return self._get_feed("popular_today", user, limit, compute)
+
+    def get_blended_questions_for_user(self, user, limit=IQuestionRetriever.DEFAULT_LIMIT):
+        # Un solo feed en lugar de los cuatro anteriores: recolecta y puntúa cada candidata una única vez
+        def compute(now):
+            retriever = self.retriever_factory.create_blended(limit, lambda: now)
+            with self.questions_reading:
+                today_questions = self.questions_by_day.get(now.date(), [])
+                return retriever.retrieve_questions(today_questions, user)
+        return self._get_feed("blended", user, limit, compute)
+
+    def iter_questions_for_user(self, strategy, user, cursor=None): # Todo el ranking, calculado a medida que se consume
+        retriever, questions = self._paging_retriever(strategy)
+        return retriever.iter_questions(questions, user, cursor)
+
+    def get_questions_page_for_user(self, strategy, user, page_size=IQuestionRetriever.DEFAULT_PAGE_SIZE, cursor=None):
+        retriever, questions = self._paging_retriever(strategy)
+        if Metrics.active is not None:
+            page = lambda: retriever.retrieve_page(questions, user, page_size, cursor)
+            return Metrics.active.timed("cuoora_page_seconds", page, strategy=strategy)
+        return retriever.retrieve_page(questions, user, page_size, cursor)
+
+    def _paging_retriever(self, strategy):
+        now = self.clock()
+        retriever = self.retriever_factory.create(strategy, clock=lambda: now)
+        if strategy in ("news", "popular_today"):
+            return retriever, self.get_questions_of_day(now.date()) # Copia: el generador se consume después
+        return retriever, self.questions
+
+    def _get_feed(self, strategy, user, limit, compute):
+        if Metrics.active is not None:
+            return Metrics.active.timed("cuoora_feed_seconds", lambda: self._compute_feed(strategy, user, limit, compute),
+                                        strategy=strategy)
+        return self._compute_feed(strategy, user, limit, compute)
+
+    def _compute_feed(self, strategy, user, limit, compute):
+        now = self.clock() # "Hoy" se resuelve una sola vez por pedido
+        if self.feed_cache is None:
+            return compute(now)
+        return self.feed_cache.get(strategy, user, limit, now, compute)
@@ -0,0 +1,59 @@
+import unittest
+from benchmarks.suite import compare, percentile, run
+from benchmarks.synthetic import SyntheticGraph
+
+def snapshot(cuoora): # Estructura comparable entre dos grafos armados por separado
+    return ([(u.get_username(), [f.get_username() for f in u.get_following()], u.calculate_score())
+             for u in cuoora.get_users()],
+            [(q.get_title(), q.get_timestamp(), q.get_user().get_username(), q.positive_votes_count())
+             for q in cuoora.get_questions()])
+
+class SyntheticGraphTest(unittest.TestCase):
+    def test_same_seed_same_graph(self):
+        self.assertEqual(snapshot(SyntheticGraph(5000, seed=3).build()), snapshot(SyntheticGraph(5000, seed=3).build()))
+        self.assertNotEqual(snapshot(SyntheticGraph(5000, seed=3).build()), snapshot(SyntheticGraph(5000, seed=4).build()))
+
+    def test_scale_and_skew(self):
+        graph = SyntheticGraph(20000)
+        cuoora = graph.build()
+        self.assertAlmostEqual(sum(graph.counts.values()), 20000, delta=4000)
+        followers = sorted((len(u.get_followers()) for u in cuoora.get_users()), reverse=True)
+        # Ley de potencias: el 1% más seguido concentra mucho más que el 1% de los seguimientos
+        top = followers[:len(followers) // 100]
+        self.assertGreater(sum(top), 0.1 * sum(followers))
+        self.assertTrue(cuoora.get_news_questions_for_user(cuoora.get_users()[-1]))
+
+    def test_inbox_gives_same_feeds(self):
+        plain = SyntheticGraph(3000).build()
+        inbox = SyntheticGraph(3000).build(inbox=True)
+        for a_user, inbox_user in zip(plain.get_users(), inbox.get_users()):
+            self.assertTrue(inbox_user.has_inbox())
+            self.assertEqual([q.get_title() for q in plain.get_social_questions_for_user(a_user)],
+                             [q.get_title() for q in inbox.get_social_questions_for_user(inbox_user)])
+
+
+class SuiteTest(unittest.TestCase):
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([10, 20, 30, 40, 50], 50), 30)
+        self.assertEqual(percentile([10, 20], 50), 15)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_run_and_compare(self):
+        base = run(2000, seed=1, samples=10, operations=("social_feed", "calculate_score"))
+        self.assertEqual(set(base["operations"]), {"social_feed", "calculate_score"})
+        for result in base["operations"].values():
+            self.assertLessEqual(result["p50_us"], result["p99_us"])
+            self.assertGreater(result["ops_per_s"], 0)
+
+        slower = {"operations": {name: dict(result, p50_us=result["p50_us"] * 2)
+                                 for name, result in base["operations"].items()}}
+        rows, regressions = compare(base, slower, threshold=0.2)
+        self.assertEqual(regressions, ["social_feed", "calculate_score"])
+        self.assertEqual(compare(base, base)[1], [])
+
+        with self.assertRaises(ValueError):
+            run(2000, seed=1, samples=10, operations=("unknown",))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from cuoora_social_network import CuOOra, Vote
+from cuoora_bulk_load import BulkLoader
+
+class BulkLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = datetime.now()
+        self.yesterday = self.now - timedelta(days=1)
+
+        self.users = [{"id": i, "username": f"user{i}", "password": "pass"} for i in range(1, 5)]
+        self.topics = [{"id": "py", "name": "Python", "description": "Programming in Python"}]
+        self.follows = [{"follower": 1, "followed": 2}, {"follower": 1, "followed": 2}, {"follower": 3, "followed": 2}]
+        self.interests = [{"user": 4, "topic": "py"}]
+        self.questions = [
+            {"id": "q1", "user": 2, "title": "What is Python?", "description": "Basics", "topics": ["py"],
+             "timestamp": self.now.isoformat()},
+            {"id": "q2", "user": 3, "title": "Old question", "description": "Old", "topics": [],
+             "timestamp": self.yesterday.isoformat()},
+        ]
+        self.answers = [
+            {"id": "a1", "question": "q1", "user": 3, "description": "A language"},
+            {"id": "a2", "question": "q1", "user": 4, "description": "A snake"},
+        ]
+        self.votes = [
+            {"user": 1, "target": "question", "target_id": "q1", "like": True},
+            {"user": 3, "target": "question", "target_id": "q1", "like": True},
+            {"user": 1, "target": "answer", "target_id": "a2", "like": True},
+            {"user": 2, "target": "answer", "target_id": "a1", "like": False},
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_jsonl(self, name, records):
+        path = os.path.join(self.directory.name, name + ".jsonl")
+        with open(path, "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+        return path
+
+    def load(self, cuoora, **overrides):
+        sources = {name: getattr(self, name) for name in
+                   ("users", "topics", "follows", "interests", "questions", "answers", "votes")}
+        sources.update(overrides)
+        paths = {name: self.write_jsonl(name, records) for name, records in sources.items()}
+        return BulkLoader(cuoora).load(**paths)
+
+    def test_load_builds_consistent_graph(self):
+        cuoora = CuOOra()
+        loader = self.load(cuoora)
+        user1, user2, user3, user4 = (loader.users[str(i)] for i in range(1, 5))
+        question1, question2 = loader.questions["q1"], loader.questions["q2"]
+
+        self.assertEqual(user1.get_following(), [user2])
+        self.assertEqual(user2.get_followers(), [user1, user3])
+        self.assertEqual(question1.get_topics(), [loader.topics["py"]])
+        self.assertEqual(question1.positive_votes_count(), 2)
+        self.assertEqual(question1.get_best_answer(), loader.answers["a2"])
+        self.assertEqual(cuoora.get_questions_of_day(self.yesterday.date()), [question2])
+
+        for a_user in cuoora.get_users():
+            self.assertEqual(a_user.calculate_score(), a_user.recalculate_score())
+        self.assertEqual(cuoora.get_top_users(2), [user4, user2])
+
+        self.assertEqual(cuoora.get_social_questions_for_user(user1), [question1])
+        self.assertEqual(cuoora.get_topic_questions_for_user(user4), [question1])
+        self.assertEqual(cuoora.get_news_questions_for_user(user1), [question1])
+
+        # El grafo cargado sigue respondiendo a las operaciones habituales
+        loader.answers["a1"].add_vote(Vote(user4))
+        loader.answers["a1"].add_vote(Vote(user1))
+        self.assertEqual(question1.get_best_answer(), loader.answers["a1"])
+        self.assertEqual(user3.calculate_score(), user3.recalculate_score())
+
+    def test_load_csv(self):
+        path = os.path.join(self.directory.name, "questions.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("id,user,title,description,topics\nq1,2,What is Python?,Basics,py\n")
+        cuoora = CuOOra()
+        loader = BulkLoader(cuoora).load(users=self.users, topics=self.topics, questions=path)
+        self.assertEqual(loader.questions["q1"].get_topics(), [loader.topics["py"]])
+        self.assertEqual(cuoora.get_questions(), [loader.questions["q1"]])
+
+    def test_load_rejects_invalid_records(self):
+        with self.assertRaises(ValueError):
+            self.load(CuOOra(), votes=self.votes + [{"user": 1, "target": "question", "target_id": "q1"}])
+        with self.assertRaises(ValueError):
+            self.load(CuOOra(), answers=self.answers + [{"id": "a3", "question": "q9", "user": 1}])
+        with self.assertRaises(ValueError):
+            self.load(CuOOra(), users=self.users + [{"id": 1, "username": "again", "password": "pass"}])
+
+    def test_invalid_record_leaves_nothing_applied(self):
+        cuoora = CuOOra()
+        loader = self.load(cuoora)
+        user4, topic = loader.users["4"], loader.topics["py"]
+        batch = {"questions": [{"id": "q3", "user": 4, "title": "New", "topics": ["py"]}],
+                 "answers": [{"id": "a3", "question": "q3", "user": 1}],
+                 "votes": [{"user": 1, "target": "question", "target_id": "q3"},
+                           {"user": 9, "target": "question", "target_id": "q3"}]}
+        with self.assertRaises(ValueError):
+            loader.load(**batch)
+        self.assertEqual((user4.get_questions(), topic.get_questions()), ([], [loader.questions["q1"]]))
+        self.assertNotIn("q3", loader.questions)
+        self.assertEqual(len(cuoora.get_questions()), 2)
+        self.assertEqual(len(loader.users["1"].get_votes()), 2)
+
+        with self.assertRaisesRegex(ValueError, "ya ha votado"): # Contra un voto ya cargado
+            loader.load(votes=[{"user": 1, "target": "question", "target_id": "q1"}])
+
+        batch["votes"].pop()
+        loader.load(**batch) # El mismo lote corregido se puede reintentar
+        self.assertEqual(cuoora.get_questions()[-1], loader.questions["q3"])
+        self.assertEqual(topic.get_questions(), [loader.questions["q1"], loader.questions["q3"]])
+        self.assertEqual(loader.questions["q3"].positive_votes_count(), 1)
+
+    def test_second_load_references_earlier_entities(self):
+        cuoora = CuOOra()
+        loader = self.load(cuoora)
+        loader.load(
+            answers=[{"id": "a3", "question": "q1", "user": 1, "description": "Late answer"}],
+            votes=[{"user": 2, "target": "answer", "target_id": "a3"},
+                   {"user": 4, "target": "answer", "target_id": "a3"},
+                   {"user": 4, "target": "question", "target_id": "q2"}],
+        )
+        self.assertEqual(loader.questions["q1"].get_best_answer(), loader.answers["a3"])
+        self.assertEqual(loader.questions["q2"].positive_votes_count(), 1)
+        for a_user in cuoora.get_users():
+            self.assertEqual(a_user.calculate_score(), a_user.recalculate_score())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from cuoora_social_network import Answer, Question, Topic, User, Vote
+from cuoora_event_log import EventLog, open_event_log
+
+def describe(cuoora): # Resumen comparable del estado visible de un CuOOra
+    users = [(u.get_username(), u.calculate_score(), [f.get_username() for f in u.get_following()],
+              [t.get_name() for t in u.get_topics_of_interest()]) for u in cuoora.get_users()]
+    questions = [(q.get_title(), q.get_description(), q.get_timestamp(), q.get_user().get_username(),
+                  [t.get_name() for t in q.get_topics()], q.positive_votes_count(), q.negative_votes_count(),
+                  [(a.get_description(), a.positive_votes_count(), a.negative_votes_count()) for a in q.get_answers()],
+                  q.get_best_answer().get_description() if q.get_answers() else None)
+                 for q in cuoora.get_questions()]
+    feeds = [[q.get_title() for q in cuoora.get_social_questions_for_user(u)] for u in cuoora.get_users()]
+    return users, questions, feeds
+
+class EventLogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def reopen(self, log):
+        expected = describe(log.cuoora)
+        log.close()
+        restored = open_event_log(self.path)
+        self.addCleanup(restored.close)
+        self.assertEqual(describe(restored.cuoora), expected)
+        return restored
+
+    def populate(self, log):
+        cuoora = log.cuoora
+        user1, user2, user3 = User("user1", "pass1"), User("user2", "pass2"), User("user3", "pass3")
+        cuoora.add_users([user1, user2])
+        topic = Topic("Python", "Programming in Python")
+        user3.add_topic(topic)
+        user3.follow(user2) # Antes de registrarse: se vuelca al darlo de alta
+        cuoora.add_user(user3)
+        user1.follow(user2)
+        user1.follow(user3)
+        user1.stop_follow(user3)
+
+        question = Question(user2, "¿Qué es Python?", "Explicación", [topic])
+        cuoora.add_question(question)
+        answer1 = Answer(question, user1, "Un lenguaje interpretado.")
+        answer2 = Answer(question, user3, "Una serpiente.")
+        question.add_vote(Vote(user1))
+        question.add_vote(Vote(user3))
+        answer2.add_vote(Vote(user2))
+        vote = Vote(user1)
+        answer1.add_vote(vote)
+        answer1.add_vote(Vote(User("voter", "voter")))
+        vote.dislike()
+        answer2.retract_vote(user2)
+        question.cast_vote(user3, False)
+        question.set_title("¿Qué es Python 3?")
+        answer2.set_description("Un lenguaje de programación.")
+        question.add_topic(Topic("Lenguajes", "Lenguajes de programación"))
+        return user1, user2, user3, question
+
+    def test_replay_restores_state(self):
+        log = open_event_log(self.path)
+        self.populate(log)
+        restored = self.reopen(log)
+        user1, user2, user3 = restored.cuoora.get_users()
+        for a_user in restored.cuoora.get_users():
+            self.assertEqual(a_user.calculate_score(), a_user.recalculate_score())
+        self.assertEqual(user2.get_followers(), [user3, user1])
+
+        # Lo que se haga después de recuperar también queda registrado
+        Question(user3, "¿Qué es C?", "Explicación sobre C")
+        restored.cuoora.add_question(user3.get_questions()[0])
+        self.reopen(restored)
+
+    def test_records_are_batched(self):
+        log = open_event_log(self.path, batch_size=1000, flush_interval=None)
+        self.addCleanup(log.close)
+        log_path = os.path.join(self.path, "log-00000000.bin")
+        size = os.path.getsize(log_path)
+        self.populate(log)
+        self.assertEqual(os.path.getsize(log_path), size)
+        log.flush()
+        self.assertGreater(os.path.getsize(log_path), size)
+
+    def test_incomplete_batch_is_written_after_the_interval(self):
+        log = open_event_log(self.path, batch_size=1000, flush_interval=0.01)
+        self.addCleanup(log.close)
+        log_path = os.path.join(self.path, "log-00000000.bin")
+        size = os.path.getsize(log_path)
+        log.cuoora.add_user(User("user1", "pass1"))
+        for _ in range(200):
+            if os.path.getsize(log_path) > size:
+                break
+            time.sleep(0.01)
+        self.assertGreater(os.path.getsize(log_path), size)
+        with log.lock:
+            self.assertEqual((log.pending, log.timer), (0, None))
+
+    def test_torn_tail_is_discarded(self):
+        log = open_event_log(self.path)
+        user1, user2, user3, question = self.populate(log)
+        expected = describe(log.cuoora)
+        log.close()
+        log_path = os.path.join(self.path, "log-00000000.bin")
+        with open(log_path, "ab") as file:
+            file.write(b"\x40\x00\x00\x00\x01\x02")
+
+        restored = open_event_log(self.path)
+        self.addCleanup(restored.close)
+        self.assertEqual(describe(restored.cuoora), expected)
+        restored.cuoora.get_users()[0].follow(restored.cuoora.get_users()[2])
+        self.reopen(restored)
+
+    def test_compaction_replaces_log_with_snapshot(self):
+        log = open_event_log(self.path)
+        user1, user2, user3, question = self.populate(log)
+        log.compact()
+        Answer(question, user2, "Respuesta posterior.").add_vote(Vote(user1))
+        question.get_votes()[0].dislike()
+        log.wait()
+        self.assertEqual(sorted(os.listdir(self.path)), ["log-00000001.bin", "snapshot-00000001.bin"])
+        restored = self.reopen(log)
+        self.assertEqual(restored.generation, 1)
+
+    def test_writes_racing_compaction_replay_once(self):
+        log = open_event_log(self.path)
+        user1, user2, user3, question = self.populate(log)
+        # Escrituras ya aplicadas cuando compact() congela el estado, pero publicadas recién después
+        log.cuoora.remove_listener(log)
+        late = User("late", "pass")
+        log.cuoora.add_user(late)
+        vote = Vote(late)
+        question.add_vote(vote)
+        topic = Topic("Tardío", "Etiqueta tardía")
+        question.add_topic(topic)
+        late.follow(user1)
+        newer = Question(late, "Posterior", "Descripción")
+        log.cuoora.add_question(newer)
+        log.cuoora.add_listener(log)
+        log.compact(background=False)
+        log.user_added(late)
+        log.vote_added(question, vote)
+        log.question_tagged(question, topic)
+        log.followed(late, user1)
+        log.question_added(newer)
+        vote.dislike()
+
+        restored = self.reopen(log)
+        restored_question = restored.cuoora.get_questions()[0]
+        self.assertEqual(len(restored.cuoora.get_questions()), 2)
+        self.assertEqual((restored_question.positive_votes_count(), restored_question.negative_votes_count()), (1, 2))
+
+    def test_closed_log_leaves_its_system_usable(self):
+        log = open_event_log(self.path)
+        self.populate(log)
+        log.compact(background=False)
+        log.close()
+        restored = open_event_log(self.path) # Restaurado desde el snapshot, con votos perezosos
+        restored.close()
+        user1, user2, user3 = restored.cuoora.get_users()
+        question = restored.cuoora.get_questions()[0]
+        self.assertEqual(question.get_vote_of(user3).is_like(), False)
+        question.cast_vote(user3)
+        self.assertEqual(question.positive_votes_count(), 2)
+
+    def test_interrupted_compaction_recovers(self):
+        log = open_event_log(self.path)
+        user1, user2, user3, question = self.populate(log)
+        with patch.object(EventLog, "_write_snapshot"): # Se corta antes de publicar el snapshot
+            log.compact(background=False)
+        question.add_vote(Vote(User("late", "late")))
+        user3.follow(user1)
+        restored = self.reopen(log)
+        self.assertEqual(restored.generation, 2)
+        self.assertEqual(sorted(os.listdir(self.path)), ["log-00000002.bin", "snapshot-00000002.bin"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from cuoora_social_network import Answer, CuOOra, Question, Topic, User, Vote
+from cuoora_feed_batch import STRATEGIES, precompute_feeds
+
+class FeedBatchTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.now = datetime.now()
+        self.cuoora = CuOOra(clock=lambda: self.now)
+        self.users = [User(f"user{i}", "pass") for i in range(40)]
+        self.cuoora.add_users(self.users)
+        topics = [Topic(f"topic{i}", "Topic") for i in range(4)]
+        for user in self.users:
+            for other in rng.sample(self.users, 5):
+                user.follow(other)
+            user.add_topic(rng.choice(topics))
+            if rng.random() < 0.5:
+                user.enable_inbox()
+        for i in range(120):
+            question = Question(rng.choice(self.users), f"Question {i}", "Description", rng.sample(topics, 2))
+            if i % 3 == 0:
+                question.timestamp = self.now - timedelta(days=1)
+            self.cuoora.add_question(question)
+            Answer(question, rng.choice(self.users), "Answer")
+            for voter in rng.sample(self.users, rng.randrange(6)):
+                question.add_vote(Vote(voter, rng.random() < 0.8))
+
+    def expected(self, user, strategy, limit):
+        retrieve = {"social": self.cuoora.get_social_questions_for_user,
+                    "topics": self.cuoora.get_topic_questions_for_user,
+                    "news": self.cuoora.get_news_questions_for_user,
+                    "popular_today": self.cuoora.get_popular_questions_for_user}[strategy]
+        return retrieve(user, limit)
+
+    def check(self, results, limit, strategies=STRATEGIES):
+        results = list(results)
+        self.assertEqual(len(results), len(self.users) * len(strategies))
+        for user, strategy, questions in results:
+            self.assertEqual(questions, self.expected(user, strategy, limit), (user.get_username(), strategy))
+
+    def test_in_process_matches_single_requests(self):
+        self.check(precompute_feeds(self.cuoora, self.users, limit=5, workers=0, chunk_size=7), 5)
+
+    def test_interleaved_in_process_batches_keep_their_context(self):
+        other = CuOOra(clock=lambda: self.now)
+        first = precompute_feeds(self.cuoora, self.users, ["news"], limit=3, workers=0, chunk_size=1)
+        second = precompute_feeds(other, self.users, ["news"], limit=3, workers=0, chunk_size=1)
+        for (user, _, questions), (_, _, others) in zip(first, second):
+            self.assertEqual(questions, self.expected(user, "news", 3))
+            self.assertEqual(others, [])
+
+    def test_inbox_reader_of_a_long_history_matches_single_requests(self):
+        reader, author = User("reader", "pass"), User("author", "pass")
+        self.cuoora.add_users([reader, author])
+        reader.follow(author)
+        reader.enable_inbox()
+        history = [Question(author, f"b{i}", "Description") for i in range(1100)]
+        for question in history[:3]:
+            question.add_vote(Vote(self.users[1]))
+        [(_, _, questions)] = precompute_feeds(self.cuoora, [reader], ["social"], limit=3, workers=0)
+        self.assertEqual(questions, history[:3])
+        self.assertEqual(questions, self.cuoora.get_social_questions_for_user(reader, 3))
+
+    def test_process_pool_matches_single_requests(self):
+        self.check(precompute_feeds(self.cuoora, self.users, workers=2, chunk_size=8), 100)
+        self.check(precompute_feeds(self.cuoora, self.users, ["news"], limit=3, workers=2), 3, ["news"])
+
+    def test_rejects_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            list(precompute_feeds(self.cuoora, self.users, ["trending"], workers=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from cuoora_social_network import CuOOra, Topic, User
+from cuoora_graph import CSRMatrix, FollowRecommender, follow_matrix, interest_matrix
+
+class FollowGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.users = [User(f"user{i}", "pass") for i in range(6)]
+        self.cuoora.add_users(self.users)
+        self.python, self.c = Topic("Python", "Programming in Python"), Topic("C", "Programming in C")
+        user0, user1, user2, user3, user4, user5 = self.users
+        user0.follow(user1)
+        user0.follow(user2)
+        user1.follow(user3)
+        user2.follow(user3)
+        user2.follow(user4)
+        user1.follow(user0)
+        for a_user in (user0, user4, user5):
+            a_user.add_topic(self.python)
+        user5.add_topic(self.c)
+
+    def test_follow_and_unfollow_keep_both_sides(self):
+        user0, user1, user2, user3 = self.users[:4]
+        self.assertTrue(user0.is_following(user1))
+        self.assertEqual(user3.get_followers(), [user1, user2])
+        user0.follow(user1) # Repetido: no cambia nada
+        self.assertEqual(user0.get_following(), [user1, user2])
+        user2.stop_follow(user3)
+        self.assertFalse(user2.is_following(user3))
+        self.assertEqual(user3.get_followers(), [user1])
+        user2.follow(user3)
+        self.assertEqual(user3.get_followers(), [user1, user2]) # Vuelve al final
+
+    def test_csr_export(self):
+        follows = follow_matrix(self.users)
+        self.assertEqual(follows.shape, (6, 6))
+        self.assertEqual(list(follows.indptr), [0, 2, 4, 6, 6, 6, 6])
+        self.assertEqual(list(follows.indices), [1, 2, 3, 0, 3, 4])
+        followers = follows.transpose()
+        self.assertEqual([list(followers.row(i)) for i in range(6)], [[1], [0], [0], [1, 2], [2], []])
+        self.assertEqual(follows.nnz(), 6)
+        # Los seguidos fuera de la lista no aparecen
+        self.assertEqual(follow_matrix(self.users[:2]).nnz(), 2)
+
+        interests, topics = interest_matrix(self.users)
+        self.assertEqual(topics, [self.python, self.c])
+        self.assertEqual([list(interests.row(i)) for i in range(6)], [[0], [], [], [], [0], [0, 1]])
+        self.assertEqual(CSRMatrix.from_rows([], 3).shape, (0, 3))
+
+    def test_recommendations(self):
+        user0, user1, user2, user3, user4, user5 = self.users
+        recommender = FollowRecommender(self.cuoora.get_users())
+        # user3 lo siguen dos de sus seguidos; user4 uno, más Python; user5 solo Python
+        self.assertEqual(recommender.recommend(user0), [(user3, 2), (user4, 1.5), (user5, 0.5)])
+        self.assertEqual(recommender.recommend(user0, limit=1), [(user3, 2)])
+        self.assertEqual(recommender.recommend(user1), [(user2, 1)]) # user1 ya sigue a user3 y a user0
+        self.assertEqual(recommender.recommend(user3), [])
+        self.assertEqual(dict(recommender.recommend_all())[user5], [(user0, 0.5), (user4, 0.5)])
+        with self.assertRaises(ValueError):
+            recommender.recommend(User("other", "pass"))
+
+    def test_large_topics_only_rescore(self):
+        user0, user1, user2, user3, user4, user5 = self.users
+        recommender = FollowRecommender(self.users, max_topic_fanout=2)
+        self.assertEqual(recommender.recommend(user0), [(user3, 2), (user4, 1.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from cuoora_social_network import Answer, CuOOra, NO_LOCK, Question, Topic, User, Vote
+from cuoora_search import SearchIndex, tokenize
+
+def found(results): # Títulos o descripciones, en el orden devuelto
+    return [d.get_title() if isinstance(d, Question) else d.get_description() for d, _ in results]
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.user1, self.user2, self.user3 = User("user1", "pass1"), User("user2", "pass2"), User("user3", "pass3")
+        self.cuoora.add_users([self.user1, self.user2, self.user3])
+        self.python = Topic("Python", "Programming in Python")
+        self.c = Topic("C", "Programming in C")
+
+        self.question1 = Question(self.user1, "¿Qué es Python?", "Un lenguaje de programación", [self.python])
+        with patch("cuoora_social_network.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime.now() - timedelta(days=3)
+            self.question2 = Question(self.user2, "Punteros en C", "Cómo se usan los punteros en programación", [self.c])
+        self.cuoora.add_question(self.question1)
+        self.answer1 = Answer(self.question1, self.user2, "Python es un lenguaje interpretado")
+        self.index = SearchIndex(self.cuoora) # Indexa lo que ya estaba
+        self.addCleanup(self.index.close)
+        self.cuoora.add_question(self.question2)
+        self.answer2 = Answer(self.question2, self.user3, "Un puntero guarda una dirección de memoria")
+
+    def test_tokenize_ignores_case_and_accents(self):
+        self.assertEqual(tokenize("¿Qué es la PROGRAMACIÓN?"), ["que", "es", "la", "programacion"])
+
+    def test_ranks_with_bm25(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(found(self.index.search("python")), ["¿Qué es Python?", "Python es un lenguaje interpretado"])
+        self.assertEqual(found(self.index.search("punteros memoria"))[0], "Punteros en C")
+        self.assertEqual(set(found(self.index.search("programacion"))), {"¿Qué es Python?", "Punteros en C"})
+        self.assertEqual(self.index.search("haskell"), [])
+        self.assertEqual(self.index.search(""), [])
+        scores = [score for _, score in self.index.search("lenguaje")]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_filters(self):
+        self.assertEqual(found(self.index.search("programacion", topics=[self.c])), ["Punteros en C"])
+        self.assertEqual(found(self.index.search("python", kind=Answer)), ["Python es un lenguaje interpretado"])
+        yesterday = datetime.now() - timedelta(days=1)
+        self.assertEqual(found(self.index.search("programacion", since=yesterday)), ["¿Qué es Python?"])
+        self.assertEqual(found(self.index.search("programacion", until=yesterday)), ["Punteros en C"])
+        # Las respuestas se filtran por los tópicos de su pregunta, también si se agregan después
+        self.assertEqual(found(self.index.search("memoria", topics=[self.python])), [])
+        self.question2.add_topic(self.python)
+        self.assertEqual(found(self.index.search("memoria", topics=[self.python])),
+                         ["Un puntero guarda una dirección de memoria"])
+
+    def test_vote_boost(self):
+        self.assertEqual(found(self.index.search("un", kind=Answer))[0], "Python es un lenguaje interpretado")
+        self.answer2.add_vote(Vote(self.user1))
+        self.answer2.add_vote(Vote(self.user2))
+        self.assertEqual(found(self.index.search("un", kind=Answer, vote_boost=1.0))[0],
+                         "Un puntero guarda una dirección de memoria")
+
+    def test_updates_incrementally(self):
+        self.question1.set_title("¿Qué es Rust?")
+        self.assertEqual(found(self.index.search("python")), ["Python es un lenguaje interpretado"])
+        self.assertEqual(found(self.index.search("rust")), ["¿Qué es Rust?"])
+        self.answer2.set_description("Una variable con una dirección")
+        self.assertEqual(self.index.search("memoria"), [])
+        self.assertEqual(found(self.index.search("variable")), ["Una variable con una dirección"])
+
+        # Lo nuevo se indexa al agregarse al sistema, con las respuestas que ya tenga
+        question3 = Question(self.user3, "Listas en Python", "Comprensión de listas")
+        Answer(question3, self.user1, "Usá corchetes")
+        self.assertEqual(self.index.search("listas"), [])
+        self.cuoora.add_question(question3)
+        self.assertEqual(found(self.index.search("listas corchetes")), ["Listas en Python", "Usá corchetes"])
+
+        self.index.close()
+        Answer(question3, self.user2, "Otra respuesta sobre corchetes")
+        self.assertEqual(len(self.index.search("corchetes")), 1)
+
+    def test_follows_questions_of_unregistered_authors(self):
+        stranger = User("stranger", "pass") # Nunca pasa por add_user
+        question = Question(stranger, "Decoradores", "Funciones que envuelven funciones")
+        self.cuoora.add_question(question)
+        question.set_title("Generadores")
+        Answer(question, User("other", "pass"), "Se escriben con yield")
+        self.assertEqual(self.index.search("decoradores"), [])
+        self.assertEqual(found(self.index.search("generadores yield")), ["Generadores", "Se escriben con yield"])
+
+    @patch.object(SearchIndex, "COMMON_TERM_MIN_DOCUMENTS", 5)
+    @patch.object(SearchIndex, "COMMON_TERM_RATIO", 0.5)
+    def test_common_terms_only_rescore(self):
+        for i in range(10):
+            self.cuoora.add_question(Question(self.user3, f"Pregunta común {i}", "común"))
+        self.cuoora.add_question(Question(self.user3, "Rareza común", "rareza"))
+        # "común" está en la mayoría de los documentos: solo puntúa a los que ya trajo "rareza"
+        self.assertEqual(found(self.index.search("rareza común")), ["Rareza común"])
+        self.assertEqual(len(self.index.search("común", limit=100)), 11)
+        self.assertEqual(found(self.index.search("rareza punteros")), ["Rareza común", "Punteros en C"]) # Ninguno es común
+
+    def test_concurrent_mode_locks_the_index(self):
+        self.assertIs(self.index.lock, NO_LOCK)
+        self.addCleanup(self.cuoora.disable_concurrency)
+        self.cuoora.enable_concurrency()
+        self.assertIsNot(self.index.lock, NO_LOCK)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import threading
+import unittest
+from cuoora_social_network import NO_LOCK, ConcurrencyMode, CuOOra, Question, Topic, User
+from cuoora_server import FeedServer, FeedService
+
+class FeedServiceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.addCleanup(self.cuoora.disable_concurrency)
+        self.reader, self.author = User("reader", "pass"), User("author", "pass")
+        self.voters = [User(f"voter{i}", "pass") for i in range(10)]
+        self.cuoora.add_users([self.reader, self.author, *self.voters])
+        self.reader.follow(self.author)
+        self.python = Topic("Python", "Programming in Python")
+        self.questions = [Question(self.author, f"Question {i}", "Description", [self.python]) for i in range(3)]
+        for question in self.questions:
+            self.cuoora.add_question(question)
+        self.release = threading.Event()
+
+    def hold_feeds(self): # Los feeds sociales quedan calculándose hasta release.set()
+        compute = self.cuoora.get_social_questions_for_user
+        self.calls = 0
+
+        def held(user, limit):
+            self.calls += 1
+            self.release.wait(5)
+            return compute(user, limit)
+        self.cuoora.get_social_questions_for_user = held
+        self.addCleanup(self.release.set)
+
+    async def asyncSetUp(self):
+        self.service = FeedService(self.cuoora, vote_flush_interval=0.01)
+        self.addAsyncCleanup(self.service.close)
+
+    async def test_close_disables_the_concurrency_it_enabled(self):
+        self.assertTrue(ConcurrencyMode.enabled)
+        await self.service.close()
+        self.assertFalse(ConcurrencyMode.enabled)
+
+    async def test_concurrency_stays_on_while_another_service_runs(self):
+        other = CuOOra()
+        other_service = FeedService(other)
+        self.addAsyncCleanup(other_service.close)
+        await self.service.close()
+        await self.service.close() # Cerrar dos veces no descuenta otra vez
+        self.assertTrue(ConcurrencyMode.enabled)
+        self.assertIsNot(other.publish_lock, NO_LOCK)
+        self.assertIs(self.cuoora.publish_lock, NO_LOCK)
+        await other_service.close()
+        self.assertFalse(ConcurrencyMode.enabled)
+
+    async def test_close_waits_for_running_feeds(self):
+        self.hold_feeds()
+        request = asyncio.ensure_future(self.service.get_feed("social", self.reader, deadline=5))
+        await asyncio.sleep(0.01)
+        closing = asyncio.ensure_future(self.service.close())
+        await asyncio.sleep(0.01)
+        self.assertFalse(closing.done())
+        self.assertIsNot(self.cuoora.publish_lock, NO_LOCK)
+        self.release.set()
+        await asyncio.wait_for(closing, 5)
+        self.assertEqual(len(await request), 3)
+        self.assertIs(self.cuoora.publish_lock, NO_LOCK)
+
+    async def test_coalesces_identical_requests(self):
+        self.hold_feeds()
+        requests = [asyncio.ensure_future(self.service.get_feed("social", self.reader)) for _ in range(5)]
+        other = asyncio.ensure_future(self.service.get_feed("social", self.reader, limit=1))
+        await asyncio.sleep(0.01)
+        self.release.set()
+        results = await asyncio.gather(*requests)
+        self.assertEqual(results, [self.questions] * 5)
+        self.assertEqual(await other, self.questions[:1])
+        self.assertEqual(self.calls, 2)
+        self.assertEqual((self.service.stats["computed"], self.service.stats["coalesced"]), (2, 4))
+        self.assertEqual(self.service.in_flight, {})
+
+        # Terminado el cálculo, un pedido nuevo vuelve a calcular
+        await self.service.get_feed("social", self.reader)
+        self.assertEqual(self.calls, 3)
+
+    async def test_backpressure_and_deadlines(self):
+        self.hold_feeds()
+        self.service.max_pending = 1
+        first = asyncio.ensure_future(self.service.get_feed("social", self.reader, deadline=5))
+        await asyncio.sleep(0)
+        with self.assertRaisesRegex(ValueError, "sobrecargado"):
+            await self.service.get_feed("social", self.author)
+        with self.assertRaisesRegex(ValueError, "Plazo vencido"): # Se suma al cálculo en curso y vence
+            await self.service.get_feed("social", self.reader, deadline=0.01)
+        self.release.set()
+        self.assertEqual(await first, self.questions) # El cálculo siguió para el que seguía esperando
+        self.assertEqual((self.service.stats["rejected"], self.service.stats["expired"]), (1, 1))
+        with self.assertRaisesRegex(ValueError, "Estrategia desconocida"):
+            await self.service.get_feed("trending", self.reader)
+
+    async def test_votes_are_written_in_batches(self):
+        question = self.questions[0]
+        await asyncio.gather(*(self.service.vote(voter, question) for voter in self.voters))
+        self.assertEqual(question.positive_votes_count(), 10)
+        self.assertEqual(self.service.stats["vote_batches"], 1)
+
+        # Un voto repetido falla solo para quien lo emitió
+        results = await asyncio.gather(self.service.vote(self.voters[0], question),
+                                       self.service.vote(self.voters[0], self.questions[1], False),
+                                       return_exceptions=True)
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIsNone(results[1])
+        self.assertEqual(self.questions[1].negative_votes_count(), 1)
+
+        self.service.vote_batch_size = 2 # Un lote lleno se escribe sin esperar el intervalo
+        self.service.vote_flush_interval = 60
+        await asyncio.wait_for(asyncio.gather(self.service.vote(self.voters[1], self.questions[2]),
+                                              self.service.vote(self.voters[2], self.questions[2])), 5)
+        self.assertEqual(self.questions[2].positive_votes_count(), 2)
+
+
+class FeedServerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.addCleanup(self.cuoora.disable_concurrency)
+        self.reader, self.author = User("reader", "pass"), User("author", "pass")
+        self.cuoora.add_users([self.reader, self.author])
+        self.reader.follow(self.author)
+        self.question = Question(self.author, "What is Python?", "Python basics")
+        self.cuoora.add_question(self.question)
+
+    async def request(self, reader, writer, **request):
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    async def test_serves_feeds_and_votes_over_localhost(self):
+        async with FeedServer(FeedService(self.cuoora)) as server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            response = await self.request(reader, writer, op="feed", strategy="social", user="reader")
+            self.assertEqual(response, {"ok": True, "questions": [
+                {"id": 0, "title": "What is Python?", "user": "author", "votes": 0}]})
+            self.assertEqual(await self.request(reader, writer, op="vote", user="reader", question=0), {"ok": True})
+            response = await self.request(reader, writer, op="feed", strategy="news", user="reader")
+            self.assertEqual(response["questions"][0]["votes"], 1)
+
+            response = await self.request(reader, writer, op="vote", user="reader", question=0)
+            self.assertEqual(response, {"ok": False, "error": "Este usuario ya ha votado"})
+            self.assertEqual(len(self.reader.get_votes()), 1) # El voto rechazado no queda registrado
+            response = await self.request(reader, writer, op="feed", strategy="social", user="nobody")
+            self.assertEqual(response, {"ok": False, "error": "Usuario desconocido: nobody"})
+            writer.write(b"not json\n")
+            self.assertFalse(json.loads(await reader.readline())["ok"])
+
+            # Los pedidos mal formados se rechazan sin cortar la conexión
+            for request in ({"op": "feed", "strategy": "social", "user": "reader", "limit": "x"},
+                            {"op": "feed", "strategy": "social", "user": ["reader"]},
+                            {"op": "feed", "strategy": ["social"], "user": "reader"},
+                            {"op": "vote", "user": "author", "question": 0, "like": "false"}):
+                self.assertFalse((await self.request(reader, writer, **request))["ok"])
+            self.assertEqual(self.question.negative_votes_count(), 0)
+            response = await self.request(reader, writer, op="feed", strategy="social", user="reader", limit=1)
+            self.assertEqual(len(response["questions"]), 1)
+            writer.close()
+            await writer.wait_closed()
+
+    async def test_new_users_and_bounded_question_ids(self):
+        questions = [self.question, *(Question(self.author, f"Question {i}", "Description") for i in range(3))]
+        for question in questions[1:]:
+            self.cuoora.add_question(question)
+        async with FeedServer(FeedService(self.cuoora), question_id_capacity=2) as server:
+            late = User("late", "pass")
+            self.cuoora.add_user(late) # Llega por user_added, sin recorrer los usuarios del sistema
+            late.follow(self.author)
+            server.service.cuoora.get_users = None
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            response = await self.request(reader, writer, op="feed", strategy="social", user="late", limit=4)
+            self.assertEqual([q["id"] for q in response["questions"]], [0, 1, 2, 3])
+            self.assertEqual(len(server.questions), 2)
+            response = await self.request(reader, writer, op="vote", user="late", question=0)
+            self.assertEqual(response, {"ok": False, "error": "Pregunta desconocida: 0"})
+            self.assertEqual(await self.request(reader, writer, op="vote", user="late", question=3), {"ok": True})
+            writer.close()
+            await writer.wait_closed()
+        self.assertNotIn(server, self.cuoora.listeners)
+
+
+if __name__ == '__main__':
+    unittest.main()
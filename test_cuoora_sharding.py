@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime
+from cuoora_social_network import CuOOra, Question, Topic, User, Vote
+from cuoora_sharding import ShardedCuOOra
+from benchmarks.synthetic import SyntheticGraph
+
+GETTERS = ("get_social_questions_for_user", "get_topic_questions_for_user", "get_news_questions_for_user",
+           "get_popular_questions_for_user")
+
+class ShardedCuOOraTest(unittest.TestCase):
+    def assert_same_feeds(self, cuoora, sharded, user_ids, question_ids, limit):
+        for a_user, user_id in user_ids.items():
+            for getter in GETTERS:
+                expected = [question_ids[q] for q in getattr(cuoora, getter)(a_user, limit)]
+                self.assertEqual(getattr(sharded, getter)(user_id, limit), expected, (getter, a_user.get_username()))
+
+    def test_feeds_match_a_single_cuoora(self):
+        graph = SyntheticGraph(3000, seed=3)
+        cuoora = graph.build()
+        sharded = ShardedCuOOra(shards=3, clock=lambda: graph.now, processes=False)
+        user_ids, _, question_ids = sharded.load(cuoora)
+        self.assert_same_feeds(cuoora, sharded, user_ids, question_ids, 100)
+        self.assert_same_feeds(cuoora, sharded, user_ids, question_ids, 5)
+        self.assertEqual(len(question_ids), len(cuoora.get_questions()))
+
+    def test_worker_processes_and_updates(self):
+        now = datetime(2024, 3, 1, 12, 0)
+        cuoora = CuOOra(clock=lambda: now)
+        users = [User(f"user{i}", "pass") for i in range(6)]
+        cuoora.add_users(users)
+        python, c = Topic("Python", "Programming in Python"), Topic("C", "Programming in C")
+        users[0].follow(users[1])
+        users[0].follow(users[2])
+        users[0].add_topic(python)
+        users[0].add_topic(c)
+        questions = []
+        for i in range(12):
+            question = Question(users[1 + i % 5], f"Pregunta {i}", "Descripción", [python] if i % 2 else [c, python])
+            question.timestamp = now
+            cuoora.add_question(question)
+            questions.append(question)
+
+        with ShardedCuOOra(shards=2, clock=lambda: now) as sharded:
+            user_ids, topic_ids, question_ids = sharded.load(cuoora)
+            self.assert_same_feeds(cuoora, sharded, user_ids, question_ids, 100)
+
+            # Los cambios se aplican en el shard de la pregunta y los feeds siguen coincidiendo
+            for i, question in enumerate(questions[:6]):
+                for voter in users[:i]:
+                    question.add_vote(Vote(voter))
+                    sharded.add_vote(user_ids[voter], question_ids[question])
+            question = Question(users[3], "Nueva", "Descripción", [python])
+            question.timestamp = now
+            cuoora.add_question(question)
+            question_ids[question] = sharded.add_question(user_ids[users[3]], "Nueva", "Descripción",
+                                                          [topic_ids[python]], now)
+            users[0].stop_follow(users[1])
+            sharded.stop_follow(user_ids[users[0]], user_ids[users[1]])
+            self.assert_same_feeds(cuoora, sharded, user_ids, question_ids, 3)
+
+            with self.assertRaises(ValueError):
+                sharded.set_vote(user_ids[users[5]], question_ids[questions[0]], False)
+
+    def test_rejected_questions_leave_the_coordinator_consistent(self):
+        now = datetime(2024, 3, 1, 12, 0)
+        sharded = ShardedCuOOra(shards=2, clock=lambda: now, processes=False)
+        user_id, reader_id = sharded.add_user("user", "pass"), sharded.add_user("reader", "pass")
+        topic_id = sharded.add_topic("Python", "Programming in Python")
+        with self.assertRaises(ValueError):
+            sharded.add_question(user_id, "Repetido", "Descripción", [topic_id, topic_id], now)
+        with self.assertRaises(ValueError):
+            sharded.add_question(user_id, "Desconocido", "Descripción", [topic_id + 1], now)
+        question_id = sharded.add_question(user_id, "Válida", "Descripción", [], now)
+        with self.assertRaises(ValueError):
+            sharded.tag(question_id, -1)
+        sharded.tag(question_id, topic_id)
+        self.assertEqual(question_id, 0)
+        self.assertEqual(sharded.get_news_questions_for_user(reader_id, 10), [question_id])
+
+    def test_workers_survive_unexpected_errors(self):
+        now = datetime(2024, 3, 1, 12, 0)
+        with ShardedCuOOra(shards=1, clock=lambda: now) as sharded:
+            user_id, reader_id = sharded.add_user("user", "pass"), sharded.add_user("reader", "pass")
+            with self.assertRaises(ValueError):
+                sharded._call(0, "news_feed", reader_id, None, 10) # AttributeError dentro del trabajador
+            question_id = sharded.add_question(user_id, "Pregunta", "Descripción", [], now)
+            self.assertEqual(sharded.get_news_questions_for_user(reader_id, 10), [question_id])
+
+    def test_users_with_inbox_are_rejected(self):
+        cuoora = CuOOra()
+        a_user = User("user", "pass")
+        cuoora.add_user(a_user)
+        a_user.enable_inbox()
+        with self.assertRaises(ValueError):
+            ShardedCuOOra(shards=2, processes=False).load(cuoora)
+
+
+if __name__ == '__main__':
+    unittest.main()
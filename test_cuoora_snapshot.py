@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from cuoora_social_network import Answer, CuOOra, Question, Topic, User, Vote
+from cuoora_snapshot import LazyVoters, Snapshot, write_snapshot
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cuoora.snapshot")
+
+        self.cuoora = CuOOra()
+        self.user1 = User("user1", "pass1")
+        self.user2 = User("user2", "pass2")
+        self.user3 = User("user3", "pass3")
+        self.cuoora.add_users([self.user1, self.user2, self.user3])
+        self.topic = Topic("Python", "Programming in Python")
+        self.user3.add_topic(self.topic)
+        self.user1.follow(self.user2)
+
+        self.question1 = Question(self.user2, "¿Qué es Python?", "Explicación sobre Python", [self.topic])
+        with patch("cuoora_social_network.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime.now() - timedelta(days=1)
+            self.question2 = Question(self.user3, "¿Qué es C?", "Explicación sobre C")
+        self.cuoora.add_question(self.question1)
+        self.cuoora.add_question(self.question2)
+
+        self.answer1 = Answer(self.question1, self.user1, "Un lenguaje interpretado.")
+        self.answer2 = Answer(self.question1, self.user3, "Una serpiente.")
+        self.question1.add_vote(Vote(self.user1))
+        self.question1.add_vote(Vote(self.user3))
+        self.answer2.add_vote(Vote(self.user2))
+        self.answer1.add_vote(Vote(User("voter", "voter"), is_like=False))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def restore(self):
+        write_snapshot(self.cuoora, self.path)
+        self.snapshot = Snapshot(self.path)
+        self.addCleanup(self.snapshot.close)
+        return self.snapshot.restore()
+
+    def test_restore_keeps_feeds_and_scores(self):
+        restored = self.restore()
+        user1, user2, user3 = restored.get_users()
+        self.assertEqual([u.get_username() for u in restored.get_users()], ["user1", "user2", "user3"])
+        self.assertEqual(user1.get_following(), [user2])
+        self.assertEqual([u.calculate_score() for u in restored.get_users()],
+                         [u.calculate_score() for u in self.cuoora.get_users()])
+        self.assertEqual(restored.get_top_users(3), [user3, user2, user1])
+
+        question1 = restored.get_social_questions_for_user(user1)[0]
+        self.assertEqual(question1.get_title(), "¿Qué es Python?")
+        self.assertEqual(question1.get_timestamp(), self.question1.get_timestamp())
+        self.assertEqual(restored.get_topic_questions_for_user(user3), [question1])
+        self.assertEqual(restored.get_news_questions_for_user(user3), [question1])
+        self.assertEqual(question1.get_best_answer().get_description(), "Una serpiente.")
+        self.assertEqual(question1.positive_votes_count(), 2)
+
+    def test_votes_are_materialized_lazily(self):
+        restored = self.restore()
+        question1 = restored.get_questions()[0]
+        self.assertIsInstance(question1.votes_manager.voters, LazyVoters)
+        self.assertIsNone(question1.votes_manager.voters.items)
+        self.assertEqual(self.snapshot.vote_objects, {})
+
+        user1, user2, user3 = restored.get_users()
+        vote = user1.get_votes()[0]
+        self.assertIs(question1.get_votes()[0], vote)
+        with self.assertRaises(ValueError):
+            question1.add_vote(Vote(user3))
+
+        vote.dislike()
+        vote2 = question1.get_votes()[1]
+        vote2.dislike()
+        self.assertEqual(question1.positive_votes_count(), 0)
+        self.assertEqual(user2.calculate_score(), user2.recalculate_score())
+
+        # Quitar un voto carga y actualiza los dos lados perezosos
+        self.assertIs(question1.retract_vote(user1), vote)
+        self.assertEqual(user1.get_votes(), [])
+        self.assertEqual(user3.get_votes_on([question1, restored.get_questions()[1]]), [vote2, None])
+        self.assertEqual(question1.cast_vote(user1).is_like(), True)
+        self.assertEqual(user1.get_votes(), [question1.get_vote_of(user1)])
+
+    def test_restored_system_outlives_snapshot(self):
+        write_snapshot(self.cuoora, self.path)
+        with Snapshot(self.path) as snapshot:
+            restored = snapshot.restore()
+        question1 = restored.get_questions()[0]
+        user1, user2, user3 = restored.get_users()
+        self.assertEqual([v.get_user() for v in question1.get_votes()], [user1, user3])
+        self.assertEqual(user1.get_votes(), [question1.get_vote_of(user1)])
+        question1.add_vote(Vote(user2))
+        question1.cast_vote(user1, False)
+        self.assertEqual((question1.positive_votes_count(), question1.negative_votes_count()), (2, 1))
+
+    def test_rejects_truncated_files(self):
+        write_snapshot(self.cuoora, self.path)
+        with open(self.path, "rb") as file:
+            data = file.read()
+        for size in (0, 20, len(data) // 2):
+            with open(self.path, "wb") as file:
+                file.write(data[:size])
+            with self.assertRaises(ValueError):
+                Snapshot(self.path)
+
+    def test_rejects_other_versions(self):
+        write_snapshot(self.cuoora, self.path)
+        with open(self.path, "r+b") as file:
+            file.seek(8)
+            file.write(b"\x63\x00\x00\x00")
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
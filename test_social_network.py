@@ -1,7 +1,13 @@
+import math
+import random
+import sys
+import threading
 import unittest
+from itertools import islice
 from unittest.mock import patch
 from datetime import datetime, timedelta
-from cuoora_social_network import Answer, User, Question, Vote, CuOOra, Topic, QuestionRetrieverFactory
+from cuoora_social_network import Answer, User, Question, Vote, CuOOra, Topic, QuestionRetrieverFactory, IQuestionRetriever, \
+    ConcurrencyMode, Metrics, CProfileHook, NO_LOCK, VotesManager
 
 class AnswerTest(unittest.TestCase):
     def setUp(self):
@@ -60,6 +66,31 @@ class AnswerTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.answer.add_vote(vote2)
 
+    def test_vote_flip_updates_counts(self):
+        vote = Vote(User('pepe33', 'pepe33'), True)
+        self.answer.add_vote(vote)
+        self.assertEqual(self.answer.positive_votes_count(), 1)
+        self.assertEqual(self.answer.negative_votes_count(), 0)
+
+        vote.dislike()
+        self.assertEqual(self.answer.positive_votes_count(), 0)
+        self.assertEqual(self.answer.negative_votes_count(), 1)
+        self.assertEqual(len(self.answer.negative_votes()), 1)
+
+        vote.dislike()
+        self.assertEqual(self.answer.negative_votes_count(), 1)
+
+        vote.like()
+        self.assertEqual(self.answer.positive_votes_count(), 1)
+        self.assertEqual(self.answer.negative_votes_count(), 0)
+
+    def test_add_same_vote_to_two_answers(self):
+        other_answer = Answer(self.answer.get_question(), User('pepe4', 'pepe4'), 'Another answer')
+        vote = Vote(User('pepe33', 'pepe33'), True)
+        self.answer.add_vote(vote)
+        with self.assertRaises(ValueError):
+            other_answer.add_vote(vote)
+
 class QuestionTest(unittest.TestCase):
     def setUp(self):
         self.user = User("test_user", "password")
@@ -202,6 +233,28 @@ class QuestionTest(unittest.TestCase):
         self.assertEqual(best_answer, self.answer2, "El método no retorna la mejor respuesta correctamente.")
 
 
+    def test_best_answer_ties_keep_oldest(self):
+        for user in [User(f"tie_user_{i}", "password") for i in range(4)]:
+            self.answer2.add_vote(Vote(user, is_like=True))
+        self.assertEqual(self.question.get_best_answer(), self.answer1)
+
+        self.answer1.get_votes()[0].dislike()
+        self.assertEqual(self.question.get_best_answer(), self.answer2)
+
+        self.answer1.get_votes()[0].like()
+        self.assertEqual(self.question.get_best_answer(), self.answer1)
+
+    def test_top_answers(self):
+        answer3 = Answer(self.question, self.other_user, "C es el más rápido.")
+        self.assertEqual(self.question.get_top_answers(3), [self.answer1, self.answer2, answer3])
+        self.assertEqual(self.question.get_top_answers(1), [self.answer1])
+
+        for user in [User(f"top_user_{i}", "password") for i in range(7)]:
+            answer3.add_vote(Vote(user, is_like=True))
+        self.assertEqual(self.question.get_top_answers(2), [answer3, self.answer1])
+        self.assertEqual(self.question.get_best_answer(), answer3)
+
+
 class CuooraRetrieverTest(unittest.TestCase):
     def setUp(self):
         # Instancias de CuOOra y usuarios
@@ -241,6 +294,41 @@ class CuooraRetrieverTest(unittest.TestCase):
         retrieved_questions = self.cuoora.get_social_questions_for_user(self.user1)
         self.assertNotIn(self.question1, retrieved_questions)
 
+    def test_social_retrieval_with_inbox(self):
+        self.user1.enable_inbox()
+        self.assertIn(self.question1, self.cuoora.get_social_questions_for_user(self.user1))
+
+        new_question = Question(self.user2, "Python typing", "Type hints")
+        self.assertIn(new_question, self.cuoora.get_social_questions_for_user(self.user1))
+
+        self.user1.follow(self.user3)
+        self.assertIn(self.question2, self.cuoora.get_social_questions_for_user(self.user1))
+
+        self.user1.stop_follow(self.user2)
+        retrieved_questions = self.cuoora.get_social_questions_for_user(self.user1)
+        self.assertNotIn(self.question1, retrieved_questions)
+        self.assertNotIn(new_question, retrieved_questions)
+        self.assertIn(self.question2, retrieved_questions)
+
+    def test_inbox_returns_the_same_feed(self):
+        new_questions = [Question(self.user2, f"Python {i}", "Description") for i in range(30)]
+        new_questions[0].add_vote(Vote(self.user3))
+        self.user1.follow(self.user3)
+        plain = self.cuoora.get_social_questions_for_user(self.user1, limit=10)
+        self.assertEqual(plain[0], new_questions[0])
+        self.user1.enable_inbox()
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.user1, limit=10), plain)
+
+        # El ranking de cada autor sigue a los votos y a las preguntas nuevas
+        new_questions[5].add_vote(Vote(self.user1))
+        new_questions[5].add_vote(Vote(self.user3))
+        newest = Question(self.user3, "Django 5", "Description")
+        newest.add_vote(Vote(self.user2))
+        with_inbox = self.cuoora.get_social_questions_for_user(self.user1, limit=10)
+        self.user1.disable_inbox()
+        self.assertEqual(with_inbox, self.cuoora.get_social_questions_for_user(self.user1, limit=10))
+        self.assertEqual(with_inbox[:3], [new_questions[5], new_questions[0], newest])
+
     def test_topics_retrieval(self):
         retrieved_questions = self.cuoora.get_topic_questions_for_user(self.user2)
         self.assertIn(self.question2, retrieved_questions)
@@ -258,6 +346,18 @@ class CuooraRetrieverTest(unittest.TestCase):
         self.assertIn(self.question3, retrieved_questions)
         self.assertNotIn(self.question1, retrieved_questions)
 
+    def test_topics_retrieval_without_duplicates(self):
+        self.user3.add_topic(self.topic1)
+        self.user3.add_topic(self.topic2)
+        self.question1.add_topic(self.topic2)
+        self.question3.add_vote(Vote(User('voter', 'voter')))
+
+        retrieved_questions = self.cuoora.get_topic_questions_for_user(self.user3)
+        self.assertEqual(retrieved_questions, [self.question3, self.question1])
+
+        retrieved_questions = self.cuoora.get_topic_questions_for_user(self.user3, limit=1)
+        self.assertEqual(retrieved_questions, [self.question3])
+
     def test_news_retrieval(self):
         retrieved_questions = self.cuoora.get_news_questions_for_user(self.user3)
         self.assertIn(self.question1, retrieved_questions)
@@ -274,6 +374,131 @@ class CuooraRetrieverTest(unittest.TestCase):
         retrieved_questions = self.cuoora.get_popular_questions_for_user(self.user3)
         self.assertIn(self.question1, retrieved_questions)
 
+    def test_news_retrieval_with_injected_clock(self):
+        yesterday = self.question3.get_timestamp()
+        cuoora = CuOOra(clock=lambda: yesterday)
+        for question in self.cuoora.get_questions():
+            cuoora.add_question(question)
+
+        retrieved_questions = cuoora.get_news_questions_for_user(self.user3)
+        self.assertEqual(retrieved_questions, [self.question3])
+
+    def test_questions_of_day_ordered_by_timestamp(self):
+        today = datetime.now().date()
+        self.assertEqual(self.cuoora.get_questions_of_day(today), [self.question1, self.question2])
+        self.assertEqual(self.cuoora.get_questions_of_day(self.question3.get_timestamp().date()), [self.question3])
+
+        self.question2.timestamp = self.question1.get_timestamp() + timedelta(microseconds=1)
+        cuoora = CuOOra()
+        cuoora.add_question(self.question2)
+        cuoora.add_question(self.question1)
+        self.assertEqual(cuoora.get_questions_of_day(self.question1.get_timestamp().date()), [self.question1, self.question2])
+
+    def test_filter_and_sort_excludes_user_before_limiting(self):
+        own_questions = [Question(self.user1, f"Own {i}", "Own question") for i in range(3)]
+        for question in own_questions:
+            question.add_vote(Vote(User('voter', 'voter')))
+        retriever = QuestionRetrieverFactory.create_news(limit=2)
+        retrieved_questions = retriever._filter_and_sort(own_questions + [self.question1, self.question2], self.user1)
+        self.assertEqual(retrieved_questions, [self.question1, self.question2])
+
+    def test_filter_and_sort_orders_by_positive_votes(self):
+        self.question2.add_vote(Vote(User('voter', 'voter')))
+        retriever = QuestionRetrieverFactory.create_news()
+        retrieved_questions = retriever._filter_and_sort([self.question1, self.question3, self.question2], User("reader", "reader"))
+        self.assertEqual(retrieved_questions, [self.question2, self.question1, self.question3])
+
+        retrieved_questions = retriever._filter_and_sort([self.question1, self.question3, self.question2], User("reader", "reader"), limit=1)
+        self.assertEqual(retrieved_questions, [self.question2])
+
+class BlendedRetrievalTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2024, 3, 1, 18, 0)
+        self.cuoora = CuOOra(clock=lambda: self.now)
+        self.reader, self.friend, self.stranger = User("reader", "pass"), User("friend", "pass"), User("stranger", "pass")
+        self.cuoora.add_users([self.reader, self.friend, self.stranger])
+        self.python, self.django = Topic("Python", "Programming in Python"), Topic("Django", "Web development with Django")
+        self.reader.follow(self.friend)
+        self.reader.add_topic(self.python)
+        self.reader.add_topic(self.django)
+
+    def question(self, author, title, topics=(), hours_ago=48, votes=0):
+        question = Question(author, title, "Description", list(topics))
+        question.timestamp = self.now - timedelta(hours=hours_ago)
+        for i in range(votes):
+            question.add_vote(Vote(User(f"voter{i}", "pass")))
+        self.cuoora.add_question(question)
+        return question
+
+    def test_blends_sources_once(self):
+        followed_on_topic = self.question(self.friend, "Followed, on topic", [self.python])
+        two_topics = self.question(self.stranger, "Two topics", [self.python, self.django])
+        followed = self.question(self.friend, "Followed")
+        one_topic = self.question(self.stranger, "One topic", [self.django])
+        today = self.question(self.stranger, "Today", hours_ago=1)
+        unrelated = self.question(self.stranger, "Unrelated")
+        self.question(self.reader, "Own", [self.python], hours_ago=0) # Las propias nunca aparecen
+
+        # "Followed" y "Two topics" empatan: gana el orden de recolección (seguidos, tópicos, hoy)
+        feed = self.cuoora.get_blended_questions_for_user(self.reader)
+        self.assertEqual(feed, [followed_on_topic, followed, two_topics, today, one_topic])
+        self.assertNotIn(unrelated, feed)
+        self.assertEqual(self.cuoora.get_blended_questions_for_user(self.reader, limit=2), feed[:2])
+
+    def test_scores_recency_and_net_votes(self):
+        older = self.question(self.stranger, "Older", [self.python], hours_ago=30)
+        newer = self.question(self.stranger, "Newer", [self.python], hours_ago=6)
+        voted = self.question(self.stranger, "Voted", [self.python], hours_ago=30, votes=3)
+        self.assertEqual(self.cuoora.get_blended_questions_for_user(self.reader), [voted, newer, older])
+
+        for vote in voted.get_votes(): # Los negativos no restan más allá de cero
+            vote.dislike()
+        self.assertEqual(self.cuoora.get_blended_questions_for_user(self.reader), [newer, older, voted])
+
+        retriever = QuestionRetrieverFactory.create("blended", clock=lambda: self.now)
+        self.assertEqual(retriever.retrieve_questions([], self.reader), [newer, older, voted])
+
+    def test_retriever_keeps_only_todays_questions_of_all_questions(self):
+        old = self.question(self.stranger, "Old", hours_ago=48)
+        today = self.question(self.stranger, "Today", hours_ago=1)
+        retriever = QuestionRetrieverFactory.create("blended", clock=lambda: self.now)
+        self.assertEqual(retriever.retrieve_questions(self.cuoora.get_questions(), self.reader), [today])
+        self.assertNotIn(old, retriever._candidates(self.cuoora.get_questions(), self.reader))
+
+    def test_matches_scoring_every_candidate(self):
+        rng = random.Random(7)
+        authors = [User(f"author{i}", "pass") for i in range(8)]
+        self.cuoora.add_users(authors)
+        for a_user in authors[:3]:
+            self.reader.follow(a_user)
+        topics = [self.python, self.django, Topic("C", "Programming in C")]
+        for i in range(200):
+            self.question(rng.choice(authors), f"Question {i}", rng.sample(topics, rng.randint(0, 2)),
+                          hours_ago=rng.uniform(0, 20 * 24), votes=rng.randint(0, 5))
+
+        def score(q):
+            net = q.positive_votes_count() - q.negative_votes_count()
+            age = (self.now - q.get_timestamp()) / timedelta(hours=24)
+            return ((q.get_user() in self.reader.get_following()) + 0.5 * len(set(q.get_topics()) & {self.python, self.django})
+                    + 0.5 ** max(0, age) + 0.5 * math.log1p(max(0, net)))
+        candidates = [q for q in self.cuoora.get_questions() if q.get_user() is not self.reader and
+                      (q.get_user() in self.reader.get_following() or set(q.get_topics()) & {self.python, self.django}
+                       or q.get_timestamp().date() == self.now.date())]
+        expected = sorted(candidates, key=score, reverse=True)[:20]
+        feed = self.cuoora.get_blended_questions_for_user(self.reader, limit=20)
+        self.assertEqual([round(score(q), 9) for q in feed], [round(score(q), 9) for q in expected])
+
+    def test_cache_and_paging(self):
+        cache = self.cuoora.enable_feed_cache()
+        question = self.question(self.friend, "Followed")
+        self.assertEqual(self.cuoora.get_blended_questions_for_user(self.reader), [question])
+        self.reader.stop_follow(self.friend)
+        self.assertEqual(self.cuoora.get_blended_questions_for_user(self.reader), [])
+        self.assertEqual(cache.stats()["invalidations"], 1)
+        with self.assertRaises(ValueError):
+            self.cuoora.get_questions_page_for_user("blended", self.reader)
+
+
 class TestUserScore(unittest.TestCase):
     def setUp(self):
         # Crear usuario de prueba
@@ -327,6 +552,571 @@ class TestUserScore(unittest.TestCase):
         expected_new_score = initial_expected_score + 10
         self.assertEqual(self.user.calculate_score(), expected_new_score)
 
+    def test_calculate_score_after_vote_flips(self):
+        vote = self.question1.get_votes()[0]
+        vote.dislike()
+        self.assertEqual(self.user.calculate_score(), 20)
+
+        vote.like()
+        self.assertEqual(self.user.calculate_score(), 30)
+        self.assertEqual(self.user.calculate_score(), self.user.recalculate_score())
+
+    def test_leaderboard(self):
+        cuoora = CuOOra()
+        cuoora.add_user(self.user)
+        cuoora.add_user(self.other_user)
+        third_user = User("third_user", "password")
+        cuoora.add_user(third_user)
+        self.assertEqual(cuoora.get_top_users(2), [self.user, self.other_user])
+        self.assertEqual(cuoora.get_user_rank(self.user), 1)
+        self.assertEqual(cuoora.get_user_rank(third_user), 2)
+
+        answer = Answer(self.question1, third_user, "Python es dinámico.")
+        answer.add_vote(Vote(User("voter1", "password")))
+        answer.add_vote(Vote(User("voter2", "password")))
+        self.assertEqual(cuoora.get_top_users(3), [self.user, third_user, self.other_user])
+        self.assertEqual(cuoora.get_user_rank(third_user), 2)
+        self.assertEqual(cuoora.get_user_rank(self.other_user), 3)
+
+        answer.add_vote(Vote(User("voter3", "password")))
+        new_question = Question(third_user, "¿Qué es Rust?", "Explicación sobre Rust")
+        new_question.add_vote(Vote(User("voter4", "password")))
+        self.assertEqual(cuoora.get_user_rank(third_user), 1)
+        self.assertEqual(cuoora.get_user_rank(self.user), 1)
+        self.assertEqual(cuoora.get_top_users(1), [self.user])
+
+
+class VoteStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.author = User("author", "password")
+        self.voters = [User(f"voter_{i}", "password") for i in range(4)]
+        self.question1 = Question(self.author, "¿Qué es Python?", "Explicación sobre Python")
+        self.question2 = Question(self.voters[0], "¿Qué es C?", "Explicación sobre C")
+        self.answer1 = Answer(self.question1, self.voters[1], "Un lenguaje interpretado.")
+        self.question1.add_vote(Vote(self.voters[0]))
+        self.answer1.add_vote(Vote(self.voters[2], is_like=False))
+        self.cuoora.add_question(self.question1)
+        self.store = self.cuoora.enable_vote_store()
+
+    def assert_matches_objects(self):
+        positive_counts = self.store.positive_counts()
+        best_answers = self.store.best_answers()
+        for question in self.cuoora.get_questions():
+            self.assertEqual(positive_counts[question], question.positive_votes_count())
+            self.assertEqual(best_answers[question], question.get_best_answer())
+        for user, score in self.store.user_scores().items():
+            self.assertEqual(score, user.calculate_score())
+
+    def test_existing_votes_are_loaded(self):
+        self.assertEqual(len(self.store), 2)
+        self.assert_matches_objects()
+
+    def test_new_votes_and_flips_are_replicated(self):
+        answer2 = Answer(self.question1, self.voters[3], "Un lenguaje dinámico.")
+        answer2.add_vote(Vote(self.voters[0]))
+        self.cuoora.add_question(self.question2)
+        self.question2.add_vote(Vote(self.voters[1]))
+        self.assertEqual(len(self.store), 4)
+        self.assert_matches_objects()
+
+        self.answer1.get_votes()[0].like()
+        self.question1.get_votes()[0].dislike()
+        self.assert_matches_objects()
+        self.assertEqual(self.store.best_answers()[self.question1], self.answer1)
+
+    def test_removed_votes_are_skipped(self):
+        self.question1.retract_vote(self.voters[0])
+        self.answer1.retract_vote(self.voters[2])
+        self.assertEqual(len(self.store), 2) # Quedan como lápidas
+        self.assert_matches_objects()
+        self.answer1.cast_vote(self.voters[2])
+        self.assert_matches_objects()
+
+
+class VoteUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.now()
+        self.cuoora = CuOOra(clock=lambda: self.now)
+        self.author, self.voter, self.other = User("author", "pass"), User("voter", "pass"), User("other", "pass")
+        self.cuoora.add_users([self.author, self.voter, self.other])
+        self.question = Question(self.author, "¿Qué es Python?", "Explicación sobre Python")
+        self.cuoora.add_question(self.question)
+        self.answer = Answer(self.question, self.other, "Un lenguaje interpretado.")
+
+    def test_cast_flip_and_retract_keep_both_sides(self):
+        for votable, author in ((self.question, self.author), (self.answer, self.other)):
+            vote = votable.cast_vote(self.voter)
+            self.assertEqual((votable.positive_votes_count(), votable.negative_votes_count()), (1, 0))
+            self.assertEqual(author.calculate_score(), votable.SCORE_POINTS)
+            self.assertIs(votable.cast_vote(self.voter), vote) # Repetido: no cambia nada
+
+            self.assertIs(votable.cast_vote(self.voter, False), vote) # Cambia el mismo voto
+            self.assertEqual((votable.positive_votes_count(), votable.negative_votes_count()), (0, 1))
+            self.assertEqual(author.calculate_score(), 0)
+            self.assertEqual(self.voter.get_votes().count(vote), 1)
+            self.assertIs(votable.get_vote_of(self.voter), vote)
+
+            self.assertIs(votable.retract_vote(self.voter), vote)
+            self.assertIsNone(votable.retract_vote(self.voter))
+            self.assertEqual((votable.positive_votes_count(), votable.negative_votes_count()), (0, 0))
+            self.assertEqual(votable.get_votes(), [])
+            self.assertNotIn(vote, self.voter.get_votes())
+            self.assertIsNone(votable.get_vote_of(self.voter))
+
+            votable.add_vote(Vote(self.voter)) # Después de quitarlo puede volver a votar
+            self.assertEqual(votable.positive_votes_count(), 1)
+            self.assertEqual(author.calculate_score(), author.recalculate_score())
+
+    def test_retract_updates_rankings_and_feeds(self):
+        cache = self.cuoora.enable_feed_cache()
+        other_question = Question(self.other, "¿Qué es C?", "Explicación sobre C")
+        self.cuoora.add_question(other_question)
+        self.question.cast_vote(self.voter)
+        self.question.cast_vote(self.other)
+        other_question.cast_vote(self.voter)
+        self.assertEqual(self.cuoora.get_news_questions_for_user(self.voter)[0], self.question)
+        self.assertEqual(self.cuoora.get_popular_questions_for_user(self.voter), [self.question])
+
+        self.question.retract_vote(self.voter)
+        self.question.retract_vote(self.other)
+        self.assertEqual(self.cuoora.get_news_questions_for_user(self.voter)[0], other_question)
+        self.assertEqual(self.cuoora.get_popular_questions_for_user(self.voter), [other_question])
+        self.assertGreater(cache.stats()["invalidations"], 0)
+        self.assertEqual(self.cuoora.get_top_users(1), [self.other])
+
+        better = Answer(self.question, self.author, "Un lenguaje dinámico.")
+        better.cast_vote(self.voter)
+        self.assertEqual(self.question.get_best_answer(), better)
+        better.retract_vote(self.voter)
+        self.assertEqual(self.question.get_best_answer(), self.answer)
+
+    def test_batched_lookup_for_a_page(self):
+        questions = [Question(self.author, f"Question {i}", "Description") for i in range(100)]
+        for i, question in enumerate(questions):
+            if i % 3:
+                question.cast_vote(self.voter, is_like=i % 3 == 1)
+        votes = self.voter.get_votes_on(questions + [self.answer])
+        self.assertEqual([None if v is None else v.is_like() for v in votes],
+                         [(None, True, False)[i % 3] for i in range(100)] + [None])
+        self.assertEqual(self.other.get_votes_on(questions), [None] * 100)
+
+
+class CompactRepresentationTest(unittest.TestCase):
+    def test_entities_have_no_instance_dict(self):
+        user = User("user", "password")
+        question = Question(user, "Title", "Description")
+        answer = Answer(question, user, "Description")
+        for entity in (user, question, answer, Topic("Topic", "Description"), Vote(user)):
+            self.assertFalse(hasattr(entity, "__dict__"))
+
+    def test_votes_manager_allocated_on_first_vote(self):
+        question = Question(User("user", "password"), "Title", "Description")
+        other_question = Question(User("user", "password"), "Title", "Description")
+        self.assertIs(question.votes_manager, other_question.votes_manager)
+        self.assertEqual(question.get_votes(), [])
+
+        question.add_vote(Vote(User("voter", "password")))
+        self.assertIsNot(question.votes_manager, other_question.votes_manager)
+        self.assertEqual(question.positive_votes_count(), 1)
+        self.assertEqual(other_question.positive_votes_count(), 0)
+
+    def test_shared_votes_manager_is_read_only(self):
+        question = Question(User("user", "password"), "Title", "Description")
+        voter = User("voter", "password")
+        with self.assertRaises(ValueError):
+            question.votes_manager.add_vote(Vote(voter))
+        with self.assertRaises(ValueError):
+            question.votes_manager.cast_vote(voter, True)
+        self.assertIsNone(question.retract_vote(voter))
+        self.assertEqual(Question(User("user", "password"), "Title", "Description").positive_votes_count(), 0)
+
+
+class FeedCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.now()
+        self.cuoora = CuOOra(clock=lambda: self.now)
+        self.cache = self.cuoora.enable_feed_cache(max_entries=3)
+        self.reader, self.author, self.other = User("reader", "pass"), User("author", "pass"), User("other", "pass")
+        self.cuoora.add_users([self.reader, self.author, self.other])
+        self.topic = Topic("Python", "Programming in Python")
+        self.reader.follow(self.author)
+        self.reader.add_topic(self.topic)
+        self.question = Question(self.author, "What is Python?", "Python basics", [self.topic])
+        self.cuoora.add_question(self.question)
+
+    def test_repeated_requests_hit(self):
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [self.question])
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [self.question])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+        # Lo que no está entre sus candidatas no lo invalida
+        unrelated = Question(self.other, "Other", "Other question")
+        self.cuoora.add_question(unrelated)
+        unrelated.add_vote(Vote(self.reader))
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [self.question])
+        self.assertEqual(self.cache.stats()["hits"], 2)
+
+    def test_relevant_events_invalidate(self):
+        for retrieve in (self.cuoora.get_social_questions_for_user, self.cuoora.get_topic_questions_for_user,
+                         self.cuoora.get_news_questions_for_user):
+            retrieve(self.reader)
+        newer = Question(self.author, "Python typing", "Type hints", [self.topic])
+        self.cuoora.add_question(newer)
+        newer.add_vote(Vote(self.other))
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [newer, self.question])
+        self.assertEqual(self.cuoora.get_topic_questions_for_user(self.reader), [newer, self.question])
+        self.assertEqual(self.cuoora.get_news_questions_for_user(self.reader), [newer, self.question])
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+        self.reader.stop_follow(self.author)
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [])
+        other_topic = Topic("Django", "Web development with Django")
+        other_question = Question(self.other, "Django", "Django basics", [other_topic])
+        self.reader.add_topic(other_topic)
+        self.assertIn(other_question, self.cuoora.get_topic_questions_for_user(self.reader))
+
+    def test_unregistered_users_never_read_stale_feeds(self):
+        reader, author, stranger = User("reader2", "pass"), User("author2", "pass"), User("stranger", "pass")
+        reader.follow(author) # Ninguno pasa por add_user: sus eventos no llegan a este sistema
+        self.assertEqual(self.cuoora.get_social_questions_for_user(reader), [])
+        question = Question(author, "Unregistered", "Unregistered author")
+        self.assertEqual(self.cuoora.get_social_questions_for_user(reader), [question])
+
+        self.assertEqual(self.cuoora.get_social_questions_for_user(self.reader), [self.question])
+        self.reader.follow(author)
+        Question(author, "Later", "Later question")
+        self.assertEqual(len(self.cuoora.get_social_questions_for_user(self.reader)), 3)
+
+        self.assertEqual(self.cuoora.get_topic_questions_for_user(self.reader), [self.question])
+        tagged = Question(stranger, "Tagged", "Unregistered author, same topic", [self.topic])
+        self.assertEqual(self.cuoora.get_topic_questions_for_user(self.reader), [self.question, tagged])
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+        # Una vez agregada, sus eventos llegan por el sistema de la pregunta y el tópico vuelve a cachearse
+        self.cuoora.add_question(tagged)
+        self.cuoora.get_popular_questions_for_user(self.reader)
+        tagged.add_vote(Vote(self.other))
+        self.assertEqual(self.cuoora.get_popular_questions_for_user(self.reader), [tagged])
+        self.cuoora.get_topic_questions_for_user(self.reader)
+        self.assertEqual(self.cuoora.get_topic_questions_for_user(self.reader), [tagged, self.question])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_day_rollover_and_ttl_expire(self):
+        self.assertEqual(self.cuoora.get_news_questions_for_user(self.reader), [self.question])
+        self.now += timedelta(days=1)
+        self.assertEqual(self.cuoora.get_news_questions_for_user(self.reader), [])
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+        self.cuoora.disable_feed_cache()
+        cache = self.cuoora.enable_feed_cache(ttl=timedelta(minutes=5))
+        self.cuoora.get_topic_questions_for_user(self.reader)
+        self.now += timedelta(minutes=10)
+        self.cuoora.get_topic_questions_for_user(self.reader)
+        self.assertEqual((cache.stats()["expirations"], cache.stats()["misses"]), (1, 2))
+
+    def test_least_recently_used_is_evicted(self):
+        for user in (self.reader, self.author, self.other):
+            self.cuoora.get_social_questions_for_user(user)
+        self.cuoora.get_social_questions_for_user(self.reader)
+        self.cuoora.get_topic_questions_for_user(self.reader)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertNotIn(("social", self.author, IQuestionRetriever.DEFAULT_LIMIT), self.cache.entries)
+        self.assertIn(("social", self.reader, IQuestionRetriever.DEFAULT_LIMIT), self.cache.entries)
+
+
+class PaginationTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.now()
+        self.cuoora = CuOOra(clock=lambda: self.now)
+        self.reader, self.author = User("reader", "pass"), User("author", "pass")
+        self.cuoora.add_users([self.reader, self.author])
+        self.reader.follow(self.author)
+        self.voters = [User(f"voter{i}", "pass") for i in range(4)]
+        self.questions = []
+        for i in range(250):
+            question = Question(self.author, f"Question {i}", "Description")
+            question.timestamp = self.now - timedelta(seconds=250 - i)
+            for voter in self.voters[:i % 5]:
+                question.add_vote(Vote(voter))
+            self.cuoora.add_question(question)
+            self.questions.append(question)
+        Question(self.reader, "Own question", "Description") # Las propias nunca aparecen
+
+    def collect_pages(self, strategy, page_size):
+        pages, cursor = [], None
+        while True:
+            page, cursor = self.cuoora.get_questions_page_for_user(strategy, self.reader, page_size, cursor)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    def test_pages_follow_lazy_ranking_past_default_limit(self):
+        ranking = list(self.cuoora.iter_questions_for_user("social", self.reader))
+        self.assertEqual(len(ranking), 250)
+        expected = sorted(self.questions, key=lambda q: -q.positive_votes_count()) # Empates en orden de colección
+        self.assertEqual(ranking, expected)
+        self.assertEqual(ranking[:100], self.cuoora.get_social_questions_for_user(self.reader))
+
+        pages = self.collect_pages("social", 20)
+        self.assertEqual([len(page) for page in pages], [20] * 12 + [10])
+        self.assertEqual([q for page in pages for q in page], ranking)
+        self.assertEqual([q for page in self.collect_pages("news", 7) for q in page], ranking)
+
+    def test_ties_follow_collection_order_like_top_k(self):
+        for question in self.questions[:100]: # Los timestamps ya no coinciden con el orden de la colección
+            question.timestamp = self.now
+        ranking = list(self.cuoora.iter_questions_for_user("social", self.reader))
+        self.assertEqual(ranking[:100], self.cuoora.get_social_questions_for_user(self.reader))
+        pages = self.collect_pages("social", 9)
+        self.assertEqual([q for page in pages for q in page], ranking)
+        self.assertEqual(len(set(ranking)), 250)
+
+    def test_generator_is_lazy_and_resumes_from_cursor(self):
+        page, cursor = self.cuoora.get_questions_page_for_user("social", self.reader, 5)
+        rest = self.cuoora.iter_questions_for_user("social", self.reader, cursor)
+        self.assertEqual(page + list(islice(rest, 5)),
+                         list(islice(self.cuoora.iter_questions_for_user("social", self.reader), 10)))
+
+    def test_rejects_invalid_cursor_and_strategy(self):
+        with self.assertRaises(ValueError):
+            self.cuoora.get_questions_page_for_user("social", self.reader, cursor="not a cursor")
+        negative = IQuestionRetriever.encode_cursor(-1, -3)
+        with self.assertRaises(ValueError):
+            self.cuoora.get_questions_page_for_user("social", self.reader, cursor=negative)
+        with self.assertRaises(ValueError):
+            self.cuoora.get_questions_page_for_user("trending", self.reader)
+
+
+class ConcurrentModeTest(unittest.TestCase):
+    THREADS = 8
+    OPERATIONS = 1500
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5) # Más cambios de hilo, más intercalaciones posibles
+        self.cuoora = CuOOra()
+        self.users = [User(f"user{i}", "pass") for i in range(30)]
+        self.cuoora.add_users(self.users)
+        self.topics = [Topic(f"topic{i}", "Topic") for i in range(3)]
+        for i, user in enumerate(self.users):
+            user.add_topic(self.topics[i % 3])
+            user.follow(self.users[(i + 1) % 30])
+            if i % 2:
+                user.enable_inbox()
+        for i in range(20):
+            question = Question(self.users[i], f"Question {i}", "Description", [self.topics[i % 3]])
+            self.cuoora.add_question(question)
+            Answer(question, self.users[i + 1], "Answer")
+        self.cuoora.enable_concurrency()
+        self.cache = self.cuoora.enable_feed_cache()
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+        self.cuoora.disable_concurrency()
+
+    def work(self, seed, errors):
+        rng = random.Random(seed)
+        feeds = (self.cuoora.get_social_questions_for_user, self.cuoora.get_topic_questions_for_user,
+                 self.cuoora.get_news_questions_for_user, self.cuoora.get_popular_questions_for_user)
+        try:
+            for _ in range(self.OPERATIONS):
+                user = rng.choice(self.users)
+                questions = self.cuoora.get_questions()
+                question = rng.choice(questions)
+                operation = rng.random()
+                if operation < 0.4:
+                    votable = rng.choice([question, *question.get_answers()])
+                    try:
+                        votable.add_vote(Vote(user, rng.random() < 0.7))
+                    except ValueError:
+                        pass # Otro hilo registró antes el voto de este usuario
+                elif operation < 0.55:
+                    votes = question.get_votes()
+                    if votes:
+                        vote = rng.choice(votes)
+                        vote.dislike() if vote.is_like() else vote.like()
+                elif operation < 0.65:
+                    other = rng.choice(self.users)
+                    user.follow(other) if rng.random() < 0.6 else user.stop_follow(other)
+                elif operation < 0.7:
+                    new_question = Question(user, "New question", "Description", [rng.choice(self.topics)])
+                    self.cuoora.add_question(new_question)
+                    Answer(new_question, rng.choice(self.users), "Answer")
+                else:
+                    rng.choice(feeds)(user)
+        except Exception as error: # Se reporta desde el hilo principal
+            errors.append(error)
+
+    def test_parallel_votes_and_feeds_keep_invariants(self):
+        errors = []
+        threads = [threading.Thread(target=self.work, args=(seed, errors)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        for question in self.cuoora.get_questions():
+            for votable in (question, *question.get_answers()):
+                votes = votable.get_votes()
+                self.assertEqual(votable.positive_votes_count(), sum(1 for v in votes if v.is_like()))
+                self.assertEqual(votable.negative_votes_count(), sum(1 for v in votes if not v.is_like()))
+                for vote in votes:
+                    self.assertIs(votable.votes_manager.get_vote_of(vote.get_user()), vote)
+                    self.assertIn(vote, vote.get_user().get_votes())
+            nets = [(-(a.positive_votes_count() - a.negative_votes_count())) for a in question.get_answers()]
+            self.assertEqual([entry[0] for entry in question.ranked_answers], sorted(nets))
+
+        for user in self.users:
+            self.assertEqual(user.calculate_score(), user.recalculate_score())
+            for followed in user.get_following():
+                self.assertEqual(user.get_following().count(followed), 1)
+                self.assertIn(user, followed.get_followers())
+            for follower in user.get_followers():
+                self.assertIn(user, follower.get_following())
+            if user.ranked_questions is not None:
+                expected = sorted((-q.positive_votes_count(), i, q) for i, q in enumerate(user.get_questions()))
+                self.assertEqual(user.ranked_questions, expected)
+        self.assertEqual(self.cuoora.get_top_users(30),
+                         sorted(self.users, key=lambda u: -u.calculate_score()))
+
+        cached = [self.cuoora.get_social_questions_for_user(u) for u in self.users]
+        self.cuoora.disable_feed_cache()
+        self.assertEqual(cached, [self.cuoora.get_social_questions_for_user(u) for u in self.users])
+
+    def test_votes_manager_without_owner_flips_votes(self):
+        manager, vote = VotesManager(), Vote(self.users[0])
+        manager.add_vote(vote)
+        vote.dislike()
+        self.assertEqual((manager.count_positive_votes(), manager.count_negative_votes()), (0, 1))
+
+    def test_disable_returns_to_sequential_mode(self):
+        self.cuoora.disable_concurrency()
+        self.assertFalse(ConcurrencyMode.enabled)
+        self.assertIs(self.cuoora.publish_lock, NO_LOCK)
+        self.assertIs(User("late", "pass").lock, NO_LOCK)
+        self.assertEqual(len(self.cuoora.get_social_questions_for_user(self.users[0])), 1)
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.cuoora = CuOOra()
+        self.reader, self.author = User("reader", "pass"), User("author", "pass")
+        self.cuoora.add_users([self.reader, self.author])
+        self.reader.follow(self.author)
+        for i in range(3):
+            self.cuoora.add_question(Question(self.author, f"Question {i}", "Description"))
+        self.addCleanup(self.cuoora.disable_metrics)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(Metrics.active)
+        self.cuoora.get_social_questions_for_user(self.reader)
+        metrics = self.cuoora.enable_metrics()
+        self.assertEqual(metrics.snapshot(), {})
+        self.assertIs(self.cuoora.enable_metrics(), metrics)
+
+    def test_records_feeds_candidates_and_votes(self):
+        metrics = self.cuoora.enable_metrics()
+        question = self.cuoora.get_questions()[0]
+        question.add_vote(Vote(self.reader))
+        question.get_votes()
+        self.assertEqual(len(self.cuoora.get_social_questions_for_user(self.reader, limit=2)), 2)
+        self.cuoora.get_news_questions_for_user(self.author)
+        self.assertEqual(self.cuoora.get_popular_questions_for_user(self.reader), [question])
+
+        snapshot = metrics.snapshot()
+        feeds = {serie["labels"]["strategy"]: serie["count"] for serie in snapshot["cuoora_feed_seconds"]}
+        self.assertEqual(feeds, {"social": 1, "news": 1, "popular_today": 1})
+        candidates = {serie["labels"]["strategy"]: serie["sum"] for serie in snapshot["cuoora_candidates"]}
+        results = {serie["labels"]["strategy"]: serie["sum"] for serie in snapshot["cuoora_results"]}
+        self.assertEqual(candidates, {"social": 3, "news": 3, "popular_today": 1})
+        self.assertEqual(results, {"social": 2, "news": 0, "popular_today": 1})
+        self.assertEqual(snapshot["cuoora_add_vote_seconds"][0]["count"], 1)
+        self.assertEqual(snapshot["cuoora_vote_lists_total"], [{"labels": {"source": "votes_manager"}, "value": 1}])
+
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE cuoora_feed_seconds histogram", text)
+        self.assertIn('cuoora_feed_seconds_bucket{strategy="social",le="+Inf"} 1', text)
+        self.assertIn('cuoora_candidates_sum{strategy="social"} 3', text)
+        self.assertIn('cuoora_vote_lists_total{source="votes_manager"} 1', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_topics_feed_records_one_observation_per_request(self):
+        topics = [Topic(f"Topic {i}", "Description") for i in range(3)]
+        for i, topic in enumerate(topics):
+            self.reader.add_topic(topic)
+            for j in range(i + 1):
+                self.cuoora.add_question(Question(self.author, f"Topic {i} question {j}", "Description", [topic]))
+        metrics = self.cuoora.enable_metrics()
+        self.assertEqual(len(self.cuoora.get_topic_questions_for_user(self.reader, limit=4)), 4)
+
+        snapshot = metrics.snapshot()
+        candidates = [serie for serie in snapshot["cuoora_candidates"] if serie["labels"]["strategy"] == "topics"]
+        results = [serie for serie in snapshot["cuoora_results"] if serie["labels"]["strategy"] == "topics"]
+        self.assertEqual([(serie["count"], serie["sum"]) for serie in candidates], [(1, 6)])
+        self.assertEqual([(serie["count"], serie["sum"]) for serie in results], [(1, 4)])
+
+    def test_profiler_wraps_calls(self):
+        calls = []
+        def profiler(name, function):
+            calls.append(name)
+            return function()
+        self.cuoora.enable_metrics(profiler)
+        self.assertEqual(len(self.cuoora.get_social_questions_for_user(self.reader)), 3)
+        self.cuoora.get_questions_page_for_user("news", self.reader)
+        self.assertEqual(calls, ["cuoora_feed_seconds:social", "cuoora_page_seconds:news"])
+
+        hook = CProfileHook(sample_every=2)
+        self.cuoora.enable_metrics(hook)
+        for _ in range(3):
+            self.cuoora.get_topic_questions_for_user(self.reader)
+        self.assertEqual(list(hook.profiles), ["cuoora_feed_seconds:topics"])
+        self.assertGreater(hook.stats("cuoora_feed_seconds:topics").total_calls, 0)
+
+
+class DayPopularityTest(unittest.TestCase):
+    def test_matches_recomputing_from_the_day_list(self):
+        rng = random.Random(7)
+        now = datetime.now()
+        cuoora = CuOOra(clock=lambda: now)
+        users = [User(f"user{i}", "pass") for i in range(8)]
+        cuoora.add_users(users[:4]) # Los autores no registrados no publican, pero igual cuentan
+        retriever = QuestionRetrieverFactory.create_popular_today(limit=5)
+        votes = []
+        for step in range(300):
+            operation = rng.random()
+            if operation < 0.2 or not cuoora.get_questions():
+                with patch("cuoora_social_network.datetime") as mock_datetime:
+                    mock_datetime.now.return_value = now - timedelta(days=rng.randrange(2), seconds=rng.randrange(3))
+                    question = Question(rng.choice(users), f"Question {step}", "Description")
+                if rng.random() < 0.5:
+                    cuoora.add_question(question)
+                else:
+                    question.add_vote(Vote(rng.choice(users))) # Votada antes de agregarse
+                    cuoora.add_questions([question])
+            elif operation < 0.8:
+                try:
+                    vote = Vote(rng.choice(users), rng.random() < 0.7)
+                    rng.choice(cuoora.get_questions()).add_vote(vote)
+                    votes.append(vote)
+                except ValueError:
+                    pass
+            elif votes:
+                vote = rng.choice(votes)
+                vote.dislike() if vote.is_like() else vote.like()
+
+            user = rng.choice(users)
+            expected = retriever.retrieve_questions(cuoora.get_questions_of_day(now.date()), user)
+            self.assertEqual(cuoora.get_popular_questions_for_user(user, limit=5), expected)
+
+        today = cuoora.get_questions_of_day(now.date())
+        popularity = cuoora.popularity_by_day[now.date()]
+        self.assertEqual(popularity.average(), sum(q.positive_votes_count() for q in today) / len(today))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file